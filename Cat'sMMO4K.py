@@ -8,6 +8,9 @@ import random
 import time
 import sys
 
+from netcapture import open_capture_from_env
+from platformphysics import MovementProfile, PlatformLevel, walk, start_jump, fall, move_box
+
 # -----------------------------------------------------------------------------
 # CONFIGURATION CONSTANTS
 # -----------------------------------------------------------------------------
@@ -24,11 +27,26 @@ UDP_PORT       = 5000          # UDP port for P2P broadcasts
 BROADCAST_ADDR = '<broadcast>' # Use broadcast address for LAN
 
 NETWORK_TICK   = 0.05          # Seconds between sending state updates
+SIM_FPS        = 60            # Frames per second Player.update is tuned for
+DR_THRESHOLD   = 2.0           # Pixels of dead-reckoning error before resending
+DR_KEEPALIVE   = 1.0           # Seconds before an unchanged state is resent anyway
+
+PLAYER_PROFILE = MovementProfile('cats_mmo', max_speed=MOVE_SPEED, gravity=GRAVITY, jump_velocity=JUMP_SPEED)
 
 # -----------------------------------------------------------------------------
 # PLAYER CLASS
 # -----------------------------------------------------------------------------
 
+_platform_levels = {}
+
+def platform_level(platforms):
+    """One-way collision level for a list of (x, y, w, h) platforms, built once per layout."""
+    key = tuple(platforms)
+    level = _platform_levels.get(key)
+    if level is None:
+        level = _platform_levels[key] = PlatformLevel.from_rects(platforms, one_way=True)
+    return level
+
 class Player:
     def __init__(self, player_id, x, y):
         self.player_id = player_id
@@ -40,38 +58,27 @@ class Player:
 
     def update(self, keys_pressed, platforms):
         # Horizontal movement
+        direction = 0
         if keys_pressed.get("left", False):
-            self.vx = -MOVE_SPEED
+            direction = -1
         elif keys_pressed.get("right", False):
-            self.vx = MOVE_SPEED
-        else:
-            self.vx = 0
+            direction = 1
+        self.vx = walk(self.vx, direction, PLAYER_PROFILE)
 
         # Jump
         if keys_pressed.get("jump", False) and self.on_ground:
-            self.vy = JUMP_SPEED
+            self.vy, _ = start_jump(PLAYER_PROFILE)
             self.on_ground = False
 
         # Apply gravity
-        self.vy += GRAVITY
+        self.vy, _ = fall(self.vy, False, 0, PLAYER_PROFILE)
 
-        # Update position
-        self.x += self.vx
-        self.y += self.vy
-
-        # Collision detection with platforms
-        self.on_ground = False
-        for platform in platforms:
-            px, py, pw, ph = platform
-            if (self.x + PLAYER_WIDTH > px and
-                self.x < px + pw and
-                self.y + PLAYER_HEIGHT > py and
-                self.y < py + ph):
-                # Collision detected; if falling, place on top
-                if self.vy > 0:
-                    self.y = py - PLAYER_HEIGHT
-                    self.vy = 0
-                    self.on_ground = True
+        # Move; platforms only catch a player falling onto them
+        self.x, self.y, contacts = move_box(self.x, self.y, PLAYER_WIDTH, PLAYER_HEIGHT,
+                                            self.vx, self.vy, platform_level(platforms))
+        self.on_ground = contacts.landed
+        if contacts.landed:
+            self.vy = 0
 
         # Keep inside screen
         if self.x < 0:
@@ -92,7 +99,8 @@ class Player:
             "x": self.x,
             "y": self.y,
             "vx": self.vx,
-            "vy": self.vy
+            "vy": self.vy,
+            "on_ground": self.on_ground
         }
 
     def from_dict(self, data):
@@ -100,6 +108,61 @@ class Player:
         self.y = data["y"]
         self.vx = data["vx"]
         self.vy = data["vy"]
+        self.on_ground = data.get("on_ground", False)
+
+# -----------------------------------------------------------------------------
+# DEAD RECKONING
+# -----------------------------------------------------------------------------
+
+def extrapolate(state, elapsed):
+    """
+    Predict (x, y) `elapsed` seconds after `state` was taken, assuming the
+    inputs did not change: constant run speed and a gravity arc while
+    airborne. Senders and receivers must run this same function.
+    """
+    n = elapsed * SIM_FPS
+    x = state["x"] + state["vx"] * n
+    y = state["y"]
+    if not state.get("on_ground", False):
+        # Per frame: vy += GRAVITY, then y += vy
+        y += state["vy"] * n + GRAVITY * n * (n + 1) / 2
+
+    x = max(0, min(x, SCREEN_WIDTH - PLAYER_WIDTH))
+    y = max(0, min(y, SCREEN_HEIGHT - PLAYER_HEIGHT))
+    return x, y
+
+class DeadReckoningSender:
+    """Decides when the local state has drifted far enough from what peers predict."""
+
+    def __init__(self):
+        self.last_state = None
+        self.last_sent = 0.0
+        self.last_tick = 0.0
+        self.sent = 0
+        self.opportunities = 0   # sends the fixed-rate scheme would have made
+
+    def should_send(self, state, now):
+        if now - self.last_tick < NETWORK_TICK:
+            return False
+        self.last_tick = now
+        self.opportunities += 1
+
+        if self.last_state is None or now - self.last_sent >= DR_KEEPALIVE:
+            return True
+        px, py = extrapolate(self.last_state, now - self.last_sent)
+        dx = px - state["x"]
+        dy = py - state["y"]
+        return dx * dx + dy * dy > DR_THRESHOLD * DR_THRESHOLD
+
+    def mark_sent(self, state, now):
+        self.last_state = state
+        self.last_sent = now
+        self.sent += 1
+
+    def suppression_ratio(self):
+        if not self.opportunities:
+            return 0.0
+        return 1.0 - self.sent / self.opportunities
 
 # -----------------------------------------------------------------------------
 # RENDERING FUNCTIONS
@@ -113,12 +176,18 @@ def draw_platforms(screen, platforms):
     for p in platforms:
         pygame.draw.rect(screen, (0, 180, 0), p)
 
+def draw_hud(screen, font, sender):
+    text = (f"net sent {sender.sent}/{sender.opportunities}  "
+            f"suppressed {sender.suppression_ratio() * 100:.0f}%")
+    screen.blit(font.render(text, True, (0, 0, 0)), (8, 8))
+
 # -----------------------------------------------------------------------------
 # NETWORKING (UDP BROADCAST LISTENER)
 # -----------------------------------------------------------------------------
 
 running = True
 remote_players = {}  # key: player_id, value: Player instance
+net_stats = {"received": 0, "bytes": 0, "decode_errors": 0}
 
 def network_listener(local_id):
     """
@@ -133,13 +202,19 @@ def network_listener(local_id):
     # Bind to all interfaces on UDP_PORT to receive broadcasts
     sock.bind(('', UDP_PORT))
     sock.settimeout(1.0)
+    capture = open_capture_from_env()
 
     while running:
         try:
             data, addr = sock.recvfrom(1024)
+            net_stats["received"] += 1
+            net_stats["bytes"] += len(data)
+            if capture:
+                capture.write(data)
             try:
                 message = json.loads(data.decode('utf-8'))
             except (json.JSONDecodeError, UnicodeDecodeError):
+                net_stats["decode_errors"] += 1
                 continue
 
             if message.get("type") != "update":
@@ -153,22 +228,24 @@ def network_listener(local_id):
             x = pstate.get("x"); y = pstate.get("y")
             vx = pstate.get("vx"); vy = pstate.get("vy")
             if x is None or y is None or vx is None or vy is None:
+                net_stats["decode_errors"] += 1
                 continue
 
-            # If new player, spawn at given coordinates
-            if pid not in remote_players:
-                new_player = Player(pid, x, y)
-                new_player.vx = vx
-                new_player.vy = vy
-                remote_players[pid] = new_player
-            else:
-                remote_players[pid].from_dict(pstate)
+            # If new player, spawn at given coordinates; fill in the state
+            # before publishing so the render loop never sees it half-built
+            rp = remote_players.get(pid) or Player(pid, x, y)
+            rp.from_dict(pstate)
+            rp.last_state = pstate
+            rp.last_state_time = time.time()
+            remote_players[pid] = rp
 
         except socket.timeout:
             continue
         except Exception:
             continue
 
+    if capture:
+        capture.close()
     sock.close()
 
 # -----------------------------------------------------------------------------
@@ -183,6 +260,7 @@ def main():
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("P2P Mario-Style Game")
     clock = pygame.time.Clock()
+    font = pygame.font.Font(None, 22)
 
     # Platforms (x, y, width, height)
     platforms = [
@@ -209,7 +287,7 @@ def main():
     send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     send_sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
 
-    last_network_send = 0.0
+    sender = DeadReckoningSender()
 
     # Main loop
     while running:
@@ -239,14 +317,15 @@ def main():
         # Update local player physics
         local_player.update(keys_pressed, platforms)
 
-        # Broadcast local player state at fixed intervals
+        # Broadcast local player state only when peers' prediction is off
         now = time.time()
-        if now - last_network_send >= NETWORK_TICK:
-            last_network_send = now
+        state = local_player.to_dict()
+        if sender.should_send(state, now):
+            sender.mark_sent(state, now)
             message = {
                 "type": "update",
                 "player_id": local_id,
-                "state": local_player.to_dict()
+                "state": state
             }
             try:
                 send_sock.sendto(json.dumps(message).encode('utf-8'),
@@ -259,10 +338,13 @@ def main():
         draw_platforms(screen, platforms)
         draw_player(screen, local_player)
 
-        # Draw remote players
+        # Draw remote players where their last state predicts them to be
         for pid, rp in list(remote_players.items()):
+            rp.x, rp.y = extrapolate(rp.last_state, now - rp.last_state_time)
             draw_player(screen, rp)
 
+        draw_hud(screen, font, sender)
+
         pygame.display.flip()
 
     # Cleanup
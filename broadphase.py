@@ -0,0 +1,95 @@
+# broadphase.py
+#
+# Sort-and-sweep broad-phase for moving entities.
+# overlapping_pairs() sorts the boxes by their left edge once, then every
+# box only looks ahead at the boxes whose left edge starts before its right
+# edge. Crowds spread along a level cost about O(n log n) instead of testing
+# all n * n pairs. The whole pass runs as NumPy array operations and
+# returns every overlapping pair once per frame. Game code then handles the
+# pairs it cares about (shell hits, player contact, ...) over that list.
+#
+# Overlap matches pygame.Rect.colliderect: boxes that only share an edge,
+# and empty boxes, do not overlap.
+#
+# Run directly for a brute-force versus sort-and-sweep benchmark:
+#   python broadphase.py
+
+import time
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# SORT AND SWEEP
+# -----------------------------------------------------------------------------
+
+def overlapping_pairs(x, y, w, h):
+    """
+    x, y, w, h -- equal-length arrays describing one box per entity
+    Returns (a, b): index arrays with a[k] < b[k], one entry per overlapping
+    pair, ordered by a then b.
+    """
+    x, y = np.asarray(x, np.float64), np.asarray(y, np.float64)
+    w, h = np.asarray(w, np.float64), np.asarray(h, np.float64)
+    n = len(x)
+    if n < 2:
+        empty = np.empty(0, np.intp)
+        return empty, empty
+
+    order = np.argsort(x, kind='stable')
+    left = x[order]
+    right = left + w[order]
+    # Boxes k+1 .. end[k]-1 (in sorted order) start before box k ends
+    end = np.searchsorted(left, right, side='left')
+    counts = end - np.arange(n) - 1
+    counts[counts < 0] = 0
+    total = int(counts.sum())
+    if total == 0:
+        empty = np.empty(0, np.intp)
+        return empty, empty
+    first = np.repeat(np.arange(n), counts)
+    # Offset of each candidate within its run: 1, 2, ... counts[k]
+    starts = np.cumsum(counts) - counts
+    second = first + np.arange(total) - np.repeat(starts, counts) + 1
+
+    a, b = order[first], order[second]
+    # left[second] < right[first] already holds; empty boxes never overlap anything
+    keep = ((w[a] > 0) & (w[b] > 0) & (h[a] > 0) & (h[b] > 0) &
+            (y[a] < y[b] + h[b]) & (y[b] < y[a] + h[a]))
+    a, b = a[keep], b[keep]
+    swap = a > b
+    a[swap], b[swap] = b[swap], a[swap]
+    sort = np.lexsort((b, a))
+    return a[sort], b[sort]
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+
+def benchmark(counts=(10, 100, 1000), frames=50):
+    import random
+    import pygame
+
+    rng = random.Random(1)
+    print(f"{'entities':>8} {'all pairs ms':>13} {'sweep ms':>9} {'pairs':>6}")
+    for count in counts:
+        # A crowd spread along a scrolling level
+        width = max(800, count * 40)
+        boxes = [(rng.randrange(0, width), rng.randrange(300, 540), 30, 30) for _ in range(count)]
+        rects = [pygame.Rect(b) for b in boxes]
+        x, y, w, h = (np.array(c, np.float64) for c in zip(*boxes))
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            brute = [(i, j) for i, r in enumerate(rects) for j in r.collidelistall(rects) if i < j]
+        all_pairs = (time.perf_counter() - start) / frames
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            a, b = overlapping_pairs(x, y, w, h)
+        swept = (time.perf_counter() - start) / frames
+
+        assert sorted(brute) == list(zip(a.tolist(), b.tolist()))
+        print(f"{count:>8} {all_pairs * 1000:>13.3f} {swept * 1000:>9.3f} {len(a):>6}")
+
+if __name__ == "__main__":
+    benchmark()
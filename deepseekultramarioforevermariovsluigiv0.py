@@ -1,5 +1,9 @@
 # test.py
 import pygame, socket, threading, json, random, time, sys, math
+from platformphysics import MovementProfile, PlatformLevel, walk, start_jump, fall, move_box
+from contactcache import ContactCache
+from pvpstage import run_pvp
+from spritemask import MaskCache
 
 # --- CONFIG ---
 SCREEN_W, SCREEN_H = 800, 480
@@ -17,6 +21,8 @@ BROADCAST = '<broadcast>'
 POWERUPS = ['mushroom', 'fire', 'shell', 'star', 'mini', 'mega']
 BACKGROUND_COLOR = (123, 187, 251)
 FONT_NAME = 'consolas'
+PLAYER_RADIUS = 8     # corner rounding of the drawn players
+PRECISE_PVP = False   # F4 toggles: player masks confirm PvP contacts
 
 # --- LEVEL DATA ---
 LEVEL = [
@@ -30,6 +36,17 @@ LEVEL = [
     {'x': -TILE*2, 'y': SCREEN_H-TILE*2, 'w': TILE*2, 'h': TILE*2, 'type': 'pipeL'},
     {'x': SCREEN_W, 'y': SCREEN_H-TILE*2, 'w': TILE*2, 'h': TILE*2, 'type': 'pipeR'},
 ]
+LEVEL_COLLISION = PlatformLevel.from_rects([(p['x'], p['y'], p['w'], p['h']) for p in LEVEL])
+PLAYER_PROFILE = MovementProfile('deepseek', max_speed=MAX_RUN, accel=RUN_ACC, idle_divisor=FRICTION, stop_speed=0.1,
+                                 gravity=GRAVITY, jump_velocity=JUMP_VEL, max_fall=18, max_rise=-25)
+
+# --- PLAYER MASKS ---
+# One mask per player size (mini, small, big), keyed by (w, h) and built at
+# load time, so a PvP contact between rounded corners is not a hit.
+PLAYER_MASKS = MaskCache()
+for _size in ((TILE//2, TILE), (TILE, TILE), (TILE, TILE*2)):
+    PLAYER_MASKS.build(_size, _size, lambda surf, r: pygame.draw.rect(surf, (255,255,255), r, border_radius=PLAYER_RADIUS))
+precise_pvp = PRECISE_PVP
 
 STAR_SPAWNS = [
     (SCREEN_W//2, SCREEN_H//2-80),
@@ -65,13 +82,14 @@ class Player:
         self.coins = 0
         self.respawn = 0
         self.score = 0
+        self.contacts = ContactCache()  # platforms near the player, for the wall-jump check
 
     def rect(self):
         h = TILE if 'mini' in self.power else (TILE if self.state=='small' else TILE*2)
         w = TILE//2 if 'mini' in self.power else TILE
         return pygame.Rect(int(self.x), int(self.y), w, h)
 
-    def update(self, keys, level, other, items, drops):
+    def update(self, keys, level, items, drops):
         if self.dead or self.respawn: return
         if self.invuln: self.invuln -= 1
         
@@ -79,27 +97,19 @@ class Player:
         left = keys.get('left')
         right = keys.get('right')
         run = keys.get('run')
-        acc = RUN_ACC * (1.3 if run else 1)
-        
-        if left:   self.vx -= acc
-        if right:  self.vx += acc
+        self.vx = walk(self.vx, (1 if right else 0) - (1 if left else 0), PLAYER_PROFILE, boost=1.3 if run else 1)
         self.facing = -1 if left else (1 if right else self.facing)
         
-        if not (left or right):
-            self.vx /= FRICTION
-            if abs(self.vx) < 0.1: self.vx = 0
-        self.vx = max(-MAX_RUN, min(self.vx, MAX_RUN))
-        
         # --- Wall jump detection ---
         touching_wall, wall_dir = self.check_wall_collision(level)
         
         # --- Jump ---
         if keys.get('jump'):
             if self.ground:
-                self.vy = JUMP_VEL * (1.25 if 'mini' in self.power else 1)
+                self.vy, _ = start_jump(PLAYER_PROFILE, 1.25 if 'mini' in self.power else 1)
                 self.jumping = True
             elif touching_wall and not self.jumping and self.wall_timer==0:
-                self.vy = JUMP_VEL * 0.92
+                self.vy, _ = start_jump(PLAYER_PROFILE, 0.92)
                 self.vx = 10 * (-wall_dir)
                 self.wall_timer = 12
                 
@@ -107,9 +117,7 @@ class Player:
         if not keys.get('jump'): self.jumping = False
         
         # --- Gravity ---
-        self.vy += GRAVITY * (0.5 if 'mini' in self.power else 1)
-        if self.vy > 18: self.vy = 18
-        if self.vy < -25: self.vy = -25
+        self.vy, _ = fall(self.vy, False, 0, PLAYER_PROFILE, gravity_scale=0.5 if 'mini' in self.power else 1)
         
         # --- Ground pound ---
         if keys.get('down') and not self.ground and not self.gp:
@@ -118,15 +126,8 @@ class Player:
         if self.gp and self.ground:
             self.gp = False
             
-        # --- Apply movement ---
-        oldx, oldy = self.x, self.y
-        self.x += self.vx
-        self.y += self.vy
-        pr = self.rect()
-        
-        # --- Collision detection ---
-        self.ground = False
-        self.handle_collisions(level, oldx, oldy, pr)
+        # --- Apply movement (swept) ---
+        self.handle_collisions(level)
         
         # --- Wrap pipes ---
         if self.x < -TILE:  self.x = SCREEN_W-TILE
@@ -135,9 +136,6 @@ class Player:
         # --- Fireballs ---
         self.handle_fireballs(keys)
         
-        # --- PvP interactions ---
-        self.handle_pvp(other, drops, items)
-        
         # --- Respawn handling ---
         if self.y > SCREEN_H+TILE*2:
             self.die(items, drops)
@@ -154,40 +152,25 @@ class Player:
         touching_wall = False
         wall_dir = 0
         pr = self.rect()
+        right = pr.move(2,0)
         
-        for plat in level:
-            r = pygame.Rect(plat['x'], plat['y'], plat['w'], plat['h'])
-            if pr.move(2,0).colliderect(r):
-                touching_wall = True
-                wall_dir = 1
-            elif pr.move(-2,0).colliderect(r):
+        # pr.inflate(4,0) covers both pr.move(2,0) and pr.move(-2,0)
+        probe = pr.inflate(4,0)
+        for platrect in self.contacts.near(probe, level.grid.query_rect, level.rect_of):
+            if probe.colliderect(platrect):
                 touching_wall = True
-                wall_dir = -1
+                wall_dir = 1 if right.colliderect(platrect) else -1
                 
         return touching_wall, wall_dir
         
-    def handle_collisions(self, level, oldx, oldy, pr):
-        for plat in level:
-            platrect = pygame.Rect(plat['x'], plat['y'], plat['w'], plat['h'])
-            
-            if pr.colliderect(platrect):
-                # Collision from above
-                if oldy+pr.height <= platrect.y and self.vy >= 0:
-                    self.y = platrect.y - pr.height
-                    self.vy = 0
-                    self.ground = True
-                # Collision from right
-                elif oldx+pr.width <= platrect.x and self.vx > 0:
-                    self.x = platrect.x - pr.width
-                    self.vx = 0
-                # Collision from left
-                elif oldx >= platrect.x+platrect.width and self.vx < 0:
-                    self.x = platrect.x + platrect.width
-                    self.vx = 0
-                # Collision from below
-                elif oldy >= platrect.y+platrect.height and self.vy < 0:
-                    self.y = platrect.y + platrect.height
-                    self.vy = 0
+    def handle_collisions(self, level):
+        w, h = self.rect().size
+        self.x, self.y, contacts = move_box(self.x, self.y, w, h, self.vx, self.vy, level)
+        if contacts.landed or contacts.ceiling:
+            self.vy = 0
+        if contacts.wall:
+            self.vx = 0
+        self.ground = contacts.landed
                     
     def handle_fireballs(self, keys):
         if 'fire' in self.power and keys.get('fire') and self.shoot_cool == 0:
@@ -212,11 +195,14 @@ class Player:
         self.fireballs = [f for f in self.fireballs if 0<f['x']<SCREEN_W and f['ttl']>0]
         
     def handle_pvp(self, other, drops, items):
-        if other and not self.dead and not other.dead:
+        # PvP stage resolver, self attacking other
+        if not self.dead and not other.dead:
             pr = self.rect()
             orc = other.rect()
             
             if pr.colliderect(orc):
+                if precise_pvp and PLAYER_MASKS.overlap(pr.size, pr, orc.size, orc) is False:
+                    return
                 # Stomp attack
                 if self.vy > 2 and self.y+pr.height-12 < other.y+8:
                     if other.invuln==0:
@@ -249,25 +235,15 @@ class Player:
             
         # Star drop
         n = 3 if gp else 1
-        drops.append({
-            'x':self.x+TILE//2, 
-            'y':self.y, 
-            'n':min(n,self.stars), 
-            'vx':random.randint(-5,5),
-            'timer': 120
-        })
+        drop = StarDrop(self.x+TILE//2, self.y, min(n,self.stars), random.randint(-5,5))
+        drop.timer = 120
+        drops.append(drop)
         self.stars = max(0, self.stars-n)
         
     def die(self, items, drops):
         self.dead = 1
         self.lives -= 1
-        drops.append({
-            'x':self.x+TILE//2, 
-            'y':self.y, 
-            'n':self.stars, 
-            'vx':random.randint(-7,7),
-            'timer': 180
-        })
+        drops.append(StarDrop(self.x+TILE//2, self.y, self.stars, random.randint(-7,7)))
         self.stars = 0
         self.respawn = FPS*2
         self.x, self.y = -1000, -1000
@@ -485,6 +461,7 @@ class Game:
         self.net_thread.start()
         
     def handle_events(self):
+        global precise_pvp
         for event in pygame.event.get():
             if event.type == pygame.QUIT: 
                 self.running = False
@@ -496,6 +473,9 @@ class Game:
                     if event.key == kk: 
                         self.keys[k] = val
                         
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                    precise_pvp = not precise_pvp
+
                 # Restart game on game over
                 if self.game_over and event.type == pygame.KEYDOWN and event.key == pygame.K_r:
                     self.reset_game()
@@ -545,12 +525,12 @@ class Game:
         self.drops = [drop for drop in self.drops if drop.n > 0 and drop.timer > 0]
         
         # Update player
-        other = None
+        self.p1.update(self.keys, LEVEL_COLLISION, self.items, self.drops)
+        
+        # PvP: every overlapping pair of players, local and remote
         with remote_lock:
-            if remotes:
-                other = list(remotes.values())[0]
-                
-        self.p1.update(self.keys, LEVEL, other, self.items, self.drops)
+            players = [self.p1] + list(remotes.values())
+        run_pvp(players, lambda attacker, victim: attacker.handle_pvp(victim, self.drops, self.items))
         
     def draw_game(self):
         # Background
@@ -571,12 +551,12 @@ class Game:
             drop.draw(self.win)
             
         # Players
-        pygame.draw.rect(self.win, self.p1.color, self.p1.rect(), border_radius=8)
+        pygame.draw.rect(self.win, self.p1.color, self.p1.rect(), border_radius=PLAYER_RADIUS)
         
         # Draw remote players
         with remote_lock:
             for pid, rp in remotes.items():
-                pygame.draw.rect(self.win, rp.color, rp.rect(), border_radius=8)
+                pygame.draw.rect(self.win, rp.color, rp.rect(), border_radius=PLAYER_RADIUS)
                 for f in rp.fireballs:
                     pygame.draw.circle(self.win, (255,100,0), (int(f['x']),int(f['y'])), 10)
                     
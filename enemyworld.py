@@ -0,0 +1,549 @@
+# enemyworld.py
+#
+# Struct-of-arrays enemy container for geminimario4k.py.
+# Positions, velocities, kind/state enums and timers live in NumPy arrays.
+# Gravity, integration, screen-edge turnaround and timer countdowns run as
+# whole-array passes; only platform collision is resolved per entity, and
+# shell hits come from one broad-phase pair pass per frame. The game keeps
+# player interaction and effects (score, sound, particles) and uses the
+# small mutators below to change an enemy's state.
+#
+# Activity levels: an idle shell resting on the ground sleeps (it would only
+# re-land on the same spot every frame) until it is kicked or woken. Enemies
+# outside the active region passed to step() are updated every LOD_STRIDE
+# frames, in turns set by a per-enemy phase, and settle the frames they owe
+# before their next move. A walker cruising along a floor settles in one
+# swept move when no turning point (wall, ledge, screen edge) lies on the
+# way; anything else replays its owed frames one by one. Either way a
+# throttled enemy ends up exactly where a full-rate one would, so nothing
+# jumps when it enters the view. Sliding shells, and anything near one,
+# always run at full rate so shell hits stay exact. The bookkeeping only
+# pays for itself in a big crowd, so below LOD_MIN_ENEMIES live enemies
+# everything runs at full rate.
+#
+# Positions stay whole pixels and are rounded half away from zero after
+# every move, the same as assigning a float to a pygame.Rect. Platform
+# contacts are swept (see sweptaabb.py) from the start of the frame to the
+# integrated position, so a long step cannot carry an enemy through a floor.
+#
+# Each enemy keeps a ContactCache (see contactcache.py) of the platforms
+# around it, so a walker pacing the same floor tests that floor instead of
+# querying the grid every frame. contact_stats() reports how often the
+# cached platforms were enough. Level geometry is static except for
+# kinematic platforms (kinematic.py); platform_moved() applies one of their
+# moves to the enemies and the caches it reaches.
+#
+# Run directly for a stress benchmark and a full-rate versus LOD check:
+#   python enemyworld.py
+
+import time
+
+import numpy as np
+import pygame
+
+from broadphase import overlapping_pairs
+from contactcache import ContactCache
+from sweptaabb import sweep, swept_bounds
+
+# Kinds
+ENEMY_GOOMBA = 0
+ENEMY_KOOPA  = 1
+
+# States
+ST_WALKING       = 0
+ST_SHELL_IDLE    = 1
+ST_SHELL_SLIDING = 2
+ST_STOMPED       = 3      # squashed goomba, removed when its timer runs out
+
+LOD_STRIDE    = 4         # frames between updates for enemies outside the active region
+LOD_WAKE_DIST = 160       # px; enemies this close to a sliding shell always run at full rate
+LOD_MIN_ENEMIES = 120     # live enemies below which throttling costs more than it saves (see check_lod)
+
+def _round_px(a):
+    return np.trunc(a + np.copysign(0.5, a))
+
+def _platform_rect(p):
+    return p['rect']
+
+# -----------------------------------------------------------------------------
+# ENEMY WORLD
+# -----------------------------------------------------------------------------
+
+class EnemyWorld:
+    def __init__(self, gravity, width, capacity=16, lod_min=LOD_MIN_ENEMIES):
+        self.gravity = gravity
+        self.width = width
+        self.lod_min = lod_min
+        self.n = 0
+        self.frame = 0
+        self.spawned = 0
+        self.contacts = []            # ContactCache per enemy, in index order
+        self._contact_grid = None     # the grid the caches were filled from
+        self._retired_contacts = [0, 0]  # hits, misses of removed enemies' caches
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        def grow(old, dtype):
+            new = np.zeros(capacity, dtype)
+            if old is not None:
+                new[:self.n] = old[:self.n]
+            return new
+        g = lambda name: getattr(self, name, None)
+        self.x = grow(g('x'), np.float64)
+        self.y = grow(g('y'), np.float64)
+        self.w = grow(g('w'), np.int32)
+        self.h = grow(g('h'), np.int32)
+        self.vx = grow(g('vx'), np.float64)
+        self.vy = grow(g('vy'), np.float64)
+        self.original_vx = grow(g('original_vx'), np.float64)
+        self.kind = grow(g('kind'), np.int8)
+        self.state = grow(g('state'), np.int8)
+        self.timer = grow(g('timer'), np.int32)
+        self.on_ground = grow(g('on_ground'), np.bool_)
+        self.alive = grow(g('alive'), np.bool_)
+        self.pending = grow(g('pending'), np.int32)     # frames owed to a throttled enemy
+        self.phase = grow(g('phase'), np.int32)         # frame in LOD_STRIDE a throttled enemy updates on
+        self.prev_x = grow(g('prev_x'), np.float64)       # position at the last snapshot(),
+        self.prev_bottom = grow(g('prev_bottom'), np.float64)  # for render interpolation
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.n
+
+    def spawn(self, kind, rect, vx):
+        if self.n == self.capacity:
+            self._alloc(self.capacity * 2)
+        i = self.n
+        self.x[i], self.y[i], self.w[i], self.h[i] = rect.x, rect.y, rect.width, rect.height
+        self.vx[i] = self.original_vx[i] = vx
+        self.vy[i] = 0
+        self.kind[i] = kind
+        self.state[i] = ST_WALKING
+        self.timer[i] = 0
+        self.on_ground[i] = False
+        self.alive[i] = True
+        self.pending[i] = 0
+        self.phase[i] = self.spawned % LOD_STRIDE
+        self.spawned += 1
+        self.prev_x[i], self.prev_bottom[i] = rect.x, rect.bottom
+        self.contacts.append(ContactCache())
+        self.n += 1
+        return i
+
+    def rect(self, i):
+        return pygame.Rect(int(self.x[i]), int(self.y[i]), int(self.w[i]), int(self.h[i]))
+
+    def snapshot(self):
+        """Remember current positions as the start of the next simulation step."""
+        n = self.n
+        self.prev_x[:n] = self.x[:n]
+        self.prev_bottom[:n] = self.y[:n] + self.h[:n]
+
+    def draw_rect(self, i, alpha):
+        """Rect of enemy i interpolated alpha (0..1) of the way from its snapshot to now."""
+        r = pygame.Rect(0, 0, int(self.w[i]), int(self.h[i]))
+        r.x = self.prev_x[i] + (self.x[i] - self.prev_x[i]) * alpha
+        r.bottom = self.prev_bottom[i] + (self.y[i] + self.h[i] - self.prev_bottom[i]) * alpha
+        return r
+
+    # --- State changes used by the game ---------------------------------------
+
+    def kill(self, i):
+        self.alive[i] = False
+
+    def stomp_goomba(self, i, frames):
+        self.state[i] = ST_STOMPED
+        self.timer[i] = frames
+        self.vx[i] = 0
+
+    def to_shell(self, i, shell_height):
+        bottom = self.y[i] + self.h[i]
+        self.state[i] = ST_SHELL_IDLE
+        self.vx[i] = 0
+        self.h[i] = shell_height
+        self.y[i] = bottom - shell_height
+
+    def kick(self, i, vx):
+        self.state[i] = ST_SHELL_SLIDING
+        self.vx[i] = vx
+
+    def stop_shell(self, i):
+        self.state[i] = ST_SHELL_IDLE
+        self.vx[i] = 0
+
+    def wake(self, i):
+        """Simulate a resting enemy again next step, e.g. when what it stands on moves."""
+        self.on_ground[i] = False
+
+    def platform_moved(self, old, new, item=None):
+        """
+        A kinematic platform moved from rect old to new: enemies standing on
+        it move with it, enemies it ran into are pushed out (see
+        kinematic.carry), and both are woken. Contact caches the platform now
+        reaches are dropped unless they already hold item, the moved platform.
+        """
+        n = self.n
+        if n == 0:
+            return
+        x, y, w, h = self.x[:n], self.y[:n], self.w[:n], self.h[:n]
+        alive = self.alive[:n]
+        riders = alive & (y + h == old.top) & (x + w > old.left) & (x < old.right)
+        x[riders] += new.x - old.x
+        y[riders] += new.y - old.y
+        hit = alive & ~riders & (x < new.right) & (x + w > new.left) & (y < new.bottom) & (y + h > new.top)
+        if hit.any():
+            if new.y < old.y:
+                y[hit] = new.top - h[hit]
+            elif new.y > old.y:
+                y[hit] = new.bottom
+            elif new.x > old.x:
+                x[hit] = new.right
+            else:
+                x[hit] = new.left - w[hit]
+        self.on_ground[:n][riders | hit] = False
+        reach = new.inflate(2, 2)
+        for cache in self.contacts:
+            if cache.box is not None and cache.box.colliderect(reach):
+                if item is None or not any(p is item for p in cache.items):
+                    cache.clear()
+
+    def compact(self):
+        """Drop dead enemies, keeping the survivors in spawn order."""
+        n = self.n
+        keep = self.alive[:n].copy()
+        if keep.all():
+            return
+        count = int(keep.sum())
+        for name in ('x', 'y', 'w', 'h', 'vx', 'vy', 'original_vx', 'kind', 'state',
+                     'timer', 'on_ground', 'alive', 'pending', 'phase', 'prev_x', 'prev_bottom'):
+            a = getattr(self, name)
+            a[:count] = a[:n][keep]
+        kept = []
+        for cache, k in zip(self.contacts, keep.tolist()):
+            if k:
+                kept.append(cache)
+            else:
+                self._retired_contacts[0] += cache.hits
+                self._retired_contacts[1] += cache.misses
+        self.contacts = kept
+        self.n = count
+
+    def contact_stats(self):
+        """(hits, misses) of the enemies' contact caches since the world was created."""
+        hits, misses = self._retired_contacts
+        for cache in self.contacts:
+            hits += cache.hits
+            misses += cache.misses
+        return hits, misses
+
+    # --- Simulation -----------------------------------------------------------
+
+    def step(self, f, grid, active_rect=None):
+        """
+        Advance every enemy by one frame. f is the frame-time scale (1.0 at
+        60 fps); grid is the level's SpatialGrid. Enemies outside active_rect
+        (a pygame.Rect, normally the view plus a margin) are throttled; with
+        None, or fewer than lod_min live enemies, every awake enemy runs at
+        full rate. Throttled enemies catch up
+        in steps of f, so f should be the fixed simulation step.
+        Returns the indices of enemies knocked out by sliding shells this frame,
+        ascending; they are marked dead and removed by the next compact().
+        """
+        n = self.n
+        if n == 0:
+            return []
+        if grid is not self._contact_grid:
+            # New level geometry: nothing cached from the old grid applies
+            for cache in self.contacts:
+                cache.clear()
+            self._contact_grid = grid
+        vy = self.vy[:n]
+        state, alive = self.state[:n], self.alive[:n]
+        self.frame += 1
+
+        # Timers: squashed goombas count down and disappear
+        stomped = state == ST_STOMPED
+        if stomped.any():
+            timer = self.timer[:n]
+            timer[stomped] -= 1
+            alive[stomped & (timer <= 0)] = False
+
+        walking = (state == ST_WALKING) & alive
+        sliding = (state == ST_SHELL_SLIDING) & alive
+        idle = (state == ST_SHELL_IDLE) & alive
+        if active_rect is not None and np.count_nonzero(alive) < self.lod_min:
+            active_rect = None    # owed frames still settle on the next move
+
+        # Activity: who moves this frame, and by how many frames
+        asleep = idle & self.on_ground[:n] & (vy == 0)
+        awake = (walking | sliding | idle) & ~asleep
+        due = self._due(awake, sliding, active_rect, n)
+        pending = self.pending[:n]
+        pending[awake] += 1
+        steps = np.where(due, pending, 0)
+        pending[due | ~awake] = 0
+
+        # Throttled enemies settle the frames they owe before this one
+        owed = steps > 1
+        done = np.zeros(n, np.bool_)
+        if owed.any():
+            done = self._cruise(f, grid, owed & walking & self.on_ground[:n] & (vy == 0), steps, n)
+            replay = owed & ~done
+            for s in range(1, int(steps.max())):
+                self._frame(f, grid, replay & (steps > s), n)
+        self._frame(f, grid, due & ~done, n)
+        return self._shell_hits(walking, sliding)
+
+    def _due(self, awake, sliding, active_rect, n):
+        """Awake enemies that update this frame: everything active, the rest in turn."""
+        if active_rect is None:
+            return awake
+        x, y, w, h = self.x[:n], self.y[:n], self.w[:n], self.h[:n]
+        full = sliding | ((x < active_rect.right) & (x + w > active_rect.left) &
+                          (y < active_rect.bottom) & (y + h > active_rect.top))
+        if sliding.any():
+            cx, cy = x + w / 2, y + h / 2
+            dx = np.abs(cx[:, None] - cx[sliding][None, :])
+            dy = np.abs(cy[:, None] - cy[sliding][None, :])
+            full |= (np.maximum(dx, dy) <= LOD_WAKE_DIST).any(axis=1)
+        # Throttled enemies take turns by phase so their updates spread over the stride
+        turn = (self.phase[:n] + self.frame % LOD_STRIDE) % LOD_STRIDE == 0
+        return awake & (full | turn)
+
+    def _frame(self, f, grid, mask, n):
+        """One frame of movement for the enemies in mask."""
+        if not mask.any():
+            return
+        x, y, vx, vy = self.x[:n], self.y[:n], self.vx[:n], self.vy[:n]
+        state = self.state[:n]
+        walking = mask & (state == ST_WALKING)
+        sliding = mask & (state == ST_SHELL_SLIDING)
+
+        # Integration; _collide sweeps each enemy from its start position
+        x0, y0 = x.copy(), y.copy()
+        movers = walking | sliding
+        x[movers] = _round_px(x[movers] + vx[movers] * f)
+        vy[mask] += self.gravity * f
+        y[mask] = _round_px(y[mask] + vy[mask] * f)
+
+        # Sliding shells bounce off the screen edges
+        edge = sliding & ((x <= 0) | (x + self.w[:n] >= self.width))
+        vx[edge] *= -1
+
+        self._collide(x0, y0, grid, np.flatnonzero(mask))
+
+        # Walkers turn around at the screen edges
+        left = walking & (x <= 0) & (vx < 0)
+        right = walking & (x + self.w[:n] >= self.width) & (vx > 0)
+        turn = left | right
+        vx[turn] *= -1
+        self.original_vx[:n][turn & (self.kind[:n] == ENEMY_KOOPA)] *= -1
+
+        self._gap_check(grid, np.flatnonzero(walking & self.on_ground[:n]))
+
+    def _cruise(self, f, grid, mask, steps, n):
+        """
+        Settle the owed frames of grounded walkers in mask in one swept move.
+        A move that meets a wall, a ledge or a screen edge on the way is
+        undone; those enemies are left out of the returned mask and replay
+        their frames one by one instead.
+        """
+        if not mask.any():
+            return mask
+        x, y, vx, vy = self.x[:n], self.y[:n], self.vx[:n], self.vy[:n]
+        saved = [(a, a.copy()) for a in (x, y, vx, vy, self.original_vx[:n], self.on_ground[:n])]
+        x0, y0 = x.copy(), y.copy()
+        path = []                       # x after each owed frame, for the ledge checks
+        for s in range(int(steps[mask].max())):
+            m = mask & (steps > s)
+            x[m] = _round_px(x[m] + vx[m] * f)
+            vy[m] += self.gravity * f
+            y[m] = _round_px(y[m] + vy[m] * f)
+            path.append(x.copy())
+
+        turned = self._collide(x0, y0, grid, np.flatnonzero(mask))
+        w = self.w[:n]
+        settled = mask & self.on_ground[:n] & (y == y0) & (x > 0) & (x + w < self.width)
+        settled[turned] = False
+        for i in np.flatnonzero(settled).tolist():
+            v, k = vx[i], int(steps[i])
+            if not self._supported(grid, i, path[0][i], v, path[k - 1][i]):
+                if not all(self._supported(grid, i, path[s][i], v) for s in range(k)):
+                    settled[i] = False
+
+        undo = mask & ~settled
+        for a, old in saved:
+            a[undo] = old[undo]
+        return settled
+
+    def _shell_hits(self, walking, sliding):
+        """Walkers overlapping any sliding shell are knocked out, all at once."""
+        if not sliding.any():
+            return []
+        active = np.flatnonzero(walking | sliding)
+        a, b = overlapping_pairs(self.x[active], self.y[active], self.w[active], self.h[active])
+        a, b = active[a], active[b]
+        hit_a = walking[a] & sliding[b]
+        hit_b = sliding[a] & walking[b]
+        knocked = np.unique(np.concatenate((a[hit_a], b[hit_b])))
+        self.alive[knocked] = False
+        return knocked.tolist()
+
+    def _collide(self, x0, y0, grid, indices):
+        """Swept platform resolution for the given enemies. Returns the walkers that turned at a wall."""
+        xs, ys = self.x[indices].tolist(), self.y[indices].tolist()
+        x0s, y0s = x0[indices].tolist(), y0[indices].tolist()
+        ws, hs = self.w[indices].tolist(), self.h[indices].tolist()
+        vxs, vys = self.vx[indices].tolist(), self.vy[indices].tolist()
+        ovxs = self.original_vx[indices].tolist()
+        states, kinds = self.state[indices].tolist(), self.kind[indices].tolist()
+        grounds = self.on_ground[indices].tolist()
+        caches, query = self.contacts, grid.query_rect
+        turned = []
+
+        for j, i in enumerate(indices.tolist()):
+            st = states[j]
+            w, h = ws[j], hs[j]
+            dx, dy = xs[j] - x0s[j], ys[j] - y0s[j]
+            area = pygame.Rect(swept_bounds(x0s[j], y0s[j], w, h, dx, dy))
+            sx, sy, contacts = sweep(x0s[j], y0s[j], w, h, dx, dy, caches[i].near(area, query, _platform_rect))
+            r = pygame.Rect(0, 0, w, h)
+            r.x, r.y = sx, sy
+            landed = False
+            for nx, ny, p in contacts:
+                if ny:
+                    vys[j] = 0
+                    landed = landed or ny < 0
+                elif st == ST_SHELL_SLIDING:
+                    vxs[j] *= -1
+                elif st == ST_WALKING and (landed or grounds[j]):
+                    vxs[j] *= -1
+                    if kinds[j] == ENEMY_KOOPA: ovxs[j] *= -1
+                    turned.append(i)
+            grounds[j] = landed
+            xs[j], ys[j] = r.x, r.y
+
+        self.x[indices] = xs
+        self.y[indices] = ys
+        self.vx[indices] = vxs
+        self.vy[indices] = vys
+        self.original_vx[indices] = ovxs
+        self.on_ground[indices] = grounds
+        return turned
+
+    def _supported(self, grid, i, x, vx, to_x=None):
+        """
+        Is there ground just ahead of enemy i standing at x, walking with vx?
+        With to_x, is one platform under the probe all the way from x to to_x?
+        """
+        w = int(self.w[i])
+        ahead = w // 2 + vx * (w * 0.6)
+        probe_x = int(x) + ahead
+        end_x = probe_x if to_x is None else int(to_x) + ahead
+        probe_y = int(self.y[i]) + int(self.h[i]) + 5
+        for p in self.contacts[i].near_point(probe_x, probe_y, grid.query_point):
+            r = p['rect']
+            if r.collidepoint(probe_x, probe_y) and r.collidepoint(end_x, probe_y):
+                return True
+        return False
+
+    def _gap_check(self, grid, indices):
+        """Walkers on the ground turn around instead of walking off a ledge."""
+        for i in indices.tolist():
+            vx = self.vx[i]
+            if self._supported(grid, i, self.x[i], vx):
+                continue
+            self.vx[i] = -vx
+            if self.kind[i] == ENEMY_KOOPA:
+                self.original_vx[i] *= -1
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+
+def benchmark(counts=(10, 100, 1000), frames=300):
+    import random
+    from spatialgrid import SpatialGrid
+
+    width, height = 800, 600
+    level = [{'rect': pygame.Rect(0, height - 40, width, 40)}]
+    rng = random.Random(1)
+    for _ in range(40):
+        level.append({'rect': pygame.Rect(rng.randrange(0, width - 80), rng.randrange(150, height - 120), 80, 20)})
+    grid = SpatialGrid(level, min_items=0)
+
+    print(f"{'enemies':>8} {'frame ms':>9} {'per enemy us':>13} {'contact hits':>13}")
+    for count in counts:
+        world = EnemyWorld(gravity=0.75, width=width)
+        for k in range(count):
+            kind = ENEMY_KOOPA if k % 3 == 0 else ENEMY_GOOMBA
+            h = 42 if kind == ENEMY_KOOPA else 30
+            i = world.spawn(kind, pygame.Rect(rng.randrange(0, width - 30), rng.randrange(0, height - 100), 30, h),
+                            rng.choice((-1.8, 1.8)))
+            if kind == ENEMY_KOOPA and k % 2 == 0:
+                world.to_shell(i, 24)
+                if k % 4 == 0:
+                    world.kick(i, 7.0)
+        start = time.perf_counter()
+        for frame in range(frames):
+            world.step(1.0, grid)
+            # Keep the population steady so every frame does the full work
+            world.alive[:world.n] = True
+        elapsed = (time.perf_counter() - start) / frames
+        hits, misses = world.contact_stats()
+        print(f"{count:>8} {elapsed * 1000:>9.3f} {elapsed / count * 1e6:>13.2f} {hits / max(1, hits + misses):>12.0%}")
+
+def check_lod(frames=600, counts=(80, 300, 1000)):
+    """
+    Run one crowd at full rate and copies with a panning active region, and
+    check that every enemy inside the view is exactly where the full-rate
+    copy has it. Enemies outside the view may still owe frames. One copy
+    always throttles, the other only above LOD_MIN_ENEMIES, as the games do.
+    """
+    import random
+    from spatialgrid import SpatialGrid
+
+    width, height, view_w = 3200, 600, 800
+    print(f"{'enemies':>8} {'full ms':>8} {'LOD ms':>8} {'auto ms':>8} {'samples':>8} {'drift':>6}")
+    for count in counts:
+        rng = random.Random(2)
+        level = [{'rect': pygame.Rect(0, height - 40, width, 40)}]
+        for _ in range(60):
+            level.append({'rect': pygame.Rect(rng.randrange(0, width - 160), rng.randrange(200, height - 120),
+                                              rng.choice((96, 128, 160)), 20)})
+        grid = SpatialGrid(level)
+        worlds = [EnemyWorld(gravity=0.75, width=width, lod_min=lod_min)
+                  for lod_min in (LOD_MIN_ENEMIES, 0, LOD_MIN_ENEMIES)]
+        for k in range(count):
+            kind = ENEMY_KOOPA if k % 3 == 0 else ENEMY_GOOMBA
+            rect = pygame.Rect(rng.randrange(0, width - 30), rng.randrange(0, height - 100), 30, 42 if kind else 30)
+            vx = rng.choice((-1.8, 1.8))
+            for world in worlds:
+                world.spawn(kind, rect, vx)
+        full = worlds[0]
+
+        worst = compared = 0
+        times = [0.0] * len(worlds)
+        for frame in range(frames):
+            # The view pans right then back, so enemies keep entering and leaving it
+            pan = (frame * 4) % (2 * (width - view_w))
+            view = pygame.Rect(min(pan, 2 * (width - view_w) - pan), 0, view_w, height)
+            for k, world in enumerate(worlds):
+                start = time.perf_counter()
+                world.step(1.0, grid, view.inflate(128, 128) if k else None)
+                times[k] += time.perf_counter() - start
+            for i in range(full.n):
+                r = full.rect(i)
+                if view.colliderect(r):
+                    compared += 1
+                    for world in worlds[1:]:
+                        q = world.rect(i)
+                        worst = max(worst, abs(r.x - q.x), abs(r.y - q.y))
+
+        ms = [t / frames * 1000 for t in times]
+        print(f"{count:>8} {ms[0]:>8.3f} {ms[1]:>8.3f} {ms[2]:>8.3f} {compared:>8} {worst:>4} px")
+        assert worst == 0, "throttled enemies drifted inside the view"
+
+if __name__ == "__main__":
+    benchmark()
+    check_lod()
@@ -0,0 +1,16 @@
+# gamemodule.py
+#
+# Load one of the game scripts as a module. Most of them have file names
+# that are not valid identifiers (dots, apostrophes), so a plain import
+# does not work.
+
+import importlib.util
+import os
+
+def load_game_module(filename, name=None):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    name = name or os.path.splitext(os.path.basename(filename))[0].replace('.', '_').replace("'", '')
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
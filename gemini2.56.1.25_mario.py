@@ -1,6 +1,8 @@
 import pygame
 import sys
 import random
+from levelcompile import merge_level
+from platformphysics import MovementProfile, PlatformLevel, walk, start_jump, fall, move_box
 
 # Initialize Pygame
 pygame.init()
@@ -21,6 +23,11 @@ GRAVITY_PLAYER = 0.72         # Gravity affecting player
 GRAVITY_ENEMY = 0.75          # Gravity affecting enemies
 GRAVITY_ITEM = 0.4            # Gravity affecting items like mushrooms
 
+PLAYER_PROFILE = MovementProfile('gemini2.56', max_speed=PLAYER_MAX_WALK_SPEED, accel=PLAYER_ACCEL,
+                                 turn_accel=PLAYER_ACCEL * 2, decel=PLAYER_DECEL, gravity=GRAVITY_PLAYER,
+                                 jump_velocity=PLAYER_JUMP_INITIAL, jump_hold_force=PLAYER_JUMP_HOLD_FORCE,
+                                 jump_hold_frames=PLAYER_JUMP_HOLD_FRAMES_MAX, max_fall=15, ceiling_vy=1.5)
+
 ENEMY_BASE_SPEED = 1.8
 KOOPA_SHELL_SPEED = 7.0
 STOMP_BOUNCE = -8            # How high Mario bounces after stomping an enemy
@@ -127,6 +134,9 @@ levels_platforms_data = [
     ],
 ]
 current_level_platforms = []
+collision_platforms = [] # current_level_platforms with same-type solids merged, built in reset_level
+platform_level = PlatformLevel([]) # Swept-collision view of collision_platforms, rebuilt in reset_level
+INTERACTIVE_BLOCK_TYPES = ('question', 'brick') # never merged into the surrounding solids
 
 # Goal Tape (SMW Style)
 GOAL_TAPE_WIDTH = 10
@@ -265,7 +275,7 @@ def spawn_item(item_type, pos_rect):
 
 
 def reset_level(index):
-    global current_level_platforms, enemies, player_rect, player_vy, player_vx
+    global current_level_platforms, collision_platforms, platform_level, enemies, player_rect, player_vy, player_vx
     global level_start_time, items, on_ground, player_state # Don't reset score or lives here
     global goal_tape_y_offset, goal_tape_direction
 
@@ -280,6 +290,9 @@ def reset_level(index):
             properties['original_y'] = platform_rect.y
             properties['hit_timer'] = 0
         current_level_platforms.append({'rect': platform_rect, 'type': platform_type, 'original_y_ref': platform_rect.y, **properties})
+    collision_platforms = merge_level(current_level_platforms,
+                                      interactive=lambda p: p['type'] in INTERACTIVE_BLOCK_TYPES)
+    platform_level = PlatformLevel(collision_platforms)
 
     # Player position and state reset on new level (not on death within level before this func)
     # Player state (small/super) should persist if just moving to next level,
@@ -948,9 +961,8 @@ while running:
             elif state == PLAYING:
                 if event.key == pygame.K_SPACE: # Jump
                     if on_ground:
-                        player_vy = PLAYER_JUMP_INITIAL
+                        player_vy, jump_hold_frames_count = start_jump(PLAYER_PROFILE)
                         on_ground = False
-                        jump_hold_frames_count = PLAYER_JUMP_HOLD_FRAMES_MAX
                         create_particles(player_rect.centerx, player_rect.bottom, WHITE, 8, intensity=0.8)
                 # Placeholder for using stored item (SMW uses X or A)
                 # if event.key == pygame.K_x and stored_item_type:
@@ -1013,38 +1025,23 @@ while running:
 
     elif state == PLAYING:
         # Horizontal movement with acceleration/deceleration
-        target_vx = 0
+        direction = 0
         if keys[pygame.K_LEFT]:
-            target_vx = -PLAYER_MAX_WALK_SPEED
+            direction = -1
             facing_right = False
         if keys[pygame.K_RIGHT]:
-            target_vx = PLAYER_MAX_WALK_SPEED
+            direction = 1
             facing_right = True
-
-        if target_vx != 0: # Accelerating
-            if abs(player_vx) < abs(target_vx):
-                player_vx += PLAYER_ACCEL * (1 if target_vx > 0 else -1)
-                player_vx = max(-abs(target_vx), min(abs(target_vx), player_vx)) # Clamp to target_vx magnitude
-            elif (player_vx > 0 and target_vx < 0) or (player_vx < 0 and target_vx > 0) : # 빠르게 방향 전환
-                 player_vx += PLAYER_ACCEL * 2 * (1 if target_vx > 0 else -1) # Faster turn
-        else: # Decelerating
-            if abs(player_vx) > PLAYER_DECEL:
-                player_vx -= PLAYER_DECEL * (1 if player_vx > 0 else -1)
-            else:
-                player_vx = 0
-        
-        player_rect.x += player_vx * (60 * actual_dt_for_physics)
+        player_vx = walk(player_vx, direction, PLAYER_PROFILE, 60 * actual_dt_for_physics)
 
         # Vertical movement (Jump & Gravity)
-        if keys[pygame.K_SPACE] and jump_hold_frames_count > 0 and player_vy < 0: # Apply jump hold force if still ascending
-            player_vy += PLAYER_JUMP_HOLD_FORCE # Negative force is upward
-            jump_hold_frames_count -= 1
-        else:
-            jump_hold_frames_count = 0 # Stop applying hold force if key released or max duration reached
+        player_vy, jump_hold_frames_count = fall(player_vy, keys[pygame.K_SPACE], jump_hold_frames_count,
+                                                 PLAYER_PROFILE, 60 * actual_dt_for_physics)
 
-        player_vy += GRAVITY_PLAYER * (60 * actual_dt_for_physics)
-        player_vy = min(player_vy, 15) # Terminal velocity
-        player_rect.y += player_vy * (60 * actual_dt_for_physics)
+        # Swept move: contacts come back earliest first, so no step size tunnels through a platform
+        player_rect.x, player_rect.y, contacts = move_box(player_rect.x, player_rect.y, player_rect.width, player_rect.height,
+                                                          player_vx * (60 * actual_dt_for_physics),
+                                                          player_vy * (60 * actual_dt_for_physics), platform_level)
         
         # Boundary check (sides of screen) - SMW usually lets you go slightly off-screen if level scrolls
         if player_rect.left < 0: player_rect.left = 0
@@ -1060,54 +1057,39 @@ while running:
         on_ground_this_frame = False
         player_collided_horizontally = False
 
-        # Sort platforms by Y then X - can sometimes help with tricky corner cases but not essential here
-        # current_level_platforms.sort(key=lambda p: (p['rect'].top, p['rect'].left))
-
-        for p_data in current_level_platforms:
+        for normal_x, normal_y, p_data in contacts.hits:
             platform_rect = p_data['rect']
-            if player_rect.colliderect(platform_rect):
-                # Vertical collision (landing or hitting head)
-                if player_vy > 0 and player_rect.bottom - player_vy * (60*actual_dt_for_physics) <= platform_rect.top +1 : # Landing (+1 for precision)
-                    player_rect.bottom = platform_rect.top
-                    player_vy = 0
-                    on_ground_this_frame = True
-                    if not on_ground: create_particles(player_rect.midbottom[0], player_rect.bottom, WHITE, 3, intensity=0.3) # landing puff
-
-                elif player_vy < 0 and player_rect.top - player_vy * (60*actual_dt_for_physics) >= platform_rect.bottom -1 : # Hitting head
-                    player_rect.top = platform_rect.bottom
-                    player_vy = 1.5 # Bonk head, fall back down
+            if normal_y < 0: # Landing
+                player_vy = 0
+                on_ground_this_frame = True
+                if not on_ground: create_particles(player_rect.midbottom[0], player_rect.bottom, WHITE, 3, intensity=0.3) # landing puff
+
+            elif normal_y > 0: # Hitting head
+                player_vy = PLAYER_PROFILE.ceiling_vy # Bonk head, fall back down
+                
+                if p_data['type'] == 'question' and p_data.get('active', False):
+                    p_data['active'] = False
+                    p_data['hit_timer'] = 20 # Frames for block bump animation
+                    create_particles(platform_rect.centerx, platform_rect.top, QUESTION_BLOCK_YELLOW, 15, intensity=0.8)
+                    score += 100 # For hitting block
                     
-                    if p_data['type'] == 'question' and p_data.get('active', False):
-                        p_data['active'] = False
-                        p_data['hit_timer'] = 20 # Frames for block bump animation
-                        create_particles(platform_rect.centerx, platform_rect.top, QUESTION_BLOCK_YELLOW, 15, intensity=0.8)
-                        score += 100 # For hitting block
-                        
-                        content = p_data.get('content', 'coin')
-                        if content == 'powerup':
-                            if player_state == S_SMALL:
-                                spawn_item('mushroom', platform_rect)
-                            else: # Player is Super, spawn coin or future powerup (e.g. Cape Feather)
-                                spawn_item('coin_anim', platform_rect)
-                                score += 100 # For coin from block
-                        elif content == 'coin':
+                    content = p_data.get('content', 'coin')
+                    if content == 'powerup':
+                        if player_state == S_SMALL:
+                            spawn_item('mushroom', platform_rect)
+                        else: # Player is Super, spawn coin or future powerup (e.g. Cape Feather)
                             spawn_item('coin_anim', platform_rect)
                             score += 100 # For coin from block
+                    elif content == 'coin':
+                        spawn_item('coin_anim', platform_rect)
+                        score += 100 # For coin from block
 
-                    elif p_data['type'] == 'brick': # Breakable bricks if super (TODO)
-                         create_particles(platform_rect.centerx, player_rect.top, PLATFORM_BRICK_MORTAR, 8)
-                
-                # Horizontal collision (after vertical resolved as much as possible)
-                # Re-check collision, as vertical adjustment might have resolved it
-                if player_rect.colliderect(platform_rect): # Check again after vertical resolve
-                    if player_vx > 0 and player_rect.right - player_vx * (60*actual_dt_for_physics) <= platform_rect.left +1:
-                        player_rect.right = platform_rect.left
-                        player_vx = 0 
-                        player_collided_horizontally = True
-                    elif player_vx < 0 and player_rect.left - player_vx * (60*actual_dt_for_physics) >= platform_rect.right -1:
-                        player_rect.left = platform_rect.right
-                        player_vx = 0
-                        player_collided_horizontally = True
+                elif p_data['type'] == 'brick': # Breakable bricks if super (TODO)
+                     create_particles(platform_rect.centerx, player_rect.top, PLATFORM_BRICK_MORTAR, 8)
+            
+            else: # Side of a wall
+                player_vx = 0
+                player_collided_horizontally = True
         on_ground = on_ground_this_frame
 
 
@@ -1119,7 +1101,16 @@ while running:
 
             # Koopa shell sliding logic before general movement for shells
             if enemy_data.get('state') == 'shell_sliding':
-                enemy_rect.x += enemy_data['vx'] * (60*actual_dt_for_physics)
+                # Shell can fall off ledges; it bounces off platform walls
+                enemy_data['vy'] += GRAVITY_ENEMY * (60*actual_dt_for_physics)
+                enemy_rect.x, enemy_rect.y, contacts = move_box(enemy_rect.x, enemy_rect.y, enemy_rect.width, enemy_rect.height,
+                                                                enemy_data['vx'] * (60*actual_dt_for_physics),
+                                                                enemy_data['vy'] * (60*actual_dt_for_physics), platform_level)
+                if contacts.landed or contacts.ceiling:
+                    enemy_data['vy'] = 0
+                if contacts.wall:
+                    enemy_data['vx'] *= -1
+                enemy_data['on_ground'] = contacts.landed
                 # Shell collision with other enemies
                 for j in range(len(enemies) - 1, -1, -1):
                     if i == j: continue # Don't collide with self
@@ -1135,28 +1126,6 @@ while running:
                 # Shell collision with walls (simple screen bounds or platforms)
                 if enemy_rect.left <= 0 or enemy_rect.right >= WIDTH:
                     enemy_data['vx'] *= -1
-                for p_data in current_level_platforms: # Shell hits platform wall
-                    plat_rect = p_data['rect']
-                    if enemy_rect.colliderect(plat_rect):
-                        if (enemy_data['vx'] > 0 and enemy_rect.right > plat_rect.left and enemy_rect.left < plat_rect.left) or \
-                           (enemy_data['vx'] < 0 and enemy_rect.left < plat_rect.right and enemy_rect.right > plat_rect.right):
-                            enemy_data['vx'] *= -1
-                            # Minor repositioning to prevent sticking
-                            if enemy_data['vx'] < 0: enemy_rect.left = plat_rect.right 
-                            else: enemy_rect.right = plat_rect.left
-                            break 
-                # Shell can fall off ledges
-                enemy_data['vy'] += GRAVITY_ENEMY * (60*actual_dt_for_physics)
-                enemy_rect.y += enemy_data['vy'] * (60*actual_dt_for_physics)
-                # Shell platform collision (landing) - simplified
-                shell_on_ground = False
-                for p_data in current_level_platforms:
-                    if enemy_rect.colliderect(p_data['rect']) and enemy_data['vy'] > 0 and enemy_rect.bottom - enemy_data['vy'] * (60*actual_dt_for_physics) <= p_data['rect'].top +1:
-                        enemy_rect.bottom = p_data['rect'].top
-                        enemy_data['vy'] = 0
-                        shell_on_ground = True
-                        break
-                enemy_data['on_ground'] = shell_on_ground
 
 
             # Stomped Goomba or idle Koopa shell logic
@@ -1167,15 +1136,11 @@ while running:
                 continue
             elif enemy_data.get('state') == 'shell_idle': # Koopa shell is idle, apply gravity
                 enemy_data['vy'] += GRAVITY_ENEMY * (60*actual_dt_for_physics)
-                enemy_rect.y += enemy_data['vy'] * (60*actual_dt_for_physics)
-                shell_on_ground = False
-                for p_data in current_level_platforms:
-                    if enemy_rect.colliderect(p_data['rect']) and enemy_data['vy'] > 0 and enemy_rect.bottom - enemy_data['vy']*(60*actual_dt_for_physics) <= p_data['rect'].top+1:
-                        enemy_rect.bottom = p_data['rect'].top
-                        enemy_data['vy'] = 0
-                        shell_on_ground = True
-                        break
-                enemy_data['on_ground'] = shell_on_ground
+                enemy_rect.x, enemy_rect.y, contacts = move_box(enemy_rect.x, enemy_rect.y, enemy_rect.width, enemy_rect.height,
+                                                                0, enemy_data['vy'] * (60*actual_dt_for_physics), platform_level)
+                if contacts.landed:
+                    enemy_data['vy'] = 0
+                enemy_data['on_ground'] = contacts.landed
                  # Check for player kicking the idle shell
                 if player_rect.colliderect(enemy_rect) and not player_invincible:
                     enemy_data['state'] = 'shell_sliding'
@@ -1187,28 +1152,17 @@ while running:
 
             # Normal enemy movement (Goomba, Walking Koopa)
             else:
-                enemy_rect.x += enemy_data['vx'] * (60*actual_dt_for_physics)
                 enemy_data['vy'] += GRAVITY_ENEMY * (60*actual_dt_for_physics)
-                enemy_rect.y += enemy_data['vy'] * (60*actual_dt_for_physics)
-            
-                enemy_on_ground_this_frame = False
-                for p_data in current_level_platforms:
-                    platform_rect_check = p_data['rect']
-                    if enemy_rect.colliderect(platform_rect_check):
-                        if enemy_data['vy'] >= 0 and enemy_rect.bottom - enemy_data['vy']*(60*actual_dt_for_physics) <= platform_rect_check.top +1:
-                            enemy_rect.bottom = platform_rect_check.top
-                            enemy_data['vy'] = 0
-                            enemy_on_ground_this_frame = True
-                        elif (enemy_data['vx'] > 0 and enemy_rect.right > platform_rect_check.left and enemy_rect.left < platform_rect_check.left) or \
-                             (enemy_data['vx'] < 0 and enemy_rect.left < platform_rect_check.right and enemy_rect.right > platform_rect_check.right):
-                            if enemy_on_ground_this_frame or enemy_data.get('on_ground'): # Only turn if on ground and hits wall, or was on ground previously
-                                enemy_data['vx'] *= -1
-                                if enemy_data['type'] == 'koopa': enemy_data['original_vx'] *= -1 # sync original
-                                # Push out of wall slightly
-                                if enemy_data['vx'] < 0: enemy_rect.left = platform_rect_check.right +1
-                                else: enemy_rect.right = platform_rect_check.left -1
-
-                enemy_data['on_ground'] = enemy_on_ground_this_frame
+                enemy_rect.x, enemy_rect.y, contacts = move_box(enemy_rect.x, enemy_rect.y, enemy_rect.width, enemy_rect.height,
+                                                                enemy_data['vx'] * (60*actual_dt_for_physics),
+                                                                enemy_data['vy'] * (60*actual_dt_for_physics), platform_level)
+                if contacts.landed or contacts.ceiling:
+                    enemy_data['vy'] = 0
+                # Only turn if on ground and hits wall, or was on ground previously
+                if contacts.wall and (contacts.landed or enemy_data.get('on_ground')):
+                    enemy_data['vx'] *= -1
+                    if enemy_data['type'] == 'koopa': enemy_data['original_vx'] *= -1 # sync original
+                enemy_data['on_ground'] = contacts.landed
 
                 # Turn at screen edges or if about to fall off a platform (simple check)
                 if enemy_rect.left <= 0 and enemy_data['vx'] < 0:
@@ -1222,7 +1176,7 @@ while running:
                     gap_check_x = enemy_rect.centerx + (enemy_data['vx'] * (enemy_rect.width * 0.6))
                     gap_check_y = enemy_rect.bottom + 5
                     found_ground_ahead = False
-                    for pform in current_level_platforms:
+                    for pform in collision_platforms:
                         if pform['rect'].collidepoint(gap_check_x, gap_check_y):
                             found_ground_ahead = True
                             break
@@ -1303,25 +1257,17 @@ while running:
 
             if item_data['type'] == 'mushroom':
                 # Mushroom movement
-                item_rect.x += item_data['vx'] * (60*actual_dt_for_physics)
                 item_data['vy'] += GRAVITY_ITEM * (60*actual_dt_for_physics)
-                item_rect.y += item_data['vy'] * (60*actual_dt_for_physics)
-
-                # Mushroom platform collision
-                item_on_ground = False
-                for p_data in current_level_platforms:
-                    platform_rect_item = p_data['rect']
-                    if item_rect.colliderect(platform_rect_item):
-                        if item_data['vy'] >= 0 and item_rect.bottom - item_data['vy']*(60*actual_dt_for_physics) <= platform_rect_item.top +1:
-                            item_rect.bottom = platform_rect_item.top
-                            item_data['vy'] = 0
-                            item_on_ground = True
-                        # Mushroom horizontal collision with walls (turn around)
-                        elif (item_data['vx'] > 0 and item_rect.right > platform_rect_item.left and item_rect.left < platform_rect_item.left) or \
-                             (item_data['vx'] < 0 and item_rect.left < platform_rect_item.right and item_rect.right > platform_rect_item.right):
-                            if item_on_ground: # Only turn if on ground and hits wall
-                                 item_data['vx'] *= -1
-                item_data['on_ground'] = item_on_ground
+                item_rect.x, item_rect.y, contacts = move_box(item_rect.x, item_rect.y, item_rect.width, item_rect.height,
+                                                              item_data['vx'] * (60*actual_dt_for_physics),
+                                                              item_data['vy'] * (60*actual_dt_for_physics), platform_level)
+
+                # Mushroom platform collision: land, and turn around at walls while on the ground
+                if contacts.landed or contacts.ceiling:
+                    item_data['vy'] = 0
+                if contacts.wall and contacts.landed:
+                    item_data['vx'] *= -1
+                item_data['on_ground'] = contacts.landed
                 if (item_rect.left <=0 and item_data['vx'] < 0) or (item_rect.right >= WIDTH and item_data['vx'] > 0) : item_data['vx'] *= -1
 
 
@@ -1,7 +1,14 @@
 import pygame
 import sys
+import time
 import random
 import numpy as np # For sound generation
+from platformphysics import MovementProfile, PlatformLevel, walk, start_jump, fall, move_box
+from levelcompile import merge_level
+from spritemask import MaskCache
+from kinematic import KinematicPlatform, MovingPlatforms, carry
+from enemyworld import (EnemyWorld, ENEMY_GOOMBA, ENEMY_KOOPA,
+                        ST_WALKING, ST_SHELL_IDLE, ST_SHELL_SLIDING, ST_STOMPED)
 
 # Initialize Pygame & Mixer
 pygame.init()
@@ -243,8 +250,23 @@ GRAVITY_PLAYER = 0.72         # Gravity affecting player
 GRAVITY_ENEMY = 0.75          # Gravity affecting enemies
 GRAVITY_ITEM = 0.4            # Gravity affecting items like mushrooms
 
+PLAYER_PROFILE = MovementProfile('geminimario4k', max_speed=PLAYER_MAX_WALK_SPEED, accel=PLAYER_ACCEL,
+                                 turn_accel=PLAYER_ACCEL * 2, decel=PLAYER_DECEL, gravity=GRAVITY_PLAYER,
+                                 jump_velocity=PLAYER_JUMP_INITIAL, jump_hold_force=PLAYER_JUMP_HOLD_FORCE,
+                                 jump_hold_frames=PLAYER_JUMP_HOLD_FRAMES_MAX, max_fall=15, ceiling_vy=1.5)
+
+# Fixed-timestep loop: the simulation always advances in SIM_DT steps (every per-frame constant and
+# timer above is tuned for 60 steps a second) and rendering interpolates between the last two steps
+SIM_HZ = 60
+SIM_DT = 1.0 / SIM_HZ
+MAX_RENDER_FPS = 144
+MAX_FRAME_DT = 0.25           # Longest real frame fed to the accumulator (debugger pauses, window drags)
+MAX_SIM_STEPS_PER_FRAME = 8   # Past this the backlog is dropped instead of spiralling on slow machines
+
 ENEMY_BASE_SPEED = 1.8
 KOOPA_SHELL_SPEED = 7.0
+ENEMY_ACTIVE_REGION = pygame.Rect(-64, -64, WIDTH + 128, HEIGHT + 128) # Enemies outside this (e.g. fallen
+                                                                       # into a pit) update at a reduced rate
 STOMP_BOUNCE = -8            # How high Mario bounces after stomping an enemy
 INVINCIBILITY_DURATION = 120 # Frames for invincibility after hit/power-up
 POWERUP_REVEAL_DURATION = 30 # Frames a powerup takes to 'emerge' from a block
@@ -291,6 +313,9 @@ MUSHROOM_RED = (255, 0, 0)
 MUSHROOM_STEM = (252, 220, 160)
 MUSHROOM_SPOTS = WHITE
 
+LIFT_COLOR = (230, 170, 60)
+LIFT_BOLT = (120, 80, 20)
+
 GOAL_TAPE_COLOR = (220,220,0) 
 GOAL_POST_COLOR = (100,100,100) 
 
@@ -321,6 +346,9 @@ levels_platforms_data = [
         (50, HEIGHT - 150, 60, 20, 'brick'), (120, HEIGHT - 250, 40, 40, 'question', {'content': 'coin', 'active': True}),
         (300, HEIGHT - 180, 80, 20, 'brick'), (400, HEIGHT - 180, 40, 40, 'question', {'content': 'powerup', 'active': True}),
         (550, HEIGHT - 120, 60, 20, 'brick'),
+        # Lift stays between the question block (x 400-440) and the brick (x 550-610)
+        (440, HEIGHT - 60, 64, 16, 'lift', {'path': [(440, HEIGHT - 60), (484, HEIGHT - 60), (484, HEIGHT - 200), (440, HEIGHT - 200)],
+                                            'speed': 1.2, 'loop': True}),
     ],
     [
         (0, HEIGHT - 40, WIDTH, 40, 'ground'),
@@ -336,6 +364,7 @@ levels_platforms_data = [
         (250, HEIGHT - 380, 40, 40, 'question', {'content': 'powerup', 'active': True}),
         (400, HEIGHT - 150, 100, 20, 'ground'), (425, HEIGHT - 190, 40, 40, 'question', {'content': 'coin', 'active': True}),
         (550, HEIGHT - 250, 60, 20, 'brick'), (650, HEIGHT - 350, 60, 20, 'brick'),
+        (110, HEIGHT - 120, 80, 16, 'lift', {'path': [(110, HEIGHT - 120), (300, HEIGHT - 120)], 'speed': 1.0}),
     ],
     [ 
         (0, HEIGHT - 40, WIDTH, 40, 'ground'),
@@ -346,6 +375,9 @@ levels_platforms_data = [
     ],
 ]
 current_level_platforms = []
+platform_level = PlatformLevel([]) # Collision view of current_level_platforms, rebuilt in reset_level
+INTERACTIVE_BLOCK_TYPES = ('question', 'brick', 'lift') # never merged into the surrounding solids
+moving_platforms = MovingPlatforms(platform_level.grid, []) # the level's lifts, rebuilt in reset_level
 
 GOAL_TAPE_WIDTH = 10
 GOAL_TAPE_HEIGHT_TOTAL = 150 
@@ -376,11 +408,14 @@ player_state = S_SMALL
 jump_hold_frames_count = 0
 player_death_timer = 0 
 
-enemies = []
+enemies = None # EnemyWorld, created in reset_level
 GOOMBA_WIDTH, GOOMBA_HEIGHT = 30, 30
 KOOPA_WIDTH, KOOPA_HEIGHT = 30, 42 
 KOOPA_SHELL_HEIGHT = 24
 
+PRECISE_COLLISION = False # F4 toggles: sprite masks confirm enemy contacts and decide stomps
+sprite_masks = MaskCache() # every player and enemy pose, rendered once by build_sprite_masks
+
 level_start_time = 0
 level_time_limit = 150 
 
@@ -478,9 +513,9 @@ def spawn_item(item_type, pos_rect):
 
 
 def reset_level(index):
-    global current_level_platforms, enemies, player_rect, player_vy, player_vx
+    global current_level_platforms, platform_level, moving_platforms, enemies, player_rect, player_vy, player_vx
     global level_start_time, items, on_ground # player_state persists
-    global goal_tape_y_offset, goal_tape_direction
+    global goal_tape_y_offset, goal_tape_direction, prev_player_bottomleft
 
     current_level_platforms = []
     for p_data_tuple in levels_platforms_data[index]:
@@ -492,36 +527,44 @@ def reset_level(index):
             properties['original_y'] = platform_rect.y
             properties['hit_timer'] = 0
         current_level_platforms.append({'rect': platform_rect, 'type': platform_type, 'original_y_ref': platform_rect.y, **properties})
+    # Same-type solids merged into maximal rects; question blocks and bricks stay whole
+    platform_level = PlatformLevel(merge_level(current_level_platforms,
+                                               interactive=lambda p: p['type'] in INTERACTIVE_BLOCK_TYPES))
+    # Lifts follow their path; only their own grid cells change as they move
+    moving_platforms = MovingPlatforms(platform_level.grid,
+                                       [KinematicPlatform(p, p['path'], p['speed'], p.get('loop', False))
+                                        for p in current_level_platforms if p['type'] == 'lift'])
 
     update_player_size() 
     player_rect.bottomleft = (50, HEIGHT - 40) 
+    prev_player_bottomleft = player_rect.bottomleft
     player_vy = 0
     player_vx = 0
     on_ground = True 
 
     items = []
-    enemies = []
+    enemies = EnemyWorld(GRAVITY_ENEMY, WIDTH)
     base_y = HEIGHT - GOOMBA_HEIGHT - 40
 
     if index == 0:
-        enemies.append({'rect': pygame.Rect(300, base_y, GOOMBA_WIDTH, GOOMBA_HEIGHT), 'vx': -ENEMY_BASE_SPEED, 'vy': 0, 'type': 'goomba', 'on_ground': False, 'stomped_timer': 0})
-        enemies.append({'rect': pygame.Rect(500, HEIGHT - 220 - GOOMBA_HEIGHT, GOOMBA_WIDTH, GOOMBA_HEIGHT), 'vx': ENEMY_BASE_SPEED, 'vy': 0, 'type': 'goomba', 'on_ground': False, 'stomped_timer': 0})
+        enemies.spawn(ENEMY_GOOMBA, pygame.Rect(300, base_y, GOOMBA_WIDTH, GOOMBA_HEIGHT), -ENEMY_BASE_SPEED)
+        enemies.spawn(ENEMY_GOOMBA, pygame.Rect(500, HEIGHT - 220 - GOOMBA_HEIGHT, GOOMBA_WIDTH, GOOMBA_HEIGHT), ENEMY_BASE_SPEED)
     elif index == 1:
-        enemies.append({'rect': pygame.Rect(450, base_y - KOOPA_HEIGHT + GOOMBA_HEIGHT, KOOPA_WIDTH, KOOPA_HEIGHT), 'vx': -ENEMY_BASE_SPEED, 'vy': 0, 'type': 'koopa', 'state': 'walking', 'on_ground': False, 'stomped_timer': 0, 'original_vx': -ENEMY_BASE_SPEED})
-        enemies.append({'rect': pygame.Rect(350, HEIGHT - 180 - GOOMBA_HEIGHT, GOOMBA_WIDTH, GOOMBA_HEIGHT), 'vx': -ENEMY_BASE_SPEED, 'vy': 0, 'type': 'goomba', 'on_ground': False, 'stomped_timer': 0})
+        enemies.spawn(ENEMY_KOOPA, pygame.Rect(450, base_y - KOOPA_HEIGHT + GOOMBA_HEIGHT, KOOPA_WIDTH, KOOPA_HEIGHT), -ENEMY_BASE_SPEED)
+        enemies.spawn(ENEMY_GOOMBA, pygame.Rect(350, HEIGHT - 180 - GOOMBA_HEIGHT, GOOMBA_WIDTH, GOOMBA_HEIGHT), -ENEMY_BASE_SPEED)
     elif index == 2: 
-        enemies.append({'rect': pygame.Rect(250, base_y - KOOPA_HEIGHT + GOOMBA_HEIGHT, KOOPA_WIDTH, KOOPA_HEIGHT), 'vx': -ENEMY_BASE_SPEED, 'vy': 0, 'type': 'koopa', 'state': 'walking', 'on_ground': False, 'stomped_timer': 0, 'original_vx': -ENEMY_BASE_SPEED})
-        enemies.append({'rect': pygame.Rect(400, base_y, GOOMBA_WIDTH, GOOMBA_HEIGHT), 'vx': ENEMY_BASE_SPEED, 'vy': 0, 'type': 'goomba', 'on_ground': False, 'stomped_timer': 0})
-        enemies.append({'rect': pygame.Rect(550, base_y - KOOPA_HEIGHT + GOOMBA_HEIGHT, KOOPA_WIDTH, KOOPA_HEIGHT), 'vx': ENEMY_BASE_SPEED, 'vy': 0, 'type': 'koopa', 'state': 'walking', 'on_ground': False, 'stomped_timer': 0, 'original_vx': ENEMY_BASE_SPEED})
+        enemies.spawn(ENEMY_KOOPA, pygame.Rect(250, base_y - KOOPA_HEIGHT + GOOMBA_HEIGHT, KOOPA_WIDTH, KOOPA_HEIGHT), -ENEMY_BASE_SPEED)
+        enemies.spawn(ENEMY_GOOMBA, pygame.Rect(400, base_y, GOOMBA_WIDTH, GOOMBA_HEIGHT), ENEMY_BASE_SPEED)
+        enemies.spawn(ENEMY_KOOPA, pygame.Rect(550, base_y - KOOPA_HEIGHT + GOOMBA_HEIGHT, KOOPA_WIDTH, KOOPA_HEIGHT), ENEMY_BASE_SPEED)
     elif index == 3: 
-        enemies.append({'rect': pygame.Rect(80, HEIGHT - 180 - GOOMBA_HEIGHT, GOOMBA_WIDTH, GOOMBA_HEIGHT), 'vx': ENEMY_BASE_SPEED, 'vy': 0, 'type': 'goomba', 'on_ground': False, 'stomped_timer': 0})
-        enemies.append({'rect': pygame.Rect(450, HEIGHT - 150 - GOOMBA_HEIGHT, GOOMBA_WIDTH, GOOMBA_HEIGHT), 'vx': -ENEMY_BASE_SPEED, 'vy': 0, 'type': 'goomba', 'on_ground': False, 'stomped_timer': 0})
-        enemies.append({'rect': pygame.Rect(600, HEIGHT - 250 - KOOPA_HEIGHT + GOOMBA_HEIGHT, KOOPA_WIDTH, KOOPA_HEIGHT), 'vx': ENEMY_BASE_SPEED, 'vy': 0, 'type': 'koopa', 'state':'walking', 'on_ground': False, 'stomped_timer': 0, 'original_vx': ENEMY_BASE_SPEED})
+        enemies.spawn(ENEMY_GOOMBA, pygame.Rect(80, HEIGHT - 180 - GOOMBA_HEIGHT, GOOMBA_WIDTH, GOOMBA_HEIGHT), ENEMY_BASE_SPEED)
+        enemies.spawn(ENEMY_GOOMBA, pygame.Rect(450, HEIGHT - 150 - GOOMBA_HEIGHT, GOOMBA_WIDTH, GOOMBA_HEIGHT), -ENEMY_BASE_SPEED)
+        enemies.spawn(ENEMY_KOOPA, pygame.Rect(600, HEIGHT - 250 - KOOPA_HEIGHT + GOOMBA_HEIGHT, KOOPA_WIDTH, KOOPA_HEIGHT), ENEMY_BASE_SPEED)
     elif index == 4: 
         for i in range(3):
-            enemies.append({'rect': pygame.Rect(150 + i*150, base_y, GOOMBA_WIDTH, GOOMBA_HEIGHT), 'vx': -ENEMY_BASE_SPEED if i%2==0 else ENEMY_BASE_SPEED, 'vy': 0, 'type': 'goomba', 'on_ground': False, 'stomped_timer': 0})
-        enemies.append({'rect': pygame.Rect(250, base_y - KOOPA_HEIGHT + GOOMBA_HEIGHT, KOOPA_WIDTH, KOOPA_HEIGHT), 'vx': -ENEMY_BASE_SPEED, 'vy': 0, 'type': 'koopa', 'state':'walking', 'on_ground': False, 'stomped_timer': 0, 'original_vx': -ENEMY_BASE_SPEED})
-        enemies.append({'rect': pygame.Rect(500, base_y - KOOPA_HEIGHT + GOOMBA_HEIGHT, KOOPA_WIDTH, KOOPA_HEIGHT), 'vx': ENEMY_BASE_SPEED, 'vy': 0, 'type': 'koopa', 'state':'walking', 'on_ground': False, 'stomped_timer': 0, 'original_vx': ENEMY_BASE_SPEED})
+            enemies.spawn(ENEMY_GOOMBA, pygame.Rect(150 + i*150, base_y, GOOMBA_WIDTH, GOOMBA_HEIGHT), -ENEMY_BASE_SPEED if i%2==0 else ENEMY_BASE_SPEED)
+        enemies.spawn(ENEMY_KOOPA, pygame.Rect(250, base_y - KOOPA_HEIGHT + GOOMBA_HEIGHT, KOOPA_WIDTH, KOOPA_HEIGHT), -ENEMY_BASE_SPEED)
+        enemies.spawn(ENEMY_KOOPA, pygame.Rect(500, base_y - KOOPA_HEIGHT + GOOMBA_HEIGHT, KOOPA_WIDTH, KOOPA_HEIGHT), ENEMY_BASE_SPEED)
 
 
     level_start_time = pygame.time.get_ticks()
@@ -611,7 +654,11 @@ def draw_select():
     instructions = small_font.render("Use ARROWS to select, ENTER to warp!", True, WHITE)
     screen.blit(instructions, (WIDTH // 2 - instructions.get_width() // 2, HEIGHT - 70))
 
-def draw_player_sprite(surface, rect, current_state, p_facing_right, p_on_ground, p_vx, p_vy):
+def anim_clock(anim_ticks):
+    # Animation time: the real clock, or a fixed time when rendering one pose for its collision mask
+    return pygame.time.get_ticks() if anim_ticks is None else anim_ticks
+
+def draw_player_sprite(surface, rect, current_state, p_facing_right, p_on_ground, p_vx, p_vy, anim_ticks=None):
     skin_color = MARIO_SKIN
     hair_color = MARIO_HAIR_BROWN
     cap_shirt_color = MARIO_RED
@@ -619,7 +666,7 @@ def draw_player_sprite(surface, rect, current_state, p_facing_right, p_on_ground
     shoe_color = MARIO_SHOE_BROWN
 
     is_walking = p_on_ground and abs(p_vx) > 0.5
-    walk_frame = (pygame.time.get_ticks() // 120) % 2 
+    walk_frame = (anim_clock(anim_ticks) // 120) % 2 
 
     in_air_pose = not p_on_ground
     x, y, w, h = rect.x, rect.y, rect.width, rect.height
@@ -702,13 +749,12 @@ def draw_player_sprite(surface, rect, current_state, p_facing_right, p_on_ground
         flash_surface.fill((255, 255, 255, 100)) 
         surface.blit(flash_surface, rect.topleft)
 
-def draw_goomba(surface, enemy_data):
-    rect = enemy_data['rect']
+def draw_goomba(surface, rect, e_vx, stomped, anim_ticks=None):
     walk_anim_offset = 0
-    if enemy_data.get('vx', 0) != 0 : 
-        walk_anim_offset = int((pygame.time.get_ticks() // 200) % 2) * -2
+    if e_vx != 0 : 
+        walk_anim_offset = int((anim_clock(anim_ticks) // 200) % 2) * -2
 
-    if enemy_data.get('stomped_timer', 0) > 0: 
+    if stomped: 
         squashed_height = rect.height // 2.5
         pygame.draw.ellipse(surface, GOOMBA_BROWN, (rect.x, rect.bottom - squashed_height, rect.width, squashed_height))
         return
@@ -726,22 +772,19 @@ def draw_goomba(surface, enemy_data):
     right_eye_x = body_rect.centerx + rect.width // 5
     pygame.draw.ellipse(surface, GOOMBA_EYE_WHITE, (left_eye_x - eye_radius//2, eye_y - eye_radius//1.5, eye_radius, eye_radius * 1.2))
     pygame.draw.ellipse(surface, GOOMBA_EYE_WHITE, (right_eye_x - eye_radius//2, eye_y - eye_radius//1.5, eye_radius, eye_radius * 1.2))
-    pupil_off_x = 1 if enemy_data.get('vx',0) > 0 else -1
+    pupil_off_x = 1 if e_vx > 0 else -1
     pygame.draw.circle(surface, BLACK, (left_eye_x + pupil_off_x, eye_y), eye_radius // 2.5)
     pygame.draw.circle(surface, BLACK, (right_eye_x + pupil_off_x, eye_y), eye_radius // 2.5)
     pygame.draw.line(surface, BLACK, (left_eye_x - eye_radius*0.6, eye_y - eye_radius*0.7), (left_eye_x + eye_radius*0.2, eye_y - eye_radius*0.3), 3)
     pygame.draw.line(surface, BLACK, (right_eye_x + eye_radius*0.6, eye_y - eye_radius*0.7), (right_eye_x - eye_radius*0.2, eye_y - eye_radius*0.3), 3)
 
-def draw_koopa(surface, enemy_data):
-    rect = enemy_data['rect']
-    state = enemy_data.get('state', 'walking')
-    e_vx = enemy_data.get('vx', 0)
+def draw_koopa(surface, rect, e_vx, enemy_state, anim_ticks=None):
 
     shell_color = KOOPA_GREEN_SHELL
     body_color = KOOPA_GREEN_BODY
     limb_color = KOOPA_FEET_HANDS 
 
-    if state == 'shell_idle' or state == 'shell_sliding':
+    if enemy_state == ST_SHELL_IDLE or enemy_state == ST_SHELL_SLIDING:
         shell_rect_h = rect.height * 0.7 
         shell_rect_y = rect.bottom - shell_rect_h
         shell_rect = pygame.Rect(rect.x, shell_rect_y, rect.width, shell_rect_h)
@@ -749,13 +792,13 @@ def draw_koopa(surface, enemy_data):
         pygame.draw.ellipse(surface, KOOPA_GREEN_SHELL_HIGHLIGHT, (shell_rect.x + shell_rect.width*0.1, shell_rect.y + shell_rect.height*0.1, shell_rect.width*0.8, shell_rect.height*0.5))
         pygame.draw.line(surface, BLACK, (shell_rect.centerx, shell_rect.top + 2), (shell_rect.centerx, shell_rect.bottom -2), 1)
         pygame.draw.line(surface, BLACK, (shell_rect.left + 2, shell_rect.centery), (shell_rect.right -2, shell_rect.centery), 1)
-        if state == 'shell_sliding' and (pygame.time.get_ticks() // 100) % 2 == 0 : 
+        if enemy_state == ST_SHELL_SLIDING and (anim_clock(anim_ticks) // 100) % 2 == 0 : 
             sparkle_x = shell_rect.centerx + random.randint(-5,5) * (1 if e_vx > 0 else -1)
             sparkle_y = shell_rect.centery + random.randint(-5,5)
             pygame.draw.circle(surface, WHITE, (sparkle_x, sparkle_y), 2)
         return
 
-    walk_anim_offset = int((pygame.time.get_ticks() // 200) % 2) * -2 
+    walk_anim_offset = int((anim_clock(anim_ticks) // 200) % 2) * -2 
     shell_w = rect.width * 1.1 
     shell_h = rect.height * 0.65
     shell_x = rect.centerx - shell_w / 2
@@ -775,7 +818,7 @@ def draw_koopa(surface, enemy_data):
     foot_w = rect.width * 0.3
     foot_h = rect.height * 0.25
     foot_y = rect.bottom - foot_h
-    if (pygame.time.get_ticks() // 150) % 2 == 0:
+    if (anim_clock(anim_ticks) // 150) % 2 == 0:
         pygame.draw.ellipse(surface, limb_color, (rect.centerx - foot_w*1.2, foot_y, foot_w, foot_h))
         pygame.draw.ellipse(surface, limb_color, (rect.centerx + foot_w*0.2, foot_y + foot_h*0.2, foot_w, foot_h*0.8))
     else:
@@ -788,6 +831,45 @@ def draw_koopa(surface, enemy_data):
     else: 
         pygame.draw.ellipse(surface, limb_color, (rect.centerx - rect.width*0.25, arm_y, arm_w, arm_h))
 
+# --- Collision Masks ---
+# Pose keys name everything a sprite's drawing depends on, so the mask looked
+# up in the frame loop matches what is on screen.
+KOOPA_ANIM_TICKS = {(0, 0): 0, (0, 1): 150, (1, 1): 200, (1, 0): 300} # (body bob, step) frame -> a time showing it
+
+def player_pose_key(p_state, p_facing_right, p_on_ground, p_vx, w, h, ticks):
+    walking = p_on_ground and abs(p_vx) > 0.5
+    return ('player', p_state, bool(p_facing_right), bool(p_on_ground), walking,
+            (ticks // 120) % 2 if walking else 0, w, h)
+
+def enemy_pose_key(kind, enemy_state, e_vx, w, h, ticks):
+    if kind == ENEMY_GOOMBA:
+        return ('goomba', e_vx > 0, (ticks // 200) % 2 if e_vx != 0 else 0, w, h)
+    if enemy_state == ST_SHELL_IDLE or enemy_state == ST_SHELL_SLIDING:
+        return ('shell', w, h) # a sliding shell's sparkle is not part of its body
+    return ('koopa', e_vx >= 0, (ticks // 200) % 2, (ticks // 150) % 2, w, h)
+
+def build_sprite_masks():
+    """Render every collidable pose once; the frame loop only looks masks up."""
+    for p_state, size in ((S_SMALL, (PLAYER_SMALL_WIDTH, PLAYER_SMALL_HEIGHT)),
+                          (S_SUPER, (PLAYER_SUPER_WIDTH, PLAYER_SUPER_HEIGHT))):
+        for p_facing_right in (True, False):
+            for p_on_ground, p_vx, ticks in ((True, 0, 0), (True, 1, 0), (True, 1, 120), (False, 0, 0)):
+                sprite_masks.build(player_pose_key(p_state, p_facing_right, p_on_ground, p_vx, *size, ticks), size,
+                                   lambda surf, r: draw_player_sprite(surf, r, p_state, p_facing_right, p_on_ground,
+                                                                      p_vx, 0, anim_ticks=ticks))
+    size = (GOOMBA_WIDTH, GOOMBA_HEIGHT)
+    for e_vx, ticks in ((0, 0), (1, 0), (1, 200), (-1, 0), (-1, 200)):
+        sprite_masks.build(enemy_pose_key(ENEMY_GOOMBA, ST_WALKING, e_vx, *size, ticks), size,
+                           lambda surf, r: draw_goomba(surf, r, e_vx, False, anim_ticks=ticks))
+    size = (KOOPA_WIDTH, KOOPA_HEIGHT)
+    for e_vx in (1, -1):
+        for ticks in KOOPA_ANIM_TICKS.values():
+            sprite_masks.build(enemy_pose_key(ENEMY_KOOPA, ST_WALKING, e_vx, *size, ticks), size,
+                               lambda surf, r: draw_koopa(surf, r, e_vx, ST_WALKING, anim_ticks=ticks))
+    size = (KOOPA_WIDTH, KOOPA_SHELL_HEIGHT)
+    sprite_masks.build(enemy_pose_key(ENEMY_KOOPA, ST_SHELL_IDLE, 0, *size, 0), size,
+                       lambda surf, r: draw_koopa(surf, r, 0, ST_SHELL_IDLE, anim_ticks=0))
+
 def draw_platform(surface, platform_data):
     rect = platform_data['rect']
     ptype = platform_data['type']
@@ -811,6 +893,10 @@ def draw_platform(surface, platform_data):
                 stagger = bw // 2 if r_idx % 2 == 0 else 0
                 if c_x + stagger < rect.right:
                      pygame.draw.line(surface, PLATFORM_BRICK_MORTAR, (c_x + stagger, r_y), (c_x + stagger, r_y + bh if r_y + bh <= rect.bottom else rect.bottom ), 1)
+    elif ptype == 'lift':
+        pygame.draw.rect(surface, LIFT_COLOR, rect, border_radius=3)
+        for bolt_x in (rect.left + 6, rect.right - 6):
+            pygame.draw.circle(surface, LIFT_BOLT, (bolt_x, rect.centery), 3)
     elif ptype == 'question':
         is_active = platform_data.get('active', False)
         block_color = QUESTION_BLOCK_YELLOW if is_active else USED_BLOCK_BROWN
@@ -862,7 +948,7 @@ def draw_mushroom(surface, item_data):
     pygame.draw.circle(surface, BLACK, (rect.centerx - rect.width*0.15, eye_y), eye_r)
     pygame.draw.circle(surface, BLACK, (rect.centerx + rect.width*0.15, eye_y), eye_r)
 
-def draw_game():
+def draw_game(alpha=1.0):
     screen.fill(SKY_BLUE)
     for hill in hills:
         pygame.draw.ellipse(screen, hill['color1'], hill['rect'])
@@ -908,16 +994,16 @@ def draw_game():
     pygame.draw.rect(screen, GOAL_TAPE_COLOR, (goal_x_center - GOAL_TAPE_WIDTH // 2, current_tape_y, GOAL_TAPE_WIDTH, GOAL_TAPE_MOVING_HEIGHT))
     pygame.draw.rect(screen, BLACK, (goal_x_center - GOAL_TAPE_WIDTH // 2, current_tape_y, GOAL_TAPE_WIDTH, GOAL_TAPE_MOVING_HEIGHT),1) 
     if state != PLAYER_DIED_TRANSITION: 
-        draw_player_sprite(screen, player_rect, player_state, facing_right, on_ground, player_vx, player_vy)
-    for enemy_data in enemies:
-        if enemy_data.get('stomped_timer', 0) > 0 and enemy_data['type'] == 'goomba': 
-            draw_goomba(screen, enemy_data) 
-        elif enemy_data.get('state', '') == 'shell_idle' or enemy_data.get('state', '') == 'shell_sliding': 
-            draw_koopa(screen, enemy_data)
-        elif enemy_data.get('type') == 'goomba':
-            draw_goomba(screen, enemy_data)
-        elif enemy_data.get('type') == 'koopa':
-            draw_koopa(screen, enemy_data)
+        # Drawn between the last two simulation steps so motion stays smooth at any refresh rate
+        draw_rect = player_rect.copy()
+        draw_rect.left = prev_player_bottomleft[0] + (player_rect.left - prev_player_bottomleft[0]) * alpha
+        draw_rect.bottom = prev_player_bottomleft[1] + (player_rect.bottom - prev_player_bottomleft[1]) * alpha
+        draw_player_sprite(screen, draw_rect, player_state, facing_right, on_ground, player_vx, player_vy)
+    for i in range(len(enemies)):
+        if enemies.kind[i] == ENEMY_GOOMBA:
+            draw_goomba(screen, enemies.draw_rect(i, alpha), enemies.vx[i], enemies.state[i] == ST_STOMPED)
+        else:
+            draw_koopa(screen, enemies.draw_rect(i, alpha), enemies.vx[i], enemies.state[i])
     for p_data in particles:
         pygame.draw.circle(screen, p_data[5], (int(p_data[0]), int(p_data[1])), int(p_data[4]))
     hud_y_offset = 10
@@ -977,10 +1063,18 @@ current_level_index = 0
 reset_level(current_level_index)
 update_player_size() 
 
+prev_player_bottomleft = player_rect.bottomleft
+sim_accumulator = 0.0
+loop_stats = {'steps': 0, 'sim_ms': 0.0, 'dropped_ms': 0.0} # last frame's steps and sim time, dropped total
+show_loop_stats = False
+build_sprite_masks()
+precise_collision = PRECISE_COLLISION
+
 running = True
 while running:
-    dt = clock.tick(60) / 1000.0 
-    actual_dt_for_physics = min(dt, 0.033) 
+    dt = clock.tick(MAX_RENDER_FPS) / 1000.0 
+    sim_accumulator += min(dt, MAX_FRAME_DT)
+    actual_dt_for_physics = SIM_DT
 
     keys = pygame.key.get_pressed() 
 
@@ -989,6 +1083,10 @@ while running:
             running = False
 
         if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_F3:
+                show_loop_stats = not show_loop_stats
+            if event.key == pygame.K_F4:
+                precise_collision = not precise_collision
             if state == MENU and event.key == pygame.K_RETURN:
                 play_sfx('menu_select')
                 state = SELECT
@@ -1015,9 +1113,8 @@ while running:
                 if event.key == pygame.K_SPACE: 
                     if on_ground:
                         play_sfx('jump')
-                        player_vy = PLAYER_JUMP_INITIAL
+                        player_vy, jump_hold_frames_count = start_jump(PLAYER_PROFILE)
                         on_ground = False
-                        jump_hold_frames_count = PLAYER_JUMP_HOLD_FRAMES_MAX
                         create_particles(player_rect.centerx, player_rect.bottom, WHITE, 8, intensity=0.8)
             
             elif state == GAME_OVER and event.key == pygame.K_r:
@@ -1039,92 +1136,90 @@ while running:
                     reset_level(current_level_index)
                     state = PLAYING
 
-    # --- State Updates ---
-    for cloud_data in clouds:
-        cloud_data[0] -= cloud_data[2] * (60 * actual_dt_for_physics)
-        if cloud_data[0] < -cloud_data[3]:
-            cloud_data[0] = WIDTH + random.randint(0,50)
-            cloud_data[1] = random.randint(30, 150)
-    for hill in hills: hill['rect'].x -= hill['speed_mod'] * (60 * actual_dt_for_physics) * 0.3 
-    for bush_data in bushes:
-        bush_data['base_rect'].x -= bush_data['speed_mod'] * (60 * actual_dt_for_physics) * 0.6
-        for clump in bush_data['clumps']: clump.x -= bush_data['speed_mod'] * (60 * actual_dt_for_physics) * 0.6
+    # --- State Updates (fixed timestep) ---
+    sim_start = time.perf_counter()
+    sim_steps = 0
+    while sim_accumulator >= SIM_DT and sim_steps < MAX_SIM_STEPS_PER_FRAME:
+        sim_accumulator -= SIM_DT
+        sim_steps += 1
+        prev_player_bottomleft = player_rect.bottomleft
+        enemies.snapshot()
+
+        for cloud_data in clouds:
+            cloud_data[0] -= cloud_data[2] * (60 * actual_dt_for_physics)
+            if cloud_data[0] < -cloud_data[3]:
+                cloud_data[0] = WIDTH + random.randint(0,50)
+                cloud_data[1] = random.randint(30, 150)
+        for hill in hills: hill['rect'].x -= hill['speed_mod'] * (60 * actual_dt_for_physics) * 0.3 
+        for bush_data in bushes:
+            bush_data['base_rect'].x -= bush_data['speed_mod'] * (60 * actual_dt_for_physics) * 0.6
+            for clump in bush_data['clumps']: clump.x -= bush_data['speed_mod'] * (60 * actual_dt_for_physics) * 0.6
+
+        particles = [p for p in particles if p[6] > 0 and p[4] > 0] 
+        for p_data in particles:
+            p_data[0] += p_data[2] * (60 * actual_dt_for_physics)
+            p_data[1] += p_data[3] * (60 * actual_dt_for_physics)
+            p_data[3] += p_data[7] 
+            p_data[4] -= 0.08 
+            p_data[6] -= 1    
 
-    particles = [p for p in particles if p[6] > 0 and p[4] > 0] 
-    for p_data in particles:
-        p_data[0] += p_data[2] * (60 * actual_dt_for_physics)
-        p_data[1] += p_data[3] * (60 * actual_dt_for_physics)
-        p_data[3] += p_data[7] 
-        p_data[4] -= 0.08 
-        p_data[6] -= 1    
-
-    for p_data in current_level_platforms:
-        if p_data['type'] == 'question' and p_data.get('hit_timer', 0) > 0:
-            p_data['hit_timer'] -=1
-
-    if state == PLAYER_DIED_TRANSITION:
-        player_vy += GRAVITY_PLAYER * (60 * actual_dt_for_physics) 
-        player_rect.y += player_vy * (60 * actual_dt_for_physics)
-        player_death_timer -=1
-        if player_death_timer <= 0:
-            reset_level(current_level_index) 
-            state = PLAYING
+        for p_data in current_level_platforms:
+            if p_data['type'] == 'question' and p_data.get('hit_timer', 0) > 0:
+                p_data['hit_timer'] -=1
+
+        if state == PLAYER_DIED_TRANSITION:
+            player_vy += GRAVITY_PLAYER * (60 * actual_dt_for_physics) 
+            player_rect.y += player_vy * (60 * actual_dt_for_physics)
+            player_death_timer -=1
+            if player_death_timer <= 0:
+                reset_level(current_level_index) 
+                state = PLAYING
             
-    elif state == PLAYING:
-        target_vx = 0
-        if keys[pygame.K_LEFT]:
-            target_vx = -PLAYER_MAX_WALK_SPEED
-            facing_right = False
-        if keys[pygame.K_RIGHT]:
-            target_vx = PLAYER_MAX_WALK_SPEED
-            facing_right = True
-
-        if target_vx != 0: 
-            if abs(player_vx) < abs(target_vx):
-                player_vx += PLAYER_ACCEL * (1 if target_vx > 0 else -1)
-                player_vx = max(-abs(target_vx), min(abs(target_vx), player_vx)) 
-            elif (player_vx > 0 and target_vx < 0) or (player_vx < 0 and target_vx > 0) : 
-                 player_vx += PLAYER_ACCEL * 2 * (1 if target_vx > 0 else -1) 
-        else: 
-            if abs(player_vx) > PLAYER_DECEL:
-                player_vx -= PLAYER_DECEL * (1 if player_vx > 0 else -1)
-            else:
-                player_vx = 0
-        player_rect.x += player_vx * (60 * actual_dt_for_physics)
-
-        if keys[pygame.K_SPACE] and jump_hold_frames_count > 0 and player_vy < 0: 
-            player_vy += PLAYER_JUMP_HOLD_FORCE 
-            jump_hold_frames_count -= 1
-        else:
-            jump_hold_frames_count = 0 
-
-        player_vy += GRAVITY_PLAYER * (60 * actual_dt_for_physics)
-        player_vy = min(player_vy, 15) 
-        player_rect.y += player_vy * (60 * actual_dt_for_physics)
+        elif state == PLAYING:
+            # Lifts move first, taking riders along and pushing what they run into
+            for old_rect, new_rect, lift in moving_platforms.step(60 * actual_dt_for_physics):
+                carry(player_rect, old_rect, new_rect)
+                enemies.platform_moved(old_rect, new_rect, lift)
+                for item_data in items:
+                    if item_data['type'] == 'mushroom':
+                        carry(item_data['rect'], old_rect, new_rect)
+
+            direction = 0
+            if keys[pygame.K_LEFT]:
+                direction = -1
+                facing_right = False
+            if keys[pygame.K_RIGHT]:
+                direction = 1
+                facing_right = True
+            player_vx = walk(player_vx, direction, PLAYER_PROFILE, 60 * actual_dt_for_physics)
+            player_vy, jump_hold_frames_count = fall(player_vy, keys[pygame.K_SPACE], jump_hold_frames_count,
+                                                     PLAYER_PROFILE, 60 * actual_dt_for_physics)
+
+            # Swept move: contacts are found by time of impact, so no step size tunnels through a platform
+            new_x, new_y, contacts = move_box(player_rect.x, player_rect.y, player_rect.width, player_rect.height,
+                                              player_vx * (60 * actual_dt_for_physics),
+                                              player_vy * (60 * actual_dt_for_physics), platform_level)
+            player_rect.x, player_rect.y = new_x, new_y
         
-        if player_rect.left < 0: player_rect.left = 0
-        if player_rect.right > WIDTH: player_rect.right = WIDTH
+            if player_rect.left < 0: player_rect.left = 0
+            if player_rect.right > WIDTH: player_rect.right = WIDTH
         
-        if player_rect.top > HEIGHT + player_rect.height : 
-             if not player_invincible : 
-                player_dies()
+            if player_rect.top > HEIGHT + player_rect.height : 
+                 if not player_invincible : 
+                    player_dies()
 
-        on_ground_this_frame = False
-        player_collided_horizontally = False
+            on_ground_this_frame = False
+            player_collided_horizontally = False
 
-        for p_data in current_level_platforms:
-            platform_rect = p_data['rect']
-            if player_rect.colliderect(platform_rect):
-                if player_vy > 0 and player_rect.bottom - player_vy * (60*actual_dt_for_physics) <= platform_rect.top +1 : 
-                    player_rect.bottom = platform_rect.top
+            for normal_x, normal_y, p_data in contacts.hits:
+                platform_rect = p_data['rect']
+                if normal_y < 0: 
                     player_vy = 0
                     on_ground_this_frame = True
                     if not on_ground: create_particles(player_rect.midbottom[0], player_rect.bottom, WHITE, 3, intensity=0.3)
-
-                elif player_vy < 0 and player_rect.top - player_vy * (60*actual_dt_for_physics) >= platform_rect.bottom -1 : 
-                    player_rect.top = platform_rect.bottom
-                    player_vy = 1.5 
-                    
+                elif normal_y > 0: 
+                    player_vy = PLAYER_PROFILE.ceiling_vy
+                
                     if p_data['type'] == 'question' and p_data.get('active', False):
                         play_sfx('block_bump')
                         p_data['active'] = False
@@ -1152,121 +1247,42 @@ while running:
                         else:
                             play_sfx('block_hit')
                             create_particles(platform_rect.centerx, player_rect.top, PLATFORM_BRICK_MORTAR, 8)
-                
-                if player_rect.colliderect(platform_rect): 
-                    if player_vx > 0 and player_rect.right - player_vx * (60*actual_dt_for_physics) <= platform_rect.left +1:
-                        player_rect.right = platform_rect.left
-                        player_vx = 0 
-                        player_collided_horizontally = True
-                    elif player_vx < 0 and player_rect.left - player_vx * (60*actual_dt_for_physics) >= platform_rect.right -1:
-                        player_rect.left = platform_rect.right
-                        player_vx = 0
-                        player_collided_horizontally = True
-        on_ground = on_ground_this_frame
-
-        for i in range(len(enemies) - 1, -1, -1):
-            enemy_data = enemies[i]
-            enemy_rect = enemy_data['rect']
-
-            if enemy_data.get('state') == 'shell_sliding':
-                enemy_rect.x += enemy_data['vx'] * (60*actual_dt_for_physics)
-                for j in range(len(enemies) - 1, -1, -1):
-                    if i == j: continue 
-                    other_enemy = enemies[j]
-                    if other_enemy.get('stomped_timer',0) > 0 or other_enemy.get('state','none') in ['shell_idle', 'shell_sliding']: continue 
-                    if enemy_rect.colliderect(other_enemy['rect']):
-                        play_sfx('kick_shell') # Shell hitting another enemy
-                        create_particles(other_enemy['rect'].centerx, other_enemy['rect'].centery, (100,100,100), 15, intensity=1.5)
-                        score += 200 
-                        enemies.pop(j)
-                        if j < i: i -=1 
-                if enemy_rect.left <= 0 or enemy_rect.right >= WIDTH:
-                    enemy_data['vx'] *= -1
-                for p_data in current_level_platforms: 
-                    plat_rect = p_data['rect']
-                    if enemy_rect.colliderect(plat_rect):
-                        if (enemy_data['vx'] > 0 and enemy_rect.right > plat_rect.left and enemy_rect.left < plat_rect.left) or \
-                           (enemy_data['vx'] < 0 and enemy_rect.left < plat_rect.right and enemy_rect.right > plat_rect.right):
-                            enemy_data['vx'] *= -1
-                            if enemy_data['vx'] < 0: enemy_rect.left = plat_rect.right 
-                            else: enemy_rect.right = plat_rect.left
-                            break 
-                enemy_data['vy'] += GRAVITY_ENEMY * (60*actual_dt_for_physics)
-                enemy_rect.y += enemy_data['vy'] * (60*actual_dt_for_physics)
-                shell_on_ground = False
-                for p_data in current_level_platforms:
-                    if enemy_rect.colliderect(p_data['rect']) and enemy_data['vy'] > 0 and enemy_rect.bottom - enemy_data['vy'] * (60*actual_dt_for_physics) <= p_data['rect'].top +1:
-                        enemy_rect.bottom = p_data['rect'].top
-                        enemy_data['vy'] = 0
-                        shell_on_ground = True
-                        break
-                enemy_data['on_ground'] = shell_on_ground
-            elif enemy_data.get('stomped_timer', 0) > 0 and enemy_data['type'] == 'goomba':
-                enemy_data['stomped_timer'] -=1
-                if enemy_data['stomped_timer'] == 0:
-                    enemies.pop(i)
-                continue
-            elif enemy_data.get('state') == 'shell_idle': 
-                enemy_data['vy'] += GRAVITY_ENEMY * (60*actual_dt_for_physics)
-                enemy_rect.y += enemy_data['vy'] * (60*actual_dt_for_physics)
-                shell_on_ground = False
-                for p_data in current_level_platforms:
-                    if enemy_rect.colliderect(p_data['rect']) and enemy_data['vy'] > 0 and enemy_rect.bottom - enemy_data['vy']*(60*actual_dt_for_physics) <= p_data['rect'].top+1:
-                        enemy_rect.bottom = p_data['rect'].top
-                        enemy_data['vy'] = 0
-                        shell_on_ground = True
-                        break
-                enemy_data['on_ground'] = shell_on_ground
-                if player_rect.colliderect(enemy_rect) and not player_invincible:
+                else:
+                    player_vx = 0 
+                    player_collided_horizontally = True
+            on_ground = on_ground_this_frame
+
+            # Movement, gravity, platforms, edges and timers for all enemies at once
+            for j in enemies.step(60*actual_dt_for_physics, platform_level.grid, ENEMY_ACTIVE_REGION):
+                knocked_rect = enemies.rect(j)
+                play_sfx('kick_shell') # Shell hitting another enemy
+                create_particles(knocked_rect.centerx, knocked_rect.centery, (100,100,100), 15, intensity=1.5)
+                score += 200 
+
+            # Player contact, per enemy
+            if precise_collision:
+                pose_ticks = pygame.time.get_ticks()
+                player_key = player_pose_key(player_state, facing_right, on_ground, player_vx,
+                                             player_rect.width, player_rect.height, pose_ticks)
+            for i in range(len(enemies) - 1, -1, -1):
+                if not enemies.alive[i]: continue
+                enemy_state = enemies.state[i]
+                if enemy_state == ST_STOMPED: continue
+                enemy_rect = enemies.rect(i)
+                if not player_rect.colliderect(enemy_rect) or player_invincible: continue
+                if precise_collision:
+                    enemy_key = enemy_pose_key(int(enemies.kind[i]), int(enemy_state), float(enemies.vx[i]),
+                                               enemy_rect.width, enemy_rect.height, pose_ticks)
+                    if sprite_masks.overlap(player_key, player_rect, enemy_key, enemy_rect) is False: continue # rects touch, sprites don't
+
+                if enemy_state == ST_SHELL_IDLE: 
                     play_sfx('kick_shell')
-                    enemy_data['state'] = 'shell_sliding'
-                    enemy_data['vx'] = KOOPA_SHELL_SPEED * (1 if player_rect.centerx < enemy_rect.centerx else -1) 
+                    enemies.kick(i, KOOPA_SHELL_SPEED * (1 if player_rect.centerx < enemy_rect.centerx else -1))
                     player_vy = STOMP_BOUNCE * 0.5 
                     score += 50 
                     create_particles(enemy_rect.centerx, enemy_rect.centery, KOOPA_GREEN_SHELL_HIGHLIGHT, 10)
-                continue 
-            else:
-                enemy_rect.x += enemy_data['vx'] * (60*actual_dt_for_physics)
-                enemy_data['vy'] += GRAVITY_ENEMY * (60*actual_dt_for_physics)
-                enemy_rect.y += enemy_data['vy'] * (60*actual_dt_for_physics)
-                enemy_on_ground_this_frame = False
-                for p_data in current_level_platforms:
-                    platform_rect_check = p_data['rect']
-                    if enemy_rect.colliderect(platform_rect_check):
-                        if enemy_data['vy'] >= 0 and enemy_rect.bottom - enemy_data['vy']*(60*actual_dt_for_physics) <= platform_rect_check.top +1:
-                            enemy_rect.bottom = platform_rect_check.top
-                            enemy_data['vy'] = 0
-                            enemy_on_ground_this_frame = True
-                        elif (enemy_data['vx'] > 0 and enemy_rect.right > platform_rect_check.left and enemy_rect.left < platform_rect_check.left) or \
-                             (enemy_data['vx'] < 0 and enemy_rect.left < platform_rect_check.right and enemy_rect.right > platform_rect_check.right):
-                            if enemy_on_ground_this_frame or enemy_data.get('on_ground'): 
-                                enemy_data['vx'] *= -1
-                                if enemy_data['type'] == 'koopa': enemy_data['original_vx'] *= -1 
-                                if enemy_data['vx'] < 0: enemy_rect.left = platform_rect_check.right +1
-                                else: enemy_rect.right = platform_rect_check.left -1
-                enemy_data['on_ground'] = enemy_on_ground_this_frame
-                if enemy_rect.left <= 0 and enemy_data['vx'] < 0:
-                    enemy_data['vx'] *= -1
-                    if enemy_data['type'] == 'koopa': enemy_data['original_vx'] *= -1
-                if enemy_rect.right >= WIDTH and enemy_data['vx'] > 0:
-                    enemy_data['vx'] *= -1
-                    if enemy_data['type'] == 'koopa': enemy_data['original_vx'] *= -1
-                if enemy_data['on_ground'] and enemy_data['type'] != 'koopa_shell': 
-                    gap_check_x = enemy_rect.centerx + (enemy_data['vx'] * (enemy_rect.width * 0.6))
-                    gap_check_y = enemy_rect.bottom + 5
-                    found_ground_ahead = False
-                    for pform in current_level_platforms:
-                        if pform['rect'].collidepoint(gap_check_x, gap_check_y):
-                            found_ground_ahead = True
-                            break
-                    if not found_ground_ahead:
-                        enemy_data['vx'] *= -1
-                        if enemy_data['type'] == 'koopa': enemy_data['original_vx'] *= -1
-
-            if player_rect.colliderect(enemy_rect) and not player_invincible:
-                if enemy_data.get('stomped_timer',0) > 0: continue 
-                if enemy_data.get('state', '') == 'shell_idle': continue 
-                if enemy_data.get('state', '') == 'shell_sliding' and abs(player_vy) < 2: 
+                    continue 
+                if enemy_state == ST_SHELL_SLIDING and abs(player_vy) < 2: 
                      if player_state == S_SUPER:
                         play_sfx('player_hit')
                         player_state = S_SMALL
@@ -1277,29 +1293,29 @@ while running:
                      else:
                         player_dies() 
                      continue
-                is_stomp = player_vy > 1.0 and (player_rect.bottom - player_vy*(60*actual_dt_for_physics) <= enemy_rect.top + enemy_rect.height * 0.5)
+                if precise_collision:
+                    # Same rule, measured on the drawn feet and body instead of the rects
+                    enemy_body = sprite_masks.visible(enemy_key, enemy_rect)
+                    feet = sprite_masks.visible(player_key, player_rect).bottom
+                    is_stomp = player_vy > 1.0 and (feet - player_vy*(60*actual_dt_for_physics) <= enemy_body.top + enemy_body.height * 0.5)
+                else:
+                    is_stomp = player_vy > 1.0 and (player_rect.bottom - player_vy*(60*actual_dt_for_physics) <= enemy_rect.top + enemy_rect.height * 0.5)
                 if is_stomp:
                     player_vy = STOMP_BOUNCE 
                     on_ground = False 
                     score += 200
-                    if enemy_data['type'] == 'goomba':
+                    if enemies.kind[i] == ENEMY_GOOMBA:
                         play_sfx('stomp_goomba')
-                        enemy_data['stomped_timer'] = 30 
-                        enemy_data['vx'] = 0
+                        enemies.stomp_goomba(i, 30)
                         create_particles(enemy_rect.centerx, enemy_rect.top, GOOMBA_BROWN, 15, intensity=1.2)
-                    elif enemy_data['type'] == 'koopa':
-                        koopa_state = enemy_data.get('state', 'walking')
-                        if koopa_state == 'walking':
+                    elif enemies.kind[i] == ENEMY_KOOPA:
+                        if enemy_state == ST_WALKING:
                             play_sfx('stomp_koopa_to_shell')
-                            enemy_data['state'] = 'shell_idle'
-                            enemy_data['vx'] = 0
-                            enemy_data['rect'].height = KOOPA_SHELL_HEIGHT 
-                            enemy_data['rect'].bottom = enemy_rect.bottom 
-                            create_particles(enemy_rect.centerx, enemy_rect.top, KOOPA_GREEN_SHELL, 15)
-                        elif koopa_state == 'shell_sliding': 
+                            enemies.to_shell(i, KOOPA_SHELL_HEIGHT)
+                            create_particles(enemy_rect.centerx, enemy_rect.bottom - KOOPA_SHELL_HEIGHT, KOOPA_GREEN_SHELL, 15)
+                        elif enemy_state == ST_SHELL_SLIDING: 
                             play_sfx('stomp_koopa_shell_stop')
-                            enemy_data['state'] = 'shell_idle'
-                            enemy_data['vx'] = 0
+                            enemies.stop_shell(i)
                             create_particles(enemy_rect.centerx, enemy_rect.centery, WHITE, 10)
                 else: 
                     if player_state == S_SUPER:
@@ -1313,86 +1329,87 @@ while running:
                     else: 
                         player_dies()
                     break 
-        if player_invincible:
-            invincible_timer -= 1
-            if invincible_timer <= 0:
-                player_invincible = False
+            enemies.compact()
+            if player_invincible:
+                invincible_timer -= 1
+                if invincible_timer <= 0:
+                    player_invincible = False
         
-        for i in range(len(items) - 1, -1, -1):
-            item_data = items[i]
-            item_rect = item_data['rect']
-
-            if item_data['spawn_timer'] > 0: 
-                item_data['spawn_timer'] -= 1
-                item_rect.y = item_data['original_y'] - (POWERUP_REVEAL_DURATION - item_data['spawn_timer']) * (MUSHROOM_HEIGHT / POWERUP_REVEAL_DURATION)
-                continue 
-
-            if item_data['type'] == 'mushroom':
-                item_rect.x += item_data['vx'] * (60*actual_dt_for_physics)
-                item_data['vy'] += GRAVITY_ITEM * (60*actual_dt_for_physics)
-                item_rect.y += item_data['vy'] * (60*actual_dt_for_physics)
-                item_on_ground = False
-                for p_data in current_level_platforms:
-                    platform_rect_item = p_data['rect']
-                    if item_rect.colliderect(platform_rect_item):
-                        if item_data['vy'] >= 0 and item_rect.bottom - item_data['vy']*(60*actual_dt_for_physics) <= platform_rect_item.top +1:
-                            item_rect.bottom = platform_rect_item.top
-                            item_data['vy'] = 0
-                            item_on_ground = True
-                        elif (item_data['vx'] > 0 and item_rect.right > platform_rect_item.left and item_rect.left < platform_rect_item.left) or \
-                             (item_data['vx'] < 0 and item_rect.left < platform_rect_item.right and item_rect.right > platform_rect_item.right):
-                            if item_on_ground: 
-                                 item_data['vx'] *= -1
-                item_data['on_ground'] = item_on_ground
-                if (item_rect.left <=0 and item_data['vx'] < 0) or (item_rect.right >= WIDTH and item_data['vx'] > 0) : item_data['vx'] *= -1
-
-                if player_rect.colliderect(item_rect):
-                    play_sfx('powerup_collect')
-                    items.pop(i)
-                    score += 1000 
-                    if player_state == S_SMALL:
-                        player_state = S_SUPER
-                        update_player_size()
-                        player_invincible = True 
-                        invincible_timer = INVINCIBILITY_DURATION // 2
-                    elif stored_item_type is None: 
-                        stored_item_type = 'mushroom' 
-                    create_particles(item_rect.centerx, item_rect.centery, MUSHROOM_RED, 20)
+            for i in range(len(items) - 1, -1, -1):
+                item_data = items[i]
+                item_rect = item_data['rect']
+
+                if item_data['spawn_timer'] > 0: 
+                    item_data['spawn_timer'] -= 1
+                    item_rect.y = item_data['original_y'] - (POWERUP_REVEAL_DURATION - item_data['spawn_timer']) * (MUSHROOM_HEIGHT / POWERUP_REVEAL_DURATION)
+                    continue 
+
+                if item_data['type'] == 'mushroom':
+                    item_data['vy'] += GRAVITY_ITEM * (60*actual_dt_for_physics)
+                    new_x, new_y, contacts = move_box(item_rect.x, item_rect.y, item_rect.width, item_rect.height,
+                                                      item_data['vx'] * (60*actual_dt_for_physics),
+                                                      item_data['vy'] * (60*actual_dt_for_physics), platform_level)
+                    item_rect.x, item_rect.y = new_x, new_y
+                    if contacts.landed or contacts.ceiling:
+                        item_data['vy'] = 0
+                    if contacts.wall and (contacts.landed or item_data['on_ground']):
+                        item_data['vx'] *= -1
+                    item_data['on_ground'] = contacts.landed
+                    if (item_rect.left <=0 and item_data['vx'] < 0) or (item_rect.right >= WIDTH and item_data['vx'] > 0) : item_data['vx'] *= -1
+
+                    if player_rect.colliderect(item_rect):
+                        play_sfx('powerup_collect')
+                        items.pop(i)
+                        score += 1000 
+                        if player_state == S_SMALL:
+                            player_state = S_SUPER
+                            update_player_size()
+                            player_invincible = True 
+                            invincible_timer = INVINCIBILITY_DURATION // 2
+                        elif stored_item_type is None: 
+                            stored_item_type = 'mushroom' 
+                        create_particles(item_rect.centerx, item_rect.centery, MUSHROOM_RED, 20)
             
-            elif item_data['type'] == 'coin_anim':
-                item_data['rect'].y += item_data['vy'] * (60*actual_dt_for_physics)
-                item_data['rect'].x += item_data['vx'] * (60*actual_dt_for_physics)
-                item_data['vy'] += GRAVITY_ITEM * 0.5 * (60*actual_dt_for_physics) 
-                item_data['duration'] -= 1
-                if item_data['duration'] <= 0:
-                    items.pop(i)
-                    create_particles(item_rect.centerx, item_rect.centery, QUESTION_BLOCK_YELLOW, 5, intensity=0.5)
-
-        goal_struct_x, goal_struct_y_bottom = goal_posts_data[current_level_index]
-        tape_actual_y = (goal_struct_y_bottom - GOAL_TAPE_HEIGHT_TOTAL) + goal_tape_y_offset
-        goal_tape_rect_actual = pygame.Rect(goal_struct_x - GOAL_TAPE_WIDTH // 2, tape_actual_y, GOAL_TAPE_WIDTH, GOAL_TAPE_MOVING_HEIGHT)
-
-        if player_rect.colliderect(goal_tape_rect_actual):
-            play_sfx('level_complete')
-            hit_pos_on_tape = (player_rect.centery - tape_actual_y) / GOAL_TAPE_MOVING_HEIGHT 
-            base_score = 1000
-            time_bonus = max(0, level_time_limit - ((pygame.time.get_ticks() - level_start_time) // 1000)) * 50
-            score += base_score + time_bonus
-            state = LEVEL_COMPLETE
-            create_particles(player_rect.centerx, player_rect.top, GOAL_TAPE_COLOR, 40, intensity=2.5)
-
-        goal_tape_y_offset += goal_tape_direction * 0.8 * (60 * actual_dt_for_physics) 
-        if goal_tape_y_offset > GOAL_TAPE_HEIGHT_TOTAL - GOAL_TAPE_MOVING_HEIGHT:
-            goal_tape_y_offset = GOAL_TAPE_HEIGHT_TOTAL - GOAL_TAPE_MOVING_HEIGHT
-            goal_tape_direction = -1
-        elif goal_tape_y_offset < 0:
-            goal_tape_y_offset = 0
-            goal_tape_direction = 1
-
-        elapsed_time_seconds = (pygame.time.get_ticks() - level_start_time) // 1000
-        if elapsed_time_seconds >= level_time_limit:
-            if not player_invincible : player_dies() 
-
+                elif item_data['type'] == 'coin_anim':
+                    item_data['rect'].y += item_data['vy'] * (60*actual_dt_for_physics)
+                    item_data['rect'].x += item_data['vx'] * (60*actual_dt_for_physics)
+                    item_data['vy'] += GRAVITY_ITEM * 0.5 * (60*actual_dt_for_physics) 
+                    item_data['duration'] -= 1
+                    if item_data['duration'] <= 0:
+                        items.pop(i)
+                        create_particles(item_rect.centerx, item_rect.centery, QUESTION_BLOCK_YELLOW, 5, intensity=0.5)
+
+            goal_struct_x, goal_struct_y_bottom = goal_posts_data[current_level_index]
+            tape_actual_y = (goal_struct_y_bottom - GOAL_TAPE_HEIGHT_TOTAL) + goal_tape_y_offset
+            goal_tape_rect_actual = pygame.Rect(goal_struct_x - GOAL_TAPE_WIDTH // 2, tape_actual_y, GOAL_TAPE_WIDTH, GOAL_TAPE_MOVING_HEIGHT)
+
+            if player_rect.colliderect(goal_tape_rect_actual):
+                play_sfx('level_complete')
+                hit_pos_on_tape = (player_rect.centery - tape_actual_y) / GOAL_TAPE_MOVING_HEIGHT 
+                base_score = 1000
+                time_bonus = max(0, level_time_limit - ((pygame.time.get_ticks() - level_start_time) // 1000)) * 50
+                score += base_score + time_bonus
+                state = LEVEL_COMPLETE
+                create_particles(player_rect.centerx, player_rect.top, GOAL_TAPE_COLOR, 40, intensity=2.5)
+
+            goal_tape_y_offset += goal_tape_direction * 0.8 * (60 * actual_dt_for_physics) 
+            if goal_tape_y_offset > GOAL_TAPE_HEIGHT_TOTAL - GOAL_TAPE_MOVING_HEIGHT:
+                goal_tape_y_offset = GOAL_TAPE_HEIGHT_TOTAL - GOAL_TAPE_MOVING_HEIGHT
+                goal_tape_direction = -1
+            elif goal_tape_y_offset < 0:
+                goal_tape_y_offset = 0
+                goal_tape_direction = 1
+
+            elapsed_time_seconds = (pygame.time.get_ticks() - level_start_time) // 1000
+            if elapsed_time_seconds >= level_time_limit:
+                if not player_invincible : player_dies()
+
+    if sim_accumulator >= SIM_DT:
+        loop_stats['dropped_ms'] += (sim_accumulator - sim_accumulator % SIM_DT) * 1000
+        sim_accumulator %= SIM_DT
+    loop_stats['steps'] = sim_steps
+    loop_stats['sim_ms'] = (time.perf_counter() - sim_start) * 1000
+    render_alpha = sim_accumulator / SIM_DT
 
     # --- Drawing ---
     if state == MENU:
@@ -1400,11 +1417,18 @@ while running:
     elif state == SELECT:
         draw_select()
     elif state == PLAYING or state == PLAYER_DIED_TRANSITION: 
-        draw_game()
+        draw_game(render_alpha)
     elif state == GAME_OVER:
         draw_game_over()
     elif state == LEVEL_COMPLETE:
         draw_level_complete()
+    if show_loop_stats:
+        contact_hits, contact_misses = enemies.contact_stats() if enemies else (0, 0)
+        stats_text = small_font.render(f"sim steps {loop_stats['steps']}  sim {loop_stats['sim_ms']:.1f} ms  dropped {loop_stats['dropped_ms']:.0f} ms"
+                                       f"  collision rects {len(platform_level)}/{len(current_level_platforms)}"
+                                       f"  enemy contacts cached {contact_hits / max(1, contact_hits + contact_misses):.0%}"
+                                       f"  precise hits {'on' if precise_collision else 'off'} ({len(sprite_masks)} masks, {sprite_masks.misses} misses)", True, WHITE)
+        screen.blit(stats_text, (10, HEIGHT - 30))
 
     pygame.display.flip()
 
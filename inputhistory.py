@@ -0,0 +1,135 @@
+# inputhistory.py
+#
+# Redundant input history for input-driven netplay.
+# Every frame's buttons pack into one byte. Each outbound packet carries the
+# last N frames, XOR-delta encoded against the previous frame and run-length
+# compressed, so a held or idle stick costs a couple of bytes no matter how
+# many frames are repeated. A receiver that missed packets recovers the
+# frames from the next one that does arrive, without any retransmission.
+
+import base64
+import threading
+
+BUTTONS = ('left', 'right', 'jump', 'down', 'run', 'fire')   # bit 0 .. bit 5
+INPUT_REDUNDANCY = 12      # frames of history carried in every packet
+
+# -----------------------------------------------------------------------------
+# BITFIELDS
+# -----------------------------------------------------------------------------
+
+def pack_keys(keys):
+    bits = 0
+    for i, name in enumerate(BUTTONS):
+        if keys.get(name):
+            bits |= 1 << i
+    return bits
+
+def unpack_keys(bits):
+    return {name: bool(bits & (1 << i)) for i, name in enumerate(BUTTONS)}
+
+# -----------------------------------------------------------------------------
+# ENCODING
+# -----------------------------------------------------------------------------
+
+def encode_history(frames):
+    """frames: list of input bytes, oldest first. Returns an ASCII string for JSON."""
+    out = bytearray()
+    prev = 0
+    run_value = None
+    run_length = 0
+    for bits in frames:
+        delta = bits ^ prev
+        prev = bits
+        if delta == run_value and run_length < 255:
+            run_length += 1
+        else:
+            if run_value is not None:
+                out += bytes((run_length, run_value))
+            run_value = delta
+            run_length = 1
+    if run_value is not None:
+        out += bytes((run_length, run_value))
+    return base64.b64encode(bytes(out)).decode('ascii')
+
+def decode_history(payload):
+    """Inverse of encode_history: list of input bytes, oldest first."""
+    data = base64.b64decode(payload)
+    frames = []
+    prev = 0
+    for i in range(0, len(data) - 1, 2):
+        run_length, delta = data[i], data[i + 1]
+        for _ in range(run_length):
+            prev ^= delta
+            frames.append(prev)
+    return frames
+
+# -----------------------------------------------------------------------------
+# SENDER / RECEIVER
+# -----------------------------------------------------------------------------
+
+class InputHistory:
+    """The local player's recent inputs, ready to attach to outbound packets."""
+
+    def __init__(self, redundancy=INPUT_REDUNDANCY):
+        self.redundancy = redundancy
+        self.frames = []
+        self.latest = -1
+
+    def record(self, frame, keys):
+        self.frames.append(pack_keys(keys))
+        if len(self.frames) > self.redundancy:
+            del self.frames[0]
+        self.latest = frame
+
+    def encode(self):
+        return encode_history(self.frames)
+
+
+class InputReceiver:
+    """
+    A remote player's inputs by frame. Gaps left by lost packets are filled
+    from the redundant history in later packets; frames that have not
+    arrived at all are predicted by repeating the last known input.
+    """
+
+    def __init__(self, window=240):
+        self.window = window
+        self.inputs = {}        # frame -> bits
+        self.guesses = {}       # frame -> bits we predicted before it arrived
+        self.latest = None
+        self.last_bits = 0
+        self.lock = threading.Lock()
+        self.filled = 0         # frames recovered from redundancy, not their own packet
+        self.predicted = 0
+        self.mispredicted = 0
+
+    def receive(self, latest_frame, payload):
+        frames = decode_history(payload)
+        first = latest_frame - len(frames) + 1
+        with self.lock:
+            for frame, bits in enumerate(frames, first):
+                if frame in self.inputs:
+                    continue
+                self.inputs[frame] = bits
+                if frame != latest_frame:
+                    self.filled += 1
+                guess = self.guesses.pop(frame, None)
+                if guess is not None and guess != bits:
+                    self.mispredicted += 1
+            if self.latest is None or latest_frame > self.latest:
+                self.latest = latest_frame
+                self.last_bits = frames[-1] if frames else 0
+            horizon = self.latest - self.window
+            for frame in [f for f in self.inputs if f < horizon]:
+                del self.inputs[frame]
+            for frame in [f for f in self.guesses if f < horizon]:
+                del self.guesses[frame]
+
+    def keys_for(self, frame):
+        with self.lock:
+            bits = self.inputs.get(frame)
+            if bits is None:
+                bits = self.last_bits
+                self.guesses[frame] = bits
+                self.predicted += 1
+        return unpack_keys(bits)
@@ -0,0 +1,188 @@
+# kinematic.py
+#
+# Kinematic moving platforms: lifts that follow a path, carry whatever
+# stands on them and push whatever is in their way. Nothing pushes back;
+# a platform's motion is fixed by its path and speed.
+#
+#   KinematicPlatform -- one level item moving along waypoints, ping-pong
+#                        (two waypoints give a linear lift) or looped
+#   MovingPlatforms   -- steps a level's platforms and re-files each one in
+#                        the level's SpatialGrid with SpatialGrid.move(), so
+#                        a moving platform only updates its own cells and
+#                        the rest of the level is never rebuilt or rescanned
+#   carry()           -- applies one platform move to a rider's pygame.Rect
+#
+# Platforms move in whole pixels (the fraction carries over to the next
+# step), so a rider standing flush on top stays flush. Callers that cache
+# level contacts around a body (contactcache.py, EnemyWorld) must drop the
+# caches a moved platform reaches without already holding it;
+# MovingPlatforms.step() returns the moves for that.
+#
+# Run directly for a rebuild-per-frame versus incremental benchmark:
+#   python kinematic.py
+
+import math
+import time
+
+# -----------------------------------------------------------------------------
+# PLATFORMS
+# -----------------------------------------------------------------------------
+
+class KinematicPlatform:
+    __slots__ = ('item', 'rect', 'path', 'speed', 'loop', 'target', 'step_dir', 'fx', 'fy')
+
+    def __init__(self, item, path, speed, loop=False, rect_of=lambda item: item['rect']):
+        """
+        item  -- the level item that moves; its rect is moved in place
+        path  -- waypoints [(x, y), ...] for the rect's top-left, starting anywhere
+        speed -- px per 60 Hz frame along the path
+        loop  -- after the last waypoint go back to the first; otherwise reverse
+        """
+        self.item = item
+        self.rect = rect_of(item)
+        self.path = []
+        for p in path:
+            # Repeated waypoints would make zero-length legs
+            if not self.path or tuple(p) != self.path[-1]:
+                self.path.append(tuple(p))
+        if loop and len(self.path) > 1 and self.path[0] == self.path[-1]:
+            self.path.pop()
+        self.speed = speed
+        self.loop = loop
+        self.target = 1 if len(self.path) > 1 else 0
+        self.step_dir = 1
+        self.fx, self.fy = float(self.rect.x), float(self.rect.y)
+
+    def _next_target(self):
+        last = len(self.path) - 1
+        if self.loop:
+            self.target = (self.target + 1) % (last + 1)
+            return
+        if not 0 <= self.target + self.step_dir <= last:
+            self.step_dir = -self.step_dir
+        self.target += self.step_dir
+
+    def advance(self, f=1.0):
+        """Move speed * f px along the path. Returns (dx, dy) in whole pixels applied to the rect."""
+        budget = self.speed * f
+        if len(self.path) < 2:
+            budget = 0
+        while budget > 0:
+            tx, ty = self.path[self.target]
+            ex, ey = tx - self.fx, ty - self.fy
+            dist = math.hypot(ex, ey)
+            if dist <= budget:
+                self.fx, self.fy = tx, ty
+                budget -= dist
+                self._next_target()
+            else:
+                self.fx += ex / dist * budget
+                self.fy += ey / dist * budget
+                budget = 0
+        r = self.rect
+        dx, dy = round(self.fx) - r.x, round(self.fy) - r.y
+        r.x += dx
+        r.y += dy
+        return dx, dy
+
+
+class MovingPlatforms:
+    def __init__(self, grid, platforms):
+        """
+        grid      -- the level's SpatialGrid; every platform's item must be one of its items
+        platforms -- KinematicPlatforms
+        """
+        self.grid = grid
+        self.platforms = list(platforms)
+        position = {id(item): i for i, item in enumerate(grid.items)}
+        self.indices = [position[id(p.item)] for p in self.platforms]
+        self.cell_updates = 0    # grid cells changed so far; no full rebuild ever happens
+
+    def __len__(self):
+        return len(self.platforms)
+
+    def step(self, f=1.0):
+        """Advance every platform. Returns [(old rect, new rect, item), ...] for those that moved."""
+        moves = []
+        grid = self.grid
+        for platform, index in zip(self.platforms, self.indices):
+            old = platform.rect.copy()
+            dx, dy = platform.advance(f)
+            if dx or dy:
+                self.cell_updates += grid.move(index, old)
+                moves.append((old, platform.rect, platform.item))
+        return moves
+
+# -----------------------------------------------------------------------------
+# RIDERS
+# -----------------------------------------------------------------------------
+
+def carry(rect, old, new):
+    """
+    Apply a platform move from old to new to a body's rect, in place.
+    A body standing on the platform moves with it; a body the platform ran
+    into is pushed out along the platform's motion (up onto it when it
+    rises). Returns True if the rect moved.
+    """
+    if rect.bottom == old.top and rect.right > old.left and rect.left < old.right:
+        rect.x += new.x - old.x
+        rect.y += new.y - old.y
+        return True
+    if not rect.colliderect(new):
+        return False
+    if new.y < old.y:
+        rect.bottom = new.top
+    elif new.y > old.y:
+        rect.top = new.bottom
+    elif new.x > old.x:
+        rect.left = new.right
+    else:
+        rect.right = new.left
+    return True
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+
+def benchmark(counts=(100, 1000, 5000), lifts=8, frames=300):
+    """Lifts in a big level: rebuild the SpatialGrid every frame vs re-file only the lifts."""
+    import random
+    import pygame
+    from spatialgrid import SpatialGrid
+
+    rng = random.Random(1)
+    print(f"{'platforms':>9} {'rebuild ms':>11} {'incremental ms':>15} {'cells/frame':>12}")
+    for count in counts:
+        width = count * 24
+        def make_level():
+            rng.seed(count)
+            level = [{'rect': pygame.Rect(rng.randrange(0, width), rng.randrange(100, 560), 64, 20)} for _ in range(count)]
+            moving = [KinematicPlatform(level[k], [(level[k]['rect'].x, level[k]['rect'].y),
+                                                   (level[k]['rect'].x + 200, level[k]['rect'].y - 120)], 1.5)
+                      for k in range(0, count, count // lifts)][:lifts]
+            return level, moving
+
+        level, moving = make_level()
+        start = time.perf_counter()
+        for _ in range(frames):
+            for p in moving:
+                p.advance()
+            SpatialGrid(level)
+        rebuild = (time.perf_counter() - start) / frames
+
+        level, moving = make_level()
+        lifts_set = MovingPlatforms(SpatialGrid(level), moving)
+        start = time.perf_counter()
+        for _ in range(frames):
+            lifts_set.step()
+        incremental = (time.perf_counter() - start) / frames
+
+        # The incrementally maintained grid answers like a fresh one
+        fresh = SpatialGrid(level)
+        for _ in range(200):
+            probe = pygame.Rect(rng.randrange(0, width), rng.randrange(0, 600), 40, 40)
+            assert lifts_set.grid.query_rect(probe) == fresh.query_rect(probe)
+        print(f"{count:>9} {rebuild * 1000:>11.3f} {incremental * 1000:>15.3f} {lifts_set.cell_updates / frames:>12.2f}")
+
+if __name__ == "__main__":
+    benchmark()
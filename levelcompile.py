@@ -0,0 +1,255 @@
+# levelcompile.py
+#
+# Level compiler for the dict-based LEVEL lists used by the Mario vs Luigi
+# games. compile_level() turns the dicts into one prebuilt pygame.Rect per
+# platform plus per-platform type flags, once at load time. Collision code
+# then asks for the overlapping platforms with a single collidelistall()
+# call (which runs in C) instead of building a fresh Rect per platform, per
+# player, per frame.
+#
+# merge_level() is the geometry optimizer: adjacent or overlapping solids of
+# the same collision class are merged into maximal rectangles, so a floor
+# authored as twenty blocks costs one test in every collision loop.
+# Interactive blocks (question, brick) are passed through untouched, so
+# they keep their identity and per-block state. Games run it at load time
+# on their collision view and keep the authored list for drawing.
+#
+# hits() and solid_hits() take an optional ContactCache (contactcache.py)
+# per moving body: while the body stays near last frame's platforms only
+# those are tested, not the whole level.
+#
+# Run directly to compare Rects built and time per query against the old
+# build-a-Rect-per-platform loop:
+#   python levelcompile.py
+# or for the offline merge report over the games' level tables:
+#   python levelcompile.py merge
+
+import time
+
+import pygame
+
+# -----------------------------------------------------------------------------
+# COMPILED LEVEL
+# -----------------------------------------------------------------------------
+
+class CompiledLevel:
+    def __init__(self, level, solid_types=None):
+        """
+        level       -- list of {'x', 'y', 'w', 'h', 'type'} dicts
+        solid_types -- platform types that block movement; None means every type
+        """
+        self.data = list(level)
+        self.rects = [pygame.Rect(p['x'], p['y'], p['w'], p['h']) for p in self.data]
+        self.types = [p['type'] for p in self.data]
+        self.solid = [solid_types is None or t in solid_types for t in self.types]
+
+    def __len__(self):
+        return len(self.rects)
+
+    def _near(self, box):
+        return box.collidelistall(self.rects)
+
+    def hits(self, rect, cache=None):
+        """Indices of platforms overlapping rect, in level order. cache is the body's ContactCache, if any."""
+        rects = self.rects
+        if cache is None:
+            return rect.collidelistall(rects)
+        return [i for i in cache.near(rect, self._near, rects.__getitem__) if rect.colliderect(rects[i])]
+
+    def solid_hits(self, rect, cache=None):
+        solid = self.solid
+        return [i for i in self.hits(rect, cache) if solid[i]]
+
+
+def compile_level(level, solid_types=None):
+    return CompiledLevel(level, solid_types)
+
+# -----------------------------------------------------------------------------
+# GEOMETRY MERGING
+# -----------------------------------------------------------------------------
+
+def merge_rects(rects):
+    """
+    Cover the union of rects with few non-overlapping pygame.Rects. The
+    edges are compressed into a grid of cells, then each uncovered cell
+    grows right as far as it can and then down, row by row (greedy maximal
+    rectangles). Empty rects are dropped.
+    """
+    rects = [pygame.Rect(r) for r in rects if r[2] > 0 and r[3] > 0]
+    if len(rects) < 2:
+        return rects
+    xs = sorted({r.left for r in rects} | {r.right for r in rects})
+    ys = sorted({r.top for r in rects} | {r.bottom for r in rects})
+    xi = {x: i for i, x in enumerate(xs)}
+    yi = {y: i for i, y in enumerate(ys)}
+    cols, rows = len(xs) - 1, len(ys) - 1
+    free = [[False] * cols for _ in range(rows)]     # covered by the level and not yet merged
+    for r in rects:
+        for row in range(yi[r.top], yi[r.bottom]):
+            line = free[row]
+            for col in range(xi[r.left], xi[r.right]):
+                line[col] = True
+
+    merged = []
+    for row in range(rows):
+        for col in range(cols):
+            if not free[row][col]:
+                continue
+            end_col = col + 1
+            while end_col < cols and free[row][end_col]:
+                end_col += 1
+            end_row = row + 1
+            while end_row < rows and all(free[end_row][col:end_col]):
+                end_row += 1
+            for r in range(row, end_row):
+                free[r][col:end_col] = [False] * (end_col - col)
+            merged.append(pygame.Rect(xs[col], ys[row], xs[end_col] - xs[col], ys[end_row] - ys[row]))
+    return merged
+
+
+def merge_level(items, rect_of=lambda item: item['rect'], class_of=lambda item: item['type'],
+                interactive=lambda item: False, build=lambda rect, kind: {'rect': rect, 'type': kind}):
+    """
+    Collision view of a level with same-class solids merged.
+    items       -- the authored platforms
+    class_of    -- collision class; only items of the same class are merged
+    interactive -- True for items that must stay whole and keep their identity
+    build       -- makes a level item for a merged rect of a class
+    Interactive items, and any rect the merge leaves as it was, are the
+    original objects. A class's merged items take the place of its first
+    item; the rest keep level order.
+    """
+    groups = {}
+    for item in items:
+        if not interactive(item):
+            groups.setdefault(class_of(item), []).append(item)
+    merged = {}
+    for kind, members in groups.items():
+        originals = {tuple(rect_of(m)): m for m in members}
+        merged[kind] = [originals.get(tuple(r)) or build(r, kind)
+                        for r in merge_rects([rect_of(m) for m in members])]
+
+    out = []
+    for item in items:
+        if interactive(item):
+            out.append(item)
+        else:
+            out.extend(merged.pop(class_of(item), ()))
+    return out
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+
+class _CountingRect(pygame.Rect):
+    built = 0
+
+    def __init__(self, *args):
+        _CountingRect.built += 1
+        super().__init__(*args)
+
+
+def benchmark(counts=(6, 50, 200), queries=2000):
+    import random
+
+    rng = random.Random(1)
+    print(f"{'platforms':>9} {'rect loop':>22} {'compiled':>22}")
+    for count in counts:
+        level = [{'x': rng.randrange(0, 800), 'y': rng.randrange(0, 480), 'w': 64, 'h': 16,
+                  'type': 'solid'} for _ in range(count)]
+        compiled = compile_level(level)
+        probe = pygame.Rect(300, 200, 32, 64)
+
+        def rect_loop():
+            for plat in level:
+                probe.colliderect(pygame.Rect(plat['x'], plat['y'], plat['w'], plat['h']))
+
+        def batched():
+            for i in compiled.hits(probe):
+                compiled.rects[i]
+
+        results = []
+        for fn in (rect_loop, batched):
+            # Count the Rects one query builds by swapping in a counting subclass
+            real_rect, pygame.Rect = pygame.Rect, _CountingRect
+            _CountingRect.built = 0
+            try:
+                fn()
+            finally:
+                pygame.Rect = real_rect
+            built = _CountingRect.built
+            start = time.perf_counter()
+            for _ in range(queries):
+                fn()
+            us = (time.perf_counter() - start) / queries * 1e6
+            results.append(f"{us:7.2f} us {built:4d} rects")
+        print(f"{count:>9} {results[0]:>22} {results[1]:>22}")
+
+
+# Level tables of the games, for the offline merge report: (file, table, interactive types)
+MERGE_REPORT_TABLES = [
+    ('geminimario4k.py', 'levels_platforms_data', ('question', 'brick', 'lift')),
+    ('gemini2.56.1.25_mario.py', 'levels_platforms_data', ('question', 'brick')),
+    ('mario1x.py', 'levels', ()),
+]
+
+
+def _level_table(path, name):
+    # Evaluate the module's top-level constant assignments (WIDTH, HEIGHT, ...)
+    # up to the table without running the game
+    import ast
+
+    tree = ast.parse(open(path, encoding='utf-8').read(), path)
+    names = {}
+    for node in tree.body:
+        if not isinstance(node, ast.Assign) or len(node.targets) != 1:
+            continue
+        target = node.targets[0]
+        targets = target.elts if isinstance(target, ast.Tuple) else [target]
+        if not all(isinstance(t, ast.Name) for t in targets):
+            continue
+        try:
+            value = eval(compile(ast.Expression(node.value), path, 'eval'), {'__builtins__': {}}, dict(names))
+        except Exception:
+            continue
+        if isinstance(target, ast.Tuple):
+            names.update(zip((t.id for t in targets), value))
+        else:
+            names[target.id] = value
+        if getattr(target, 'id', None) == name:
+            return value
+    raise KeyError(f"{name} not found in {path}")
+
+
+def merge_report():
+    import os
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    print(f"{'game':<26} {'level':>5} {'rects':>6} {'merged':>7} {'tests saved':>12}")
+    for filename, table, interactive_types in MERGE_REPORT_TABLES:
+        for index, level in enumerate(_level_table(os.path.join(here, filename), table)):
+            # Rows are (x, y, w, h) or (x, y, w, h, type[, properties])
+            items = [{'rect': pygame.Rect(row[:4]), 'type': row[4] if len(row) > 4 else 'solid'} for row in level]
+            merged = merge_level(items, interactive=lambda item: item['type'] in interactive_types)
+            saved = len(items) - len(merged)
+            print(f"{filename:<26} {index:>5} {len(items):>6} {len(merged):>7} {saved:>5} ({saved / len(items):4.0%})")
+
+    # A fan-made level authored in 32 px tiles: two rows of floor, a staircase,
+    # and a row of bricks with a question block in the middle
+    items = [{'rect': pygame.Rect(x * 32, 568 - row * 32, 32, 32), 'type': 'ground'}
+             for x in range(50) for row in range(2)]
+    items += [{'rect': pygame.Rect((30 + step) * 32, 504 - h * 32, 32, 32), 'type': 'ground'}
+              for step in range(6) for h in range(step + 1)]
+    items += [{'rect': pygame.Rect(x * 32, 376, 32, 32), 'type': 'question' if x == 12 else 'brick'}
+              for x in range(10, 15)]
+    merged = merge_level(items, interactive=lambda item: item['type'] in ('question', 'brick'))
+    saved = len(items) - len(merged)
+    print(f"{'(tiled example)':<26} {'':>5} {len(items):>6} {len(merged):>7} {saved:>5} ({saved / len(items):4.0%})")
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ['merge']:
+        merge_report()
+    else:
+        benchmark()
@@ -1,6 +1,8 @@
 import pygame
 import sys
 import random
+from levelcompile import merge_rects
+from platformphysics import MovementProfile, PlatformLevel, walk, start_jump, fall, move_box
 
 # Initialize Pygame
 pygame.init()
@@ -46,10 +48,16 @@ levels = [
 # Selected level
 current_level_index = 0
 current_level = []
+collision_level = [] # current_level merged into maximal rects, built in reset_level
+platform_level = PlatformLevel([]) # One-way view of collision_level, rebuilt in reset_level
 flag_positions = [(700, 280), (700, 180), (600, 180), (700, 80), (700, 280)]
 coins = []
 
 # Player setup
+MOVE_SPEED = 5
+JUMP_STRENGTH = -15
+GRAVITY = 0.8
+PLAYER_PROFILE = MovementProfile('mario1x', max_speed=MOVE_SPEED, gravity=GRAVITY, jump_velocity=JUMP_STRENGTH)
 player = pygame.Rect(50, HEIGHT - 60, 30, 40)
 player_velocity_y = 0
 on_ground = False
@@ -62,6 +70,7 @@ invincible_timer = 0
 # Enemy
 enemies = []
 enemy_velocity = 2
+enemy_velocity_y = [] # per-enemy fall speed, parallel to enemies
 enemy_color = RED
 
 # Game timer
@@ -95,8 +104,10 @@ def create_particles(x, y, color, count=5):
         particles.append([x, y, speed_x, speed_y, size, color, lifetime])
 
 def reset_level(index):
-    global current_level, enemies, player, coins, player_velocity_y, level_start_time
+    global current_level, collision_level, platform_level, enemies, enemy_velocity_y, player, coins, player_velocity_y, level_start_time
     current_level = [pygame.Rect(*rect) for rect in levels[index]]
+    collision_level = merge_rects(current_level)
+    platform_level = PlatformLevel.from_rects(collision_level, one_way=True)
     player.topleft = (50, HEIGHT - 60)
     player_velocity_y = 0
     
@@ -118,6 +129,13 @@ def reset_level(index):
         enemies.append(pygame.Rect(100, 450, 30, 40))
         enemies.append(pygame.Rect(350, 400, 30, 40))
         enemies.append(pygame.Rect(600, 300, 30, 40))
+    # Enemies placed across a platform start standing on it
+    for enemy in enemies:
+        for platform in collision_level:
+            if enemy.colliderect(platform):
+                enemy.bottom = platform.top
+                break
+    enemy_velocity_y = [0] * len(enemies)
     
     # Create coins
     coins = []
@@ -352,22 +370,27 @@ while True:
 
     if state == PLAYING:
         # Horizontal movement
+        direction = 0
         if keys[pygame.K_LEFT]:
-            player.x -= MOVE_SPEED
+            direction -= 1
             facing_right = False
         if keys[pygame.K_RIGHT]:
-            player.x += MOVE_SPEED
+            direction += 1
             facing_right = True
 
         # Jump
         if keys[pygame.K_SPACE] and on_ground:
-            player_velocity_y = JUMP_STRENGTH
+            player_velocity_y, _ = start_jump(PLAYER_PROFILE)
             on_ground = False
             create_particles(player.x + player.width // 2, player.bottom, YELLOW, 10)
 
-        # Apply gravity
-        player_velocity_y += GRAVITY
-        player.y += player_velocity_y
+        # Apply gravity and move; platforms only catch the player landing on top
+        player_velocity_y, _ = fall(player_velocity_y, False, 0, PLAYER_PROFILE)
+        player.x, player.y, contacts = move_box(player.x, player.y, player.width, player.height,
+                                                walk(0, direction, PLAYER_PROFILE), player_velocity_y, platform_level)
+        on_ground = contacts.landed
+        if on_ground:
+            player_velocity_y = 0
 
         # Boundary check
         if player.left < 0:
@@ -381,36 +404,20 @@ while True:
             player_velocity_y = 0
             on_ground = True
 
-        # Collision with platforms
-        on_ground = False
-        for platform in current_level:
-            if player.colliderect(platform) and player_velocity_y > 0:
-                player.bottom = platform.top
-                player_velocity_y = 0
-                on_ground = True
-
         # Enemy movement
-        for enemy in enemies[:]:
-            enemy.x += enemy_velocity
+        for i, enemy in enumerate(enemies):
+            enemy_velocity_y[i], _ = fall(enemy_velocity_y[i], False, 0, PLAYER_PROFILE)
+            enemy.x, enemy.y, contacts = move_box(enemy.x, enemy.y, enemy.width, enemy.height,
+                                                  enemy_velocity, enemy_velocity_y[i], platform_level)
+            if contacts.landed:
+                enemy_velocity_y[i] = 0
+            if enemy.bottom >= HEIGHT:
+                enemy.bottom = HEIGHT
+                enemy_velocity_y[i] = 0
             
             # Turn around at edges
             if enemy.left <= 0 or enemy.right >= WIDTH:
                 enemy_velocity *= -1
-                
-            # Fall if not on platform
-            on_platform = False
-            for platform in current_level:
-                if enemy.colliderect(platform) and enemy_velocity_y >= 0:
-                    enemy.bottom = platform.top
-                    enemy_velocity_y = 0
-                    on_platform = True
-                    break
-            
-            if not on_platform and enemy.bottom < HEIGHT:
-                enemy_velocity_y += GRAVITY
-                enemy.y += enemy_velocity_y
-            else:
-                enemy_velocity_y = 0
 
         # Enemy collision
         if player_invincible:
@@ -6,6 +6,17 @@ import random
 import time
 import sys
 import math
+import types
+from collections import deque
+
+from netclock import ClockSync
+from statehash import FrameHasher, DesyncDetector, TrackedRandom
+from netcapture import open_capture_from_env
+from platformphysics import MovementProfile, PlatformLevel, walk, start_jump, fall, move_box
+from tilemap import TileMap
+from pickupgrid import PickupGrid
+from projectilepool import ProjectilePool, projectile_hits
+from pvpstage import run_pvp
 
 # --- Constants ---
 SCREEN_W, SCREEN_H = 800, 480
@@ -24,12 +35,32 @@ LEVEL = [
     {'x': 400, 'y': 300, 'w': TILE*2, 'h': TILE, 'type': 'pipeL'},
     {'x': 500, 'y': 300, 'w': TILE*2, 'h': TILE, 'type': 'pipeR'},
 ]
+LEVEL_SOLIDS = [p for p in LEVEL if p['type'] in ('solid', 'pipeL', 'pipeR')]
+LEVEL_COLLISION = PlatformLevel.from_rects([(p['x'], p['y'], p['w'], p['h']) for p in LEVEL_SOLIDS])
+# The same solids as a tilemap; --tilemap resolves the players on it instead
+LEVEL_TILES = TileMap.from_level(LEVEL_SOLIDS)
+PLAYER_LEVEL = LEVEL_TILES if '--tilemap' in sys.argv else LEVEL_COLLISION
+# Damped walk: vx is multiplied by 0.85 every frame and 0.8 added while a
+# direction is held, so 4.25 px a frame is the top speed
+PLAYER_PROFILE = MovementProfile('mariovluigi', max_speed=4.25, accel=0.8, damping=0.85, gravity=0.5,
+                                 jump_velocity=-12)
 COIN_SPAWNS = [(200, 300), (400, 280), (600, 200), (700, 360)]
+PICKUP_RADIUS = 30  # px from a player's x, y within which coins, items and stars are collected
+FREEZE_FRAMES = FPS * 2  # an ice shot freezes a player this long
+HURT_FRAMES = FPS // 2   # hurt flash after a fire shot ...
+FIRE_KNOCKBACK = 4       # ... which also pushes the player along the shot's direction
+MATCH_SEED = 2025   # seeds the world RNG so every peer spawns the same items
+ITEM_FIRST_TICK = FPS * 10  # shared match tick of the first timed item spawn
+HASH_INTERVAL = 30  # ticks between state checksums exchanged with peers
+WORLD_MAX_CATCHUP = FPS  # match ticks the world replays in one frame; more means we joined a match under way
 
 # --- Globals for network ---
 remotes = {}
 remote_lock = threading.Lock()
 running = True
+clock_sync = None
+remote_hashes = deque(maxlen=64)  # (pid, checkpoint, hash) from peers
+net_stats = {'received': 0, 'bytes': 0, 'decode_errors': 0}
 
 def listener(local_id):
     global remotes, running
@@ -37,45 +68,89 @@ def listener(local_id):
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
     sock.settimeout(0.1)
     sock.bind(('', UDP_PORT))
+    capture = open_capture_from_env()
     
     while running:
         try:
             data, addr = sock.recvfrom(1024)
+            net_stats['received'] += 1
+            net_stats['bytes'] += len(data)
+            if capture:
+                capture.write(data)
+            sync = clock_sync
+            recv_time = sync.now() if sync else 0.0
             msg = json.loads(data.decode('utf-8'))
             if msg['pid'] == local_id:
                 continue
+
+            # Clock sync round trips share the state socket
+            if msg.get('type') in ('ping', 'pong'):
+                if sync:
+                    reply = sync.handle(msg, recv_time)
+                    if reply:
+                        sock.sendto(json.dumps(reply).encode('utf-8'), (BROADCAST, UDP_PORT))
+                continue
+
+            if msg.get('type') == 'hash':
+                remote_hashes.append((msg['pid'], msg['cp'], msg['hash']))
+                continue
                 
             with remote_lock:
-                if msg['pid'] not in remotes:
-                    color = (msg['color_r'], msg['color_g'], msg['color_b'])
-                    remotes[msg['pid']] = Player(msg['pid'], color, msg['x'], msg['y'])
-                
-                p = remotes[msg['pid']]
-                p.x = msg['x']
-                p.y = msg['y']
-                p.vx = msg['vx']
-                p.vy = msg['vy']
-                p.facing = msg['facing']
-                p.ground = msg['ground']
-                p.state = msg['state']
-                p.power = msg['power']
-                p.stars = msg['stars']
-                p.lives = msg['lives']
-                p.coins = msg['coins']
-                p.projectiles = msg['projectiles']
-                p.dead = msg['dead']
-                p.invuln = msg['invuln']
-                p.respawn = msg['respawn']
-                p.score = msg['score']
-                p.frozen_timer = msg['frozen_timer']
+                apply_remote_state(msg)
                 
         except socket.timeout:
             continue
+        except (ValueError, KeyError, TypeError):
+            # Undecodable or malformed datagram
+            net_stats['decode_errors'] += 1
         except Exception as e:
             print(f"Network error: {e}")
 
+    if capture:
+        capture.close()
+    sock.close()
+
+def apply_remote_state(msg):
+    # Copy a peer's state message onto its remote player; caller holds remote_lock
+    if msg['pid'] not in remotes:
+        color = (msg['color_r'], msg['color_g'], msg['color_b'])
+        remotes[msg['pid']] = Player(msg['pid'], color, msg['x'], msg['y'])
+
+    p = remotes[msg['pid']]
+    p.x = msg['x']
+    p.y = msg['y']
+    p.vx = msg['vx']
+    p.vy = msg['vy']
+    p.facing = msg['facing']
+    p.ground = msg['ground']
+    p.state = msg['state']
+    p.power = msg['power']
+    p.stars = msg['stars']
+    p.lives = msg['lives']
+    p.coins = msg['coins']
+    p.projectiles.load(msg['projectiles'])
+    p.dead = msg['dead']
+    p.invuln = msg['invuln']
+    p.respawn = msg['respawn']
+    p.score = msg['score']
+    p.frozen_timer = msg['frozen_timer']
+    p.tick = msg.get('tick', 0)
+
 # --- Game Classes ---
+UNSAVED_SLOTS = ('_rect',)  # per-frame cache, rebuilt on demand
+
+def slot_state(obj):
+    """Attribute dict of a __slots__ entity (they have no vars()); property-backed slots lose their underscore."""
+    return {name.lstrip('_'): getattr(obj, name) for name in type(obj).__slots__ if name not in UNSAVED_SLOTS}
+
 class Player:
+    # x, y, width and height are properties: changing one drops the cached
+    # rect, so rect() only builds a new pygame.Rect after the player moved.
+    __slots__ = ('pid', 'color', '_x', '_y', 'vx', 'vy', 'lives', 'respawn', 'stars', 'state',
+                 'power', 'facing', 'ground', 'dead', 'invuln', 'projectiles', 'score',
+                 'frozen_timer', 'coins', 'tick', 'jump_timer', 'hurt_timer', '_width', '_height',
+                 '_rect')
+
     def __init__(self, pid, color, x, y):
         self.pid = pid
         self.color = color
@@ -92,17 +167,58 @@ class Player:
         self.ground = False
         self.dead = False
         self.invuln = 0
-        self.projectiles = []
+        self.projectiles = ProjectilePool()
         self.score = 0
         self.frozen_timer = 0
         self.coins = 0
+        self.tick = 0  # shared match tick of the last state received
         self.jump_timer = 0
         self.hurt_timer = 0
         self.width = TILE
         self.height = TILE * 2
 
+    @property
+    def x(self):
+        return self._x
+
+    @x.setter
+    def x(self, value):
+        self._x = value
+        self._rect = None
+
+    @property
+    def y(self):
+        return self._y
+
+    @y.setter
+    def y(self, value):
+        self._y = value
+        self._rect = None
+
+    @property
+    def width(self):
+        return self._width
+
+    @width.setter
+    def width(self, value):
+        self._width = value
+        self._rect = None
+
+    @property
+    def height(self):
+        return self._height
+
+    @height.setter
+    def height(self, value):
+        self._height = value
+        self._rect = None
+
     def rect(self):
-        return pygame.Rect(self.x, self.y, self.width, self.height)
+        """The player's box. Shared between callers until the player moves: read it, don't modify it."""
+        r = self._rect
+        if r is None:
+            r = self._rect = pygame.Rect(self._x, self._y, self._width, self._height)
+        return r
 
     def update(self, keys, level, players, items, star_drops, ice_blocks):
         if self.dead:
@@ -114,77 +230,40 @@ class Player:
             self.frozen_timer -= 1
             return
         
-        # Movement physics
-        self.vy += 0.5  # Gravity
-        self.vx *= 0.85  # Friction
-        
-        # Apply velocity
-        self.x += self.vx
-        self.y += self.vy
-        
-        # Collision with level
-        self.ground = False
-        player_rect = self.rect()
-        for plat in level:
-            plat_rect = pygame.Rect(plat['x'], plat['y'], plat['w'], plat['h'])
-            if player_rect.colliderect(plat_rect):
-                if plat['type'] == 'solid' or plat['type'] == 'pipeL' or plat['type'] == 'pipeR':
-                    if self.vy > 0 and player_rect.bottom > plat_rect.top and player_rect.top < plat_rect.top:
-                        self.y = plat_rect.top - self.height
-                        self.vy = 0
-                        self.ground = True
-                    elif self.vy < 0 and player_rect.top < plat_rect.bottom and player_rect.bottom > plat_rect.bottom:
-                        self.y = plat_rect.bottom
-                        self.vy = 0
-                    if self.vx > 0 and player_rect.right > plat_rect.left and player_rect.left < plat_rect.left:
-                        self.x = plat_rect.left - self.width
-                    elif self.vx < 0 and player_rect.left < plat_rect.right and player_rect.right > plat_rect.right:
-                        self.x = plat_rect.right
-        
         # Key controls
+        direction = 0
         if keys['left']:
-            self.vx = max(self.vx - 0.8, -5)
+            direction -= 1
             self.facing = -1
         if keys['right']:
-            self.vx = min(self.vx + 0.8, 5)
+            direction += 1
             self.facing = 1
+        self.vx = walk(self.vx, direction, PLAYER_PROFILE)
         if keys['jump'] and self.ground and self.jump_timer <= 0:
-            self.vy = -12
+            self.vy, _ = start_jump(PLAYER_PROFILE)
             self.jump_timer = 10
+        self.vy, _ = fall(self.vy, False, 0, PLAYER_PROFILE)
         
-        # Fire projectiles
-        if keys['fire'] and 'fire' in self.power:
-            self.projectiles.append({
-                'x': self.x + (self.width//2) + (self.facing * 20),
-                'y': self.y + 10,
-                'vx': self.facing * 8,
-                'type': 'fire'
-            })
+        # Swept move through the level: a PlatformLevel or a TileMap of it
+        if isinstance(level, TileMap):
+            self.x, self.y, _, hit_y = level.move(self.x, self.y, self.width, self.height, self.vx, self.vy)
+            landed, ceiling = hit_y > 0, hit_y < 0
+        else:
+            self.x, self.y, contacts = move_box(self.x, self.y, self.width, self.height, self.vx, self.vy, level)
+            landed, ceiling = contacts.landed, contacts.ceiling
+        if landed or ceiling:
+            self.vy = 0
+        self.ground = landed
         
-        # Ice projectiles
-        if keys['fire'] and 'ice' in self.power:
-            self.projectiles.append({
-                'x': self.x + (self.width//2) + (self.facing * 20),
-                'y': self.y + 10,
-                'vx': self.facing * 6,
-                'type': 'ice'
-            })
+        # Fire and ice projectiles share one pool and one cooldown
+        if keys['fire'] and self.projectiles.ready():
+            for kind, speed in (('fire', 8), ('ice', 6)):
+                if kind in self.power:
+                    self.projectiles.spawn(self.x + (self.width//2) + (self.facing * 20), self.y + 10,
+                                           self.facing * speed, kind)
         
         # Update projectiles
-        for proj in self.projectiles[:]:
-            proj['x'] += proj['vx']
-            if proj['x'] < 0 or proj['x'] > SCREEN_W:
-                self.projectiles.remove(proj)
-        
-        # Collect coins
-        for player in players:
-            if player is not self and not player.dead:
-                player_rect = player.rect()
-                if player_rect.colliderect(self.rect()):
-                    if self.stars > 0:
-                        player.die(players, star_drops)
-                        self.stars -= 1
-                        self.score += 100
+        self.projectiles.step(0, SCREEN_W)
         
         # Update timers
         if self.jump_timer > 0:
@@ -198,7 +277,19 @@ class Player:
         if self.y > SCREEN_H:
             self.die(players, star_drops)
 
-    def die(self, players, star_drops):
+    def star_kill(self, victim, players, star_drops, rng):
+        # PvP stage resolver: a player holding a star knocks out whoever it
+        # touches. Every peer resolves the hit, so the drops come from the
+        # shared world rng.
+        if self.stars <= 0:
+            return
+        victim.die(players, star_drops, rng)
+        self.stars -= 1
+        self.score += 100
+
+    def die(self, players, star_drops, rng=random):
+        # rng scatters the dropped stars: the world rng for deaths every peer
+        # sees, the module one for deaths only this peer simulates (falls)
         if self.invuln > 0 or self.dead:
             return
             
@@ -208,7 +299,7 @@ class Player:
         
         # Drop stars
         for _ in range(self.stars):
-            star_drops.append(StarDrop(self.x, self.y))
+            star_drops.append(StarDrop(self.x, self.y, rng))
         self.stars = 0
         
         # Respawn position
@@ -220,6 +311,8 @@ class Player:
             self.invuln = FPS * 2
 
 class Star:
+    __slots__ = ('x', 'y', 'timer')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -228,7 +321,8 @@ class Star:
     def update(self, players):
         self.timer += 1
         for player in players:
-            if not player.dead and math.hypot(self.x - player.x, self.y - player.y) < 30:
+            dx, dy = self.x - player.x, self.y - player.y
+            if not player.dead and dx * dx + dy * dy < PICKUP_RADIUS * PICKUP_RADIUS:
                 player.stars = min(player.stars + 1, 3)
                 self.timer = -999  # Collected
                 return
@@ -245,19 +339,21 @@ class Star:
         pygame.draw.polygon(win, (255, 200, 0), points)
 
 class Coin:
+    __slots__ = ('x', 'y', 'active', 'timer')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
         self.active = True
         self.timer = 0
 
-    def update(self, players):
+    def update(self):
         self.timer += 1
-        for player in players:
-            if self.active and not player.dead and math.hypot(self.x - player.x, self.y - player.y) < 30:
-                player.coins += 1
-                player.score += 10
-                self.active = False
+
+    def collect(self, player):
+        player.coins += 1
+        player.score += 10
+        self.active = False
 
     def draw(self, win):
         if not self.active:
@@ -267,6 +363,8 @@ class Coin:
         pygame.draw.circle(win, (200, 150, 0), (int(self.x), int(self.y + y_offset)), 8, 2)
 
 class Item:
+    __slots__ = ('t', 'x', 'y', 'active', 'vy', 'bounce')
+
     def __init__(self, t, x, y):
         self.t = t
         self.x = x
@@ -275,22 +373,21 @@ class Item:
         self.vy = -1
         self.bounce = 0
 
-    def update(self, players, level, ice_blocks):
+    def update(self):
         self.bounce += 0.1
         self.y += math.sin(self.bounce) * 0.5
-        
-        for player in players:
-            if self.active and not player.dead and math.hypot(self.x - player.x, self.y - player.y) < 30:
-                if self.t == 'star':
-                    player.stars = min(player.stars + 1, 3)
-                elif self.t not in player.power:
-                    player.power.append(self.t)
-                    if self.t == 'fire' and 'ice' in player.power:
-                        player.power.remove('ice')
-                    elif self.t == 'ice' and 'fire' in player.power:
-                        player.power.remove('fire')
-                self.active = False
-                player.score += 50
+
+    def collect(self, player):
+        if self.t == 'star':
+            player.stars = min(player.stars + 1, 3)
+        elif self.t not in player.power:
+            player.power.append(self.t)
+            if self.t == 'fire' and 'ice' in player.power:
+                player.power.remove('ice')
+            elif self.t == 'ice' and 'fire' in player.power:
+                player.power.remove('fire')
+        self.active = False
+        player.score += 50
 
     def draw(self, win):
         if not self.active:
@@ -307,14 +404,16 @@ class Item:
             pygame.draw.ellipse(win, (100, 200, 100), (self.x - 12, self.y - 8, 24, 16))
 
 class StarDrop:
-    def __init__(self, x, y):
+    __slots__ = ('x', 'y', 'vx', 'vy', 'timer')
+
+    def __init__(self, x, y, rng=random):
         self.x = x
         self.y = y
-        self.vx = random.uniform(-3, 3)
-        self.vy = random.uniform(-8, -4)
+        self.vx = rng.uniform(-3, 3)
+        self.vy = rng.uniform(-8, -4)
         self.timer = FPS * 10  # 10 seconds to live
 
-    def update(self, players):
+    def update(self):
         self.x += self.vx
         self.y += self.vy
         self.vy += 0.2  # Gravity
@@ -324,18 +423,18 @@ class StarDrop:
         if self.y > SCREEN_H - 20:
             self.y = SCREEN_H - 20
             self.vy = -self.vy * 0.7
-            
-        # Collect by players
-        for player in players:
-            if not player.dead and math.hypot(self.x - player.x, self.y - player.y) < 30:
-                player.stars = min(player.stars + 1, 3)
-                self.timer = -999  # Collected
+
+    def collect(self, player):
+        player.stars = min(player.stars + 1, 3)
+        self.timer = -999  # Collected
 
     def draw(self, win):
         pygame.draw.circle(win, (255, 255, 0), (int(self.x), int(self.y)), 10)
         pygame.draw.circle(win, (255, 200, 0), (int(self.x), int(self.y)), 10, 2)
 
 class IceBlock:
+    __slots__ = ('x', 'y', 'active', 'timer')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -356,8 +455,12 @@ class IceBlock:
 
 # --- MarioLegacy Game ---
 class MarioLegacy:
-    def __init__(self, win):
+    def __init__(self, win, net=True, clock=time.monotonic):
+        # net=False runs without the socket and listener: outgoing messages
+        # collect in self.outbox instead (see check_lockstep)
         self.win = win
+        self.net = net
+        self.time_source = clock
         self.clock = pygame.time.Clock()
         self.font = pygame.font.SysFont(FONT_NAME, 24)
         self.big_font = pygame.font.SysFont(FONT_NAME, 32)
@@ -372,18 +475,23 @@ class MarioLegacy:
         pass  # Sound implementation omitted for brevity
 
     def reset_game_vars(self):
-        global remotes, running
+        global remotes, running, clock_sync
         self.local_id = str(random.randint(1000, 9999))
+        clock_sync = ClockSync(self.local_id, FPS, clock=self.time_source)
+        self.sim_rng = TrackedRandom(MATCH_SEED)
+        self.desync = DesyncDetector(self.local_id, HASH_INTERVAL)
+        remote_hashes.clear()
         is_player_one_style = random.choice([True, False])
         p1_color = (220, 50, 50) if is_player_one_style else (50, 180, 50)
         p1_x = 100 if is_player_one_style else SCREEN_W - 150
         self.p1 = Player(self.local_id, p1_color, p1_x, SCREEN_H - TILE * 3)
-        self.star_drops = []
-        self.items = []
+        self.star_drops = PickupGrid(PICKUP_RADIUS)
+        self.items = PickupGrid(PICKUP_RADIUS)
         self.world_star = Star(SCREEN_W // 2, 100)
-        self.coins = [Coin(x, y) for (x, y) in COIN_SPAWNS]
+        self.coins = PickupGrid(PICKUP_RADIUS, [Coin(x, y) for (x, y) in COIN_SPAWNS])
         self.ice_blocks = []
-        self.item_spawn_timer = FPS * 10
+        self.next_item_tick = ITEM_FIRST_TICK
+        self.world_tick = clock_sync.match_tick()
         self.max_items_on_map = 3
         running = True
         with remote_lock:
@@ -391,7 +499,8 @@ class MarioLegacy:
         self.game_active = True
         self.game_over_timer = 0
         self.last_send_time = 0
-        if not hasattr(self, 'sock') or self.sock._closed:
+        self.outbox = []
+        if self.net and (not hasattr(self, 'sock') or self.sock._closed):
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
         self.key_map = {
@@ -401,7 +510,7 @@ class MarioLegacy:
             'menu_up': pygame.K_UP, 'menu_down': pygame.K_DOWN, 'menu_select': pygame.K_RETURN
         }
         self.keys_pressed = {k_name: False for k_name in self.key_map}
-        if not hasattr(self, 'net_thread') or not self.net_thread.is_alive():
+        if self.net and (not hasattr(self, 'net_thread') or not self.net_thread.is_alive()):
             self.net_thread = threading.Thread(target=listener, args=(self.local_id,), daemon=True)
             self.net_thread.start()
         self.winner_pid = None
@@ -437,72 +546,89 @@ class MarioLegacy:
                         self.game_state = "menu"
         return False
 
+    def send(self, msg):
+        if not self.net:
+            self.outbox.append(msg)
+            return
+        try:
+            self.sock.sendto(json.dumps(msg).encode('utf-8'), (BROADCAST, UDP_PORT))
+        except OSError:
+            pass
+
+    def state_message(self):
+        return {
+            'pid': self.local_id,
+            'x': self.p1.x, 'y': self.p1.y,
+            'vx': self.p1.vx, 'vy': self.p1.vy,
+            'facing': self.p1.facing, 'ground': self.p1.ground,
+            'state': self.p1.state, 'power': self.p1.power,
+            'stars': self.p1.stars, 'lives': self.p1.lives, 'coins': self.p1.coins,
+            'projectiles': self.p1.projectiles.to_list(),
+            'dead': self.p1.dead, 'invuln': self.p1.invuln,
+            'respawn': self.p1.respawn, 'score': self.p1.score,
+            'frozen_timer': self.p1.frozen_timer,
+            'tick': clock_sync.match_tick(),
+            'color_r': self.p1.color[0], 'color_g': self.p1.color[1], 'color_b': self.p1.color[2],
+        }
+
     def update_network(self):
+        ping = clock_sync.make_ping()
+        if ping:
+            self.send(ping)
+
         if time.time() - self.last_send_time > NET_TICK:
             self.last_send_time = time.time()
-            msg_payload = {
-                'pid': self.local_id,
-                'x': self.p1.x, 'y': self.p1.y,
-                'vx': self.p1.vx, 'vy': self.p1.vy,
-                'facing': self.p1.facing, 'ground': self.p1.ground,
-                'state': self.p1.state, 'power': self.p1.power,
-                'stars': self.p1.stars, 'lives': self.p1.lives, 'coins': self.p1.coins,
-                'projectiles': self.p1.projectiles,
-                'dead': self.p1.dead, 'invuln': self.p1.invuln,
-                'respawn': self.p1.respawn, 'score': self.p1.score,
-                'frozen_timer': self.p1.frozen_timer,
-                'color_r': self.p1.color[0], 'color_g': self.p1.color[1], 'color_b': self.p1.color[2],
-            }
-            try:
-                self.sock.sendto(json.dumps(msg_payload).encode('utf-8'), (BROADCAST, UDP_PORT))
-            except (OSError, Exception):
-                pass
+            self.send(self.state_message())
 
     def update_game_logic(self):
-        all_player_objects = [self.p1]
         with remote_lock:
             remote_player_list = list(remotes.values())
-            all_player_objects.extend(remote_player_list)
+        # Every peer walks the players in the same (pid) order, so pickups,
+        # bonuses and PvP ties go the same way everywhere
+        all_player_objects = sorted([self.p1] + remote_player_list, key=lambda pl: pl.pid)
             
         self.world_star.update(all_player_objects)
-        for coin_obj in self.coins[:]:
-            coin_obj.update(all_player_objects)
-            if not coin_obj.active: 
-                self.coins.remove(coin_obj)
-                
-        if self.p1.coins >= 8 and not self.p1.dead:
-            self.p1.coins -= 8
-            item_x = self.p1.x + random.uniform(-TILE, TILE)
-            item_y = self.p1.y - TILE * 2
-            item_x = max(TILE, min(item_x, SCREEN_W - TILE * 2))
-            item_y = max(TILE, min(item_y, SCREEN_H - TILE * 3))
-            available_powerups = [p for p in POWERUPS if p != 'star']
-            if available_powerups:
-                self.items.append(Item(random.choice(available_powerups), item_x, item_y))
+        for coin_obj in self.coins:
+            coin_obj.update()
+        self.collect_pickups(self.coins, all_player_objects)
                 
-        self.item_spawn_timer -= 1
-        if self.item_spawn_timer <= 0 and len(self.items) < self.max_items_on_map:
-            self.item_spawn_timer = FPS * random.randint(8, 15)
-            spawn_x = random.randint(TILE, SCREEN_W - TILE * 2)
-            spawn_y = random.randint(TILE * 2, SCREEN_H // 2)
-            self.items.append(Item(random.choice(POWERUPS), spawn_x, spawn_y))
-            
-        for item_obj in self.items[:]:
-            item_obj.update(all_player_objects, LEVEL, self.ice_blocks)
-            if not item_obj.active: 
-                self.items.remove(item_obj)
+        # Coin bonus for any player, remote ones included, so every peer spawns it
+        for player in all_player_objects:
+            if player.coins >= 8 and not player.dead:
+                player.coins -= 8
+                item_x = player.x + self.sim_rng.uniform(-TILE, TILE)
+                item_y = player.y - TILE * 2
+                item_x = max(TILE, min(item_x, SCREEN_W - TILE * 2))
+                item_y = max(TILE, min(item_y, SCREEN_H - TILE * 3))
+                available_powerups = [p for p in POWERUPS if p != 'star']
+                if available_powerups:
+                    self.items.append(Item(self.sim_rng.choice(available_powerups), item_x, item_y))
                 
-        for ib_obj in self.ice_blocks[:]:
-            ib_obj.update()
-            if not ib_obj.active: 
-                self.ice_blocks.remove(ib_obj)
-                
-        for drop_obj in self.star_drops[:]:
-            drop_obj.update(all_player_objects)
-            if drop_obj.timer <= 0: 
-                self.star_drops.remove(drop_obj)
+        # The world steps once per shared match tick, not once per local
+        # frame, so a peer that dropped or doubled a frame still takes every
+        # checkpoint at the same simulation step as the others
+        tick = clock_sync.match_tick()
+        if tick - self.world_tick > WORLD_MAX_CATCHUP:
+            self.world_tick = tick - 1    # joined a match under way; nothing to replay
+        while self.world_tick < tick:
+            self.world_tick += 1
+            self.step_world(self.world_tick)
+            if self.world_tick % HASH_INTERVAL == 0:
+                self.checkpoint(self.world_tick, all_player_objects)
+
+        self.collect_pickups(self.items, all_player_objects)
+        self.collect_pickups(self.star_drops, all_player_objects)
                 
-        self.p1.update(self.keys_pressed, LEVEL, all_player_objects, self.items, self.star_drops, self.ice_blocks)
+        # A player frozen at the start of the frame cannot star-kill, even if
+        # its update just thawed it
+        frozen = {pl.pid for pl in all_player_objects if pl.frozen_timer > 0}
+        self.p1.update(self.keys_pressed, PLAYER_LEVEL, all_player_objects, self.items, self.star_drops, self.ice_blocks)
+        def star_kill(attacker, victim):
+            if attacker.pid not in frozen:
+                attacker.star_kill(victim, all_player_objects, self.star_drops, self.sim_rng)
+        run_pvp(all_player_objects, star_kill)
+        self.resolve_projectiles(all_player_objects)
+        self.compare_hashes()
         
         # Game over conditions
         if not self.p1.dead and self.p1.lives <= 0 and self.p1.respawn != -1:
@@ -531,6 +657,107 @@ class MarioLegacy:
             self.winner_pid = "GAME OVER"
             self.game_state = "game_over"
 
+    def step_world(self, tick):
+        # Timed spawns run on the shared match tick, not a per-peer countdown;
+        # a spawn due while the map is full is skipped
+        while tick >= self.next_item_tick:
+            self.next_item_tick += FPS * self.sim_rng.randint(8, 15)
+            if len(self.items) < self.max_items_on_map:
+                spawn_x = self.sim_rng.randint(TILE, SCREEN_W - TILE * 2)
+                spawn_y = self.sim_rng.randint(TILE * 2, SCREEN_H // 2)
+                self.items.append(Item(self.sim_rng.choice(POWERUPS), spawn_x, spawn_y))
+
+        for item_obj in self.items:
+            item_obj.update()
+            self.items.move(item_obj)
+
+        for ib_obj in self.ice_blocks[:]:
+            ib_obj.update()
+            if not ib_obj.active:
+                self.ice_blocks.remove(ib_obj)
+
+        for drop_obj in self.star_drops:
+            drop_obj.update()
+            self.star_drops.move(drop_obj)
+        for drop_obj in [d for d in self.star_drops if d.timer <= 0]:
+            self.star_drops.remove(drop_obj)
+
+    def collect_pickups(self, pickups, players):
+        # Players are checked in order, so the first one to reach a pickup gets it
+        for player in players:
+            if player.dead:
+                continue
+            for obj in pickups.near(player.x, player.y):
+                obj.collect(player)
+                pickups.remove(obj)
+
+    def resolve_projectiles(self, players):
+        # One batched pass: every player's shots against the other players and the ice blocks
+        targets = [(i, pl) for i, pl in enumerate(players) if not pl.dead and pl.invuln <= 0]
+        boxes = [tuple(pl.rect()) for _, pl in targets] + [(b.x - 15, b.y - 15, 30, 30) for b in self.ice_blocks]
+        owners = [i for i, _ in targets] + [-1] * len(self.ice_blocks)
+        pools = [pl.projectiles for pl in players]
+        spent = [[] for _ in pools]
+        for pool_i, shot_i, box_i, kind in projectile_hits(pools, boxes, owners):
+            spent[pool_i].append(shot_i)
+            if box_i < len(targets):
+                victim = targets[box_i][1]
+                if kind == 'ice':
+                    victim.frozen_timer = max(victim.frozen_timer, FREEZE_FRAMES)
+                else:
+                    victim.hurt_timer = HURT_FRAMES
+                    victim.vx += FIRE_KNOCKBACK if pools[pool_i].vx[shot_i] > 0 else -FIRE_KNOCKBACK
+            elif kind == 'fire':
+                # Fire melts ice blocks; ice shots just shatter on them
+                self.ice_blocks[box_i - len(targets)].active = False
+        for pool, shots in zip(pools, spent):
+            if shots:
+                pool.kill(shots)
+
+    def hash_state(self, players):
+        # Only state every peer is meant to agree on: positions of remote
+        # players lag by a network trip, so players contribute their
+        # discrete state while world entities contribute everything.
+        h = FrameHasher()
+        players = sorted(players, key=lambda pl: pl.pid)
+        h.add_str(' '.join(pl.pid + ':' + ','.join(pl.power) for pl in players))
+        h.add_ints(*[v for pl in players for v in (pl.lives, pl.stars, pl.coins, pl.score, pl.dead)])
+        h.add_str(','.join([item_obj.t for item_obj in self.items]))
+        h.add_pos(self.world_star.x, self.world_star.y,
+                  *[v for group in (self.coins, self.items, self.star_drops, self.ice_blocks)
+                    for obj in group for v in (obj.x, obj.y)])
+        h.add_rng(self.sim_rng)
+        return h.digest()
+
+    def snapshot_state(self, players):
+        # Round-trip through JSON so the checkpoint is a copy, not live objects
+        return json.loads(json.dumps({
+            'players': [slot_state(pl) for pl in players],
+            'world_star': slot_state(self.world_star),
+            'coins': [slot_state(c) for c in self.coins],
+            'items': [slot_state(i) for i in self.items],
+            'star_drops': [slot_state(d) for d in self.star_drops],
+            'ice_blocks': [slot_state(b) for b in self.ice_blocks],
+            'rng_state': self.sim_rng.getstate(),
+        }, default=lambda obj: obj.to_list() if isinstance(obj, ProjectilePool) else str(obj)))
+
+    def checkpoint(self, tick, players):
+        # Hashed only here, at checkpoint ticks, never per frame
+        t0 = time.perf_counter()
+        digest = self.hash_state(players)
+        self.desync.note_hash_time(time.perf_counter() - t0)
+
+        msg = self.desync.record(tick, digest, lambda: self.snapshot_state(players))
+        if msg:
+            self.send(msg)
+
+    def compare_hashes(self):
+        while remote_hashes:
+            pid, cp, remote_digest = remote_hashes.popleft()
+            path = self.desync.compare(pid, cp, remote_digest)
+            if path:
+                print(f"Desync with P{pid[:3]} at checkpoint {cp}; state dumped to {path}")
+
     def draw_player_visuals(self, win, player_obj):
         pr = player_obj.rect()
         base_color = player_obj.color
@@ -601,6 +828,9 @@ class MarioLegacy:
             y_pos = 50
             for pid, remote in remotes.items():
                 stats = f"P{pid[:3]}: Lives {remote.lives} Stars {remote.stars}"
+                sync = clock_sync.stats(pid)
+                if sync:
+                    stats += f" RTT {sync[1] * 1000:.0f}ms"
                 text = self.font.render(stats, True, remote.color)
                 self.win.blit(text, (SCREEN_W - text.get_width() - 10, y_pos))
                 y_pos += 30
@@ -653,11 +883,13 @@ class MarioLegacy:
                 if not remote_p_obj.dead or remote_p_obj.respawn > 0:
                     self.draw_player_visuals(self.win, remote_p_obj)
                     
-        # Draw projectiles
-        for p_data in self.p1.projectiles:
-            p_color = (255, 60, 20) if p_data.get('type') == 'fire' else (170, 210, 240)
-            pygame.draw.circle(self.win, p_color, (int(p_data['x']), int(p_data['y'])), 
-                             7 if p_data.get('type') == 'ice' else 9)
+        # Draw projectiles, including the ones remote players can now hit us with
+        with remote_lock:
+            pools = [self.p1.projectiles] + [remote_p_obj.projectiles for remote_p_obj in remotes.values()]
+        for pool in pools:
+            for px, py, kind in pool.items():
+                p_color = (255, 60, 20) if kind == 'fire' else (170, 210, 240)
+                pygame.draw.circle(self.win, p_color, (int(px), int(py)), 7 if kind == 'ice' else 9)
         
         self.draw_hud()
 
@@ -732,8 +964,190 @@ class MarioLegacy:
         pygame.quit()
         sys.exit()
 
+# --- Entity Benchmark ---
+def _dict_baseline(cls):
+    """
+    cls as it was before __slots__ and the cached player rect: the same
+    methods on a plain dict-backed class, with rect() building a new Rect
+    on every call.
+    """
+    namespace = {k: v for k, v in vars(cls).items()
+                 if k not in ('__slots__', '__dict__', '__weakref__')
+                 and not isinstance(v, (property, types.MemberDescriptorType))}
+    if 'rect' in namespace:
+        namespace['rect'] = lambda self: pygame.Rect(self.x, self.y, self.width, self.height)
+    return type(cls.__name__, (), namespace)
+
+
+def benchmark_entities(count=1000, frames=200):
+    """
+    Memory per entity type and per-frame cost of a field of count entities,
+    for the dict-backed baseline (_dict_baseline) and the slotted classes.
+    """
+    import tracemalloc
+
+    def makers(classes):
+        rng = random.Random(1)
+        player, star, coin, item, star_drop, ice_block = classes
+        return [
+            ('Player', lambda: player('p', (255, 0, 0), rng.randrange(SCREEN_W), rng.randrange(SCREEN_H))),
+            ('Star', lambda: star(rng.randrange(SCREEN_W), rng.randrange(SCREEN_H))),
+            ('Coin', lambda: coin(rng.randrange(SCREEN_W), rng.randrange(SCREEN_H))),
+            ('Item', lambda: item('mushroom', rng.randrange(SCREEN_W), rng.randrange(SCREEN_H))),
+            ('StarDrop', lambda: star_drop(rng.randrange(SCREEN_W), rng.randrange(SCREEN_H))),
+            ('IceBlock', lambda: ice_block(rng.randrange(SCREEN_W), rng.randrange(SCREEN_H))),
+        ]
+
+    slotted = (Player, Star, Coin, Item, StarDrop, IceBlock)
+    variants = [makers([_dict_baseline(cls) for cls in slotted]), makers(slotted)]
+
+    print(f"memory: {count} entities, bytes each   {'type':>8} {'baseline':>9} {'slots':>7}")
+    for k, (name, _) in enumerate(variants[0]):
+        sizes = []
+        for variant in variants:
+            make = variant[k][1]
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            entities = [make() for _ in range(count)]
+            sizes.append(sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(before, 'filename')))
+            tracemalloc.stop()
+            del entities
+        print(f"{'':36}{name:>8} {sizes[0] / count:>9.0f} {sizes[1] / count:>7.0f}")
+
+    def frames_for(variant):
+        players = [variant[0][1]() for _ in range(count)]
+        coins = PickupGrid(PICKUP_RADIUS, [variant[2][1]() for _ in range(count)])
+        clock = [0]
+
+        def rect_frame():
+            # Collision, PvP and drawing each ask for the rect; a third of the players move
+            clock[0] += 1
+            for i, p in enumerate(players):
+                if i % 3 == clock[0] % 3:
+                    p.x += 1
+                for _ in range(3):
+                    p.rect()
+
+        def coin_frame():
+            for c in coins:
+                c.update()
+            for p in players[:2]:
+                coins.near(p.x, p.y)
+
+        return (('rect x3', rect_frame), ('coin pickup', coin_frame))
+
+    print(f"time: {count} entities per frame, ms    {'':>8} {'baseline':>9} {'slots':>7}")
+    for (name, base_fn), (_, fn) in zip(frames_for(variants[0]), frames_for(variants[1])):
+        times = []
+        for f in (base_fn, fn):
+            start = time.perf_counter()
+            for _ in range(frames):
+                f()
+            times.append((time.perf_counter() - start) / frames * 1000)
+        print(f"{'':33}{name:>11} {times[0]:>9.3f} {times[1]:>7.3f}")
+
+# --- Lockstep Check ---
+def check_lockstep(frames=FPS * 40, jitter=0.0, drop_every=0):
+    """
+    Two peers in one process, each its own copy of this module (own remotes,
+    match clock and desync detector), swapping state and checkpoint hashes
+    before every frame with no latency. Each peer drives its own player with
+    a different input script; no checkpoint hash may differ between them.
+    jitter     -- each peer reads its frame time up to this many frames off
+                  the other's, so a match tick can land a frame apart
+    drop_every -- the second peer skips every drop_every-th frame and
+                  catches up the match ticks it missed on the next one
+    """
+    import os
+    from gamemodule import load_game_module
+
+    pygame.init()
+    win = pygame.Surface((SCREEN_W, SCREEN_H))
+    rng = random.Random(7)
+    now = [0.0, 0.0]
+    peers = []
+    for k in range(2):
+        module = load_game_module(os.path.basename(__file__), name=f'lockstep_peer_{k}')
+        random.seed(k)
+        game = module.MarioLegacy(win, net=False, clock=lambda k=k: now[k])
+        game.game_state = "playing"
+        game.p1.x = 150 + 450 * k
+        peers.append((module, game))
+    assert peers[0][1].local_id != peers[1][1].local_id
+
+    def exchange():
+        for (module, game), (other, _) in zip(peers, peers[::-1]):
+            with other.remote_lock:
+                other.apply_remote_state(game.state_message())
+            for msg in game.outbox:
+                if msg.get('type') == 'hash':
+                    other.remote_hashes.append((msg['pid'], msg['cp'], msg['hash']))
+            game.outbox.clear()
+
+    for frame in range(frames):
+        if frame == FPS * 5:
+            peers[0][1].p1.coins += 8    # cashes in for a bonus item on both peers
+        exchange()
+        for k, (module, game) in enumerate(peers):
+            now[k] = (frame + 0.5 + rng.uniform(-jitter, jitter)) / FPS
+            if k and drop_every and frame % drop_every == 0:
+                continue
+            t = frame + 60 * k
+            game.keys_pressed.update({'left': t % 120 >= 60, 'right': t % 120 < 60,
+                                      'jump': t % 40 < 3, 'fire': t % 25 == 0})
+            game.update_game_logic()
+    exchange()
+
+    checks = sum(game.desync.checks for _, game in peers)
+    mismatches = sum(game.desync.mismatches for _, game in peers)
+    items = len(peers[0][1].items)
+    print(f"lockstep (jitter {jitter} frames, drop every {drop_every or '-'}): {frames} frames, "
+          f"{checks} checkpoint comparisons, {mismatches} mismatches, {items} items on the map")
+    assert checks and not mismatches, "peers desynced"
+
+# --- Tilemap Check ---
+def check_tilemap(frames=FPS * 60):
+    """
+    Drive two players with the same scripted input, one resolved on
+    LEVEL_COLLISION and one on LEVEL_TILES, and check they stay in the
+    same place every frame: running into the pipes, jumping onto them and
+    off the screen edges.
+    """
+    pygame.init()
+    rng = random.Random(5)
+    worst = 0.0
+    landings = 0
+    for start_x in (60, 300, 560, 720):
+        players = [Player('a', (0, 0, 0), start_x, SCREEN_H - TILE * 3) for _ in range(2)]
+        keys = {'left': False, 'right': False, 'jump': False, 'fire': False}
+        for frame in range(frames):
+            if frame % 20 == 0:
+                direction = rng.choice((-1, 0, 1, 1))
+                keys.update(left=direction < 0, right=direction > 0, jump=rng.random() < 0.5)
+            for player, level in zip(players, (LEVEL_COLLISION, LEVEL_TILES)):
+                if player.dead:
+                    player.dead, player.x, player.y, player.vx, player.vy = False, start_x, SCREEN_H - TILE * 3, 0, 0
+                player.update(keys, level, players[:1], [], [], [])
+            a, b = players
+            assert a.dead == b.dead and a.ground == b.ground, f"contacts differ at frame {frame} from x {start_x}"
+            if not a.dead:
+                # die() scatters a dead player's position; only living ones are compared
+                worst = max(worst, abs(a.x - b.x), abs(a.y - b.y))
+                landings += a.ground
+    print(f"tilemap check: {4 * frames} frames, {landings} grounded, worst position difference {worst} px, "
+          f"cell {LEVEL_TILES.cell} px")
+    assert worst < 1e-9, "tilemap and rect collision disagree"
+
 # --- Main ---
-if __name__ == "__main__":
+if __name__ == "__main__" and '--bench' in sys.argv:
+    benchmark_entities()
+elif __name__ == "__main__" and '--check-tilemap' in sys.argv:
+    check_tilemap()
+elif __name__ == "__main__" and '--check-lockstep' in sys.argv:
+    check_lockstep()
+    check_lockstep(jitter=0.9)
+    check_lockstep(drop_every=7)
+elif __name__ == "__main__":
     pygame.init()
     win = pygame.display.set_mode((SCREEN_W, SCREEN_H))
     pygame.display.set_caption("Mario Legacy! 2025 PC PORT 1.0A")
@@ -6,6 +6,7 @@ import random
 import time
 import sys
 import math
+from platformphysics import MovementProfile, PlatformLevel, walk, start_jump, fall, move_box
 
 # --- Constants ---
 SCREEN_W, SCREEN_H = 800, 480
@@ -24,6 +25,12 @@ LEVEL = [
     {'x': 400, 'y': 300, 'w': TILE*2, 'h': TILE, 'type': 'pipeL'},
     {'x': 500, 'y': 300, 'w': TILE*2, 'h': TILE, 'type': 'pipeR'},
 ]
+LEVEL_COLLISION = PlatformLevel.from_rects([(p['x'], p['y'], p['w'], p['h']) for p in LEVEL
+                                            if p['type'] in ('solid', 'pipeL', 'pipeR')])
+# Damped walk: vx is multiplied by 0.85 every frame and 0.8 added while a
+# direction is held, so 4.25 px a frame is the top speed
+PLAYER_PROFILE = MovementProfile('mariovsluigitest4k', max_speed=4.25, accel=0.8, damping=0.85, gravity=0.5,
+                                 jump_velocity=-12)
 COIN_SPAWNS = [(200, 300), (400, 280), (600, 200), (700, 360)]
 
 # --- Globals for network ---
@@ -76,6 +83,12 @@ def listener(local_id):
 
 # --- Game Classes ---
 class Player:
+    # x, y, width and height are properties: changing one drops the cached
+    # rect, so rect() only builds a new pygame.Rect after the player moved.
+    __slots__ = ('pid', 'color', '_x', '_y', 'vx', 'vy', 'lives', 'respawn', 'stars', 'state',
+                 'power', 'facing', 'ground', 'dead', 'invuln', 'projectiles', 'score',
+                 'frozen_timer', 'coins', 'jump_timer', 'hurt_timer', '_width', '_height', '_rect')
+
     def __init__(self, pid, color, x, y):
         self.pid = pid
         self.color = color
@@ -101,8 +114,48 @@ class Player:
         self.width = TILE
         self.height = TILE * 2
 
+    @property
+    def x(self):
+        return self._x
+
+    @x.setter
+    def x(self, value):
+        self._x = value
+        self._rect = None
+
+    @property
+    def y(self):
+        return self._y
+
+    @y.setter
+    def y(self, value):
+        self._y = value
+        self._rect = None
+
+    @property
+    def width(self):
+        return self._width
+
+    @width.setter
+    def width(self, value):
+        self._width = value
+        self._rect = None
+
+    @property
+    def height(self):
+        return self._height
+
+    @height.setter
+    def height(self, value):
+        self._height = value
+        self._rect = None
+
     def rect(self):
-        return pygame.Rect(self.x, self.y, self.width, self.height)
+        """The player's box. Shared between callers until the player moves: read it, don't modify it."""
+        r = self._rect
+        if r is None:
+            r = self._rect = pygame.Rect(self._x, self._y, self._width, self._height)
+        return r
 
     def update(self, keys, level, players, items, star_drops, ice_blocks):
         if self.dead:
@@ -114,43 +167,25 @@ class Player:
             self.frozen_timer -= 1
             return
         
-        # Movement physics
-        self.vy += 0.5  # Gravity
-        self.vx *= 0.85  # Friction
-        
-        # Apply velocity
-        self.x += self.vx
-        self.y += self.vy
-        
-        # Collision with level
-        self.ground = False
-        player_rect = self.rect()
-        for plat in level:
-            plat_rect = pygame.Rect(plat['x'], plat['y'], plat['w'], plat['h'])
-            if player_rect.colliderect(plat_rect):
-                if plat['type'] == 'solid' or plat['type'] == 'pipeL' or plat['type'] == 'pipeR':
-                    if self.vy > 0 and player_rect.bottom > plat_rect.top and player_rect.top < plat_rect.top:
-                        self.y = plat_rect.top - self.height
-                        self.vy = 0
-                        self.ground = True
-                    elif self.vy < 0 and player_rect.top < plat_rect.bottom and player_rect.bottom > plat_rect.bottom:
-                        self.y = plat_rect.bottom
-                        self.vy = 0
-                    if self.vx > 0 and player_rect.right > plat_rect.left and player_rect.left < plat_rect.left:
-                        self.x = plat_rect.left - self.width
-                    elif self.vx < 0 and player_rect.left < plat_rect.right and player_rect.right > plat_rect.right:
-                        self.x = plat_rect.right
-        
         # Key controls
+        direction = 0
         if keys['left']:
-            self.vx = max(self.vx - 0.8, -5)
+            direction -= 1
             self.facing = -1
         if keys['right']:
-            self.vx = min(self.vx + 0.8, 5)
+            direction += 1
             self.facing = 1
+        self.vx = walk(self.vx, direction, PLAYER_PROFILE)
         if keys['jump'] and self.ground and self.jump_timer <= 0:
-            self.vy = -12
+            self.vy, _ = start_jump(PLAYER_PROFILE)
             self.jump_timer = 10
+        self.vy, _ = fall(self.vy, False, 0, PLAYER_PROFILE)
+        
+        # Swept move through the level
+        self.x, self.y, contacts = move_box(self.x, self.y, self.width, self.height, self.vx, self.vy, level)
+        if contacts.landed or contacts.ceiling:
+            self.vy = 0
+        self.ground = contacts.landed
         
         # Fire projectiles
         if keys['fire'] and 'fire' in self.power:
@@ -220,6 +255,8 @@ class Player:
             self.invuln = FPS * 2
 
 class Star:
+    __slots__ = ('x', 'y', 'timer')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -245,6 +282,8 @@ class Star:
         pygame.draw.polygon(win, (255, 200, 0), points)
 
 class Coin:
+    __slots__ = ('x', 'y', 'active', 'timer')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -267,6 +306,8 @@ class Coin:
         pygame.draw.circle(win, (200, 150, 0), (int(self.x), int(self.y + y_offset)), 8, 2)
 
 class Item:
+    __slots__ = ('t', 'x', 'y', 'active', 'vy', 'bounce')
+
     def __init__(self, t, x, y):
         self.t = t
         self.x = x
@@ -307,6 +348,8 @@ class Item:
             pygame.draw.ellipse(win, (100, 200, 100), (self.x - 12, self.y - 8, 24, 16))
 
 class StarDrop:
+    __slots__ = ('x', 'y', 'vx', 'vy', 'timer')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -336,6 +379,8 @@ class StarDrop:
         pygame.draw.circle(win, (255, 200, 0), (int(self.x), int(self.y)), 10, 2)
 
 class IceBlock:
+    __slots__ = ('x', 'y', 'active', 'timer')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -502,7 +547,7 @@ class FrostyBrawl:
             if drop_obj.timer <= 0: 
                 self.star_drops.remove(drop_obj)
                 
-        self.p1.update(self.keys_pressed, LEVEL, all_player_objects, self.items, self.star_drops, self.ice_blocks)
+        self.p1.update(self.keys_pressed, LEVEL_COLLISION, all_player_objects, self.items, self.star_drops, self.ice_blocks)
         
         # Game over conditions
         if not self.p1.dead and self.p1.lives <= 0 and self.p1.respawn != -1:
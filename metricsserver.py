@@ -0,0 +1,272 @@
+# metricsserver.py
+#
+# Prometheus-format metrics for headless game servers, served over HTTP
+# from a daemon thread on localhost.
+# The simulation only bumps plain attributes on Counter / Gauge / Histogram
+# objects: no locks and no formatting on the hot path. The HTTP
+# thread reads them when scraped, so a scrape never costs frame time.
+# (A single writer per metric plus the GIL keeps each update atomic enough
+# for monitoring; a scrape may see a histogram mid-update, off by one.)
+#
+#   curl http://127.0.0.1:9101/metrics
+#
+# Run directly to serve a sample registry, scrape it over HTTP and check
+# the text format parses back to the values that were set:
+#   python metricsserver.py
+
+import bisect
+import gc
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9101
+
+# Seconds; tuned around a 16.7 ms tick budget
+TICK_BUCKETS = (0.0005, 0.001, 0.002, 0.004, 0.008, 0.0167, 0.033, 0.066, 0.1, 0.25)
+GC_BUCKETS   = (0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+# -----------------------------------------------------------------------------
+# METRIC TYPES
+# -----------------------------------------------------------------------------
+
+class Counter:
+    """Bumped with inc(), or pass fn to read a total kept elsewhere only when scraped."""
+    kind = "counter"
+
+    def __init__(self, name, help_text, fn=None):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self.fn = fn
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        yield self.name, "", self.fn() if self.fn else self.value
+
+
+class Gauge:
+    """Set directly, or pass fn to read the value only when scraped."""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, fn=None):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self.fn = fn
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self):
+        yield self.name, "", self.fn() if self.fn else self.value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help = help_text
+        self.bounds = list(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        counts = list(self.counts)
+        cumulative = 0
+        for bound, n in zip(self.bounds, counts):
+            cumulative += n
+            yield self.name + "_bucket", f'{{le="{bound:g}"}}', cumulative
+        yield self.name + "_bucket", '{le="+Inf"}', cumulative + counts[-1]
+        yield self.name + "_sum", "", self.sum
+        yield self.name + "_count", "", self.count
+
+# -----------------------------------------------------------------------------
+# REGISTRY
+# -----------------------------------------------------------------------------
+
+class MetricsRegistry:
+    def __init__(self, prefix="game"):
+        self.prefix = prefix
+        self.metrics = []
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, fn=None):
+        return self._add(Counter(f"{self.prefix}_{name}", help_text, fn))
+
+    def gauge(self, name, help_text, fn=None):
+        return self._add(Gauge(f"{self.prefix}_{name}", help_text, fn))
+
+    def histogram(self, name, help_text, buckets=TICK_BUCKETS):
+        return self._add(Histogram(f"{self.prefix}_{name}", help_text, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def watch_gc(registry):
+    """
+    Time every garbage collection through gc.callbacks. Returns the pause
+    histogram; the number of collections goes to a counter.
+    """
+    pauses = registry.histogram("gc_pause_seconds", "Garbage collector pause time.", GC_BUCKETS)
+    collections = registry.counter("gc_collections_total", "Garbage collections run.")
+    started = [0.0]
+
+    def callback(phase, info):
+        if phase == "start":
+            started[0] = time.perf_counter()
+        else:
+            pauses.observe(time.perf_counter() - started[0])
+            collections.inc()
+
+    gc.callbacks.append(callback)
+    return pauses
+
+# -----------------------------------------------------------------------------
+# HTTP ENDPOINT
+# -----------------------------------------------------------------------------
+
+class MetricsServer:
+    def __init__(self, registry, host=METRICS_HOST, port=METRICS_PORT):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass   # keep scrapes out of the server console
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+# -----------------------------------------------------------------------------
+# SCRAPING
+# -----------------------------------------------------------------------------
+
+def scrape(port=METRICS_PORT, host=METRICS_HOST, timeout=2.0):
+    """GET /metrics and return the body as text."""
+    with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=timeout) as response:
+        return response.read().decode("utf-8")
+
+
+def parse_metrics(text):
+    """
+    Parse the text exposition format into {(sample name, labels): value}.
+    Labels stay as their raw '{...}' string ('' for none). Raises ValueError
+    on a malformed line, a repeated sample, or a sample whose metric has no
+    # TYPE line before it.
+    """
+    kinds = {}
+    samples = {}
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line:
+            continue
+        if line.startswith("#"):
+            parts = line.split(None, 3)
+            if len(parts) >= 4 and parts[1] == "TYPE":
+                kinds[parts[2]] = parts[3]
+            continue
+        try:
+            key, value = line.rsplit(" ", 1)
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"line {number}: not a sample: {line!r}") from None
+        name, brace, labels = key.partition("{")
+        labels = brace + labels
+        if labels and not labels.endswith("}"):
+            raise ValueError(f"line {number}: unterminated labels: {line!r}")
+        family = name
+        for suffix in ("_bucket", "_sum", "_count"):
+            if name.endswith(suffix) and kinds.get(name[:-len(suffix)]) == "histogram":
+                family = name[:-len(suffix)]
+        if family not in kinds:
+            raise ValueError(f"line {number}: sample {name} has no # TYPE")
+        if (name, labels) in samples:
+            raise ValueError(f"line {number}: repeated sample {key}")
+        samples[(name, labels)] = value
+    return samples
+
+# -----------------------------------------------------------------------------
+# CHECK
+# -----------------------------------------------------------------------------
+
+def check_endpoint():
+    """Serve one metric of each type on a free port, scrape it and check what comes back."""
+    registry = MetricsRegistry("check")
+    packets = registry.counter("packets_total", "Counted with inc().")
+    kept = {"shed": 7}
+    registry.counter("shed_total", "Read from elsewhere when scraped.", lambda: kept["shed"])
+    players = registry.gauge("players", "Set directly.")
+    registry.gauge("load", "Read when scraped.", lambda: 0.25)
+    ticks = registry.histogram("tick_seconds", "Observed.")
+
+    packets.inc(3)
+    players.set(2)
+    for value in (0.0003, 0.003, 0.003, 0.5):
+        ticks.observe(value)
+    kept["shed"] = 9
+
+    server = MetricsServer(registry, port=0).start()
+    try:
+        samples = parse_metrics(scrape(server.port))
+        try:
+            urllib.request.urlopen(f"http://{METRICS_HOST}:{server.port}/other", timeout=2.0)
+            raise AssertionError("a path other than /metrics was served")
+        except urllib.error.HTTPError as e:
+            assert e.code == 404, e.code
+    finally:
+        server.stop()
+
+    assert samples[("check_packets_total", "")] == 3
+    assert samples[("check_shed_total", "")] == 9
+    assert samples[("check_players", "")] == 2
+    assert samples[("check_load", "")] == 0.25
+    buckets = [samples[("check_tick_seconds_bucket", f'{{le="{b:g}"}}')] for b in TICK_BUCKETS]
+    assert buckets == sorted(buckets), "histogram buckets are not cumulative"
+    assert samples[("check_tick_seconds_bucket", '{le="0.004"}')] == 3
+    assert samples[("check_tick_seconds_bucket", '{le="+Inf"}')] == samples[("check_tick_seconds_count", "")] == 4
+    assert abs(samples[("check_tick_seconds_sum", "")] - 0.5063) < 1e-9
+    print(f"scrape check: {len(samples)} samples from {len(registry.metrics)} metrics parsed back as set")
+
+if __name__ == "__main__":
+    check_endpoint()
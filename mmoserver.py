@@ -0,0 +1,405 @@
+# mmoserver.py
+#
+# Headless authoritative host for Cat'sMMO4K.py.
+# Clients send their inputs, the server runs Player.update for everyone at a
+# fixed tick and sends snapshots back. A TickBudget watches every tick and,
+# when the server cannot keep up, sheds fidelity step by step instead of
+# letting the simulation tick slip.
+# Player positions and stats are kept in a WorldStore (worldstore.py), so a
+# returning player resumes where they left off.
+# Prometheus metrics are served on http://127.0.0.1:9101/metrics (metricsserver.py).
+#
+#   python mmoserver.py                  -- run the server
+#   python mmoserver.py --check-metrics  -- scrape a throwaway server and check
+#                                           every budget series is exported
+#   python mmoserver.py --check-messages -- send a throwaway server malformed
+#                                           datagrams and check it counts them
+
+import json
+import socket
+import sys
+import time
+
+from gamemodule import load_game_module
+from tickbudget import (TickBudget, SHED_FAR_ENTITIES, SHED_COSMETIC,
+                        SHED_SNAPSHOT_RATE, SHED_REFUSE_JOINS)
+from worldstore import WorldStore
+from metricsserver import MetricsRegistry, MetricsServer, watch_gc, scrape, parse_metrics
+
+# -----------------------------------------------------------------------------
+# GAME MODULE
+# -----------------------------------------------------------------------------
+
+mmo = load_game_module("Cat'sMMO4K.py", "cats_mmo")
+
+# -----------------------------------------------------------------------------
+# CONFIGURATION CONSTANTS
+# -----------------------------------------------------------------------------
+
+SERVER_PORT           = 5001
+TICK_RATE             = 60        # simulation ticks per second
+SNAPSHOT_RATE         = 20        # snapshots per second under normal load
+REDUCED_SNAPSHOT_RATE = 10        # snapshots per second while shedding
+FAR_DISTANCE          = 320       # px; entities further than this are "far"
+FAR_SNAPSHOT_DIVISOR  = 4         # far entities go out every Nth snapshot when shedding
+MAX_CATCHUP_TICKS     = 5         # drop backlog beyond this instead of spiralling
+CLIENT_TIMEOUT        = 5.0       # seconds without input before a client is dropped
+STATS_INTERVAL        = 5.0       # seconds between console status lines
+WORLD_DB              = "mmo_world.db"
+SAVE_EVERY_TICKS      = 30        # ticks between queuing each player's state for saving
+
+PLATFORMS = [
+    (0, mmo.SCREEN_HEIGHT - 40, mmo.SCREEN_WIDTH, 40),  # ground
+    (100, 300, 100, 10),
+    (300, 200, 150, 10)
+]
+
+# -----------------------------------------------------------------------------
+# MESSAGES
+# -----------------------------------------------------------------------------
+
+def parse_message(data):
+    """
+    A client datagram as a dict with a str "type" and "player_id" (and, for
+    inputs, "keys" as a dict of str -> bool), or None if it is not valid
+    JSON of that shape. Nothing from a client reaches the simulation
+    unchecked.
+    """
+    try:
+        message = json.loads(data.decode('utf-8'))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if not isinstance(message, dict):
+        return None
+    if not isinstance(message.get("type"), str) or not isinstance(message.get("player_id"), str):
+        return None
+    if message["type"] == "input":
+        keys = message.get("keys", {})
+        if not isinstance(keys, dict) or not all(isinstance(v, bool) for v in keys.values()):
+            return None
+        message["keys"] = keys
+    return message
+
+# -----------------------------------------------------------------------------
+# SERVER
+# -----------------------------------------------------------------------------
+
+class MMOServer:
+    def __init__(self, port=SERVER_PORT, budget=None, store=None, registry=None):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('', port))
+        self.sock.setblocking(False)
+
+        self.budget = budget or TickBudget(TICK_RATE)
+        self.store = store
+        self.saved = store.load_all() if store else {}   # player_id -> last saved record
+        self.players = {}      # player_id -> Player
+        self.clients = {}      # player_id -> {"addr", "keys", "last_seen"}
+        self.stats = {}        # player_id -> persistent per-player stats
+        self.events = []       # (cosmetic, event dict) raised this snapshot period
+        self.tick = 0
+        self.snapshots_sent = 0
+        self.joins_refused = 0
+        self.running = True
+        self.registry = registry or MetricsRegistry("mmo")
+        self.register_metrics(self.registry)
+
+    def register_metrics(self, r):
+        self.m_tick = r.histogram("tick_duration_seconds", "Simulation tick duration.")
+        self.m_packets_in = r.counter("packets_received_total", "UDP datagrams received.")
+        self.m_bytes_in = r.counter("bytes_received_total", "UDP payload bytes received.")
+        self.m_packets_out = r.counter("packets_sent_total", "UDP datagrams sent.")
+        self.m_bytes_out = r.counter("bytes_sent_total", "UDP payload bytes sent.")
+        self.m_decode_errors = r.counter("decode_errors_total", "Datagrams that were not valid client messages.")
+        r.gauge("players", "Connected players.", lambda: len(self.players))
+        r.gauge("tick_load", "Average tick time as a fraction of the budget.", self.budget.load)
+        r.gauge("shed_level", "Active overload shedding steps.", lambda: self.budget.level)
+        r.counter("shed_escalations", "Times overload engaged another shedding step.",
+                  lambda: self.budget.escalations)
+        for step in self.budget.steps:
+            r.gauge(f"shed_{step}_active", f"1 while the {step} shedding step is engaged.",
+                    lambda step=step: int(self.budget.shedding(step)))
+            r.counter(f"shed_{step}_total", f"Work skipped by the {step} shedding step.",
+                      lambda step=step: self.budget.shed_counts.get(step, 0))
+        r.gauge("event_queue_depth", "Events waiting for the next snapshot.", lambda: len(self.events))
+        if self.store:
+            r.gauge("store_queue_depth", "Player records waiting for the next disk flush.",
+                    lambda: len(self.store.dirty))
+
+    # --- Networking -----------------------------------------------------------
+
+    def send(self, message, addr):
+        try:
+            data = json.dumps(message).encode('utf-8')
+            self.sock.sendto(data, addr)
+            self.m_packets_out.inc()
+            self.m_bytes_out.inc(len(data))
+        except OSError:
+            pass
+
+    def poll_network(self):
+        now = time.time()
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break
+            self.m_packets_in.inc()
+            self.m_bytes_in.inc(len(data))
+            message = parse_message(data)
+            if message is None:
+                self.m_decode_errors.inc()
+                continue
+            kind, pid = message["type"], message["player_id"]
+
+            if kind == "join":
+                self.handle_join(pid, addr, now)
+            elif kind == "input" and pid in self.clients:
+                client = self.clients[pid]
+                client["keys"] = message["keys"]
+                client["addr"] = addr
+                client["last_seen"] = now
+            elif kind == "leave":
+                self.remove_player(pid)
+
+    def handle_join(self, pid, addr, now):
+        if pid in self.clients:
+            self.clients[pid]["addr"] = addr
+            self.clients[pid]["last_seen"] = now
+            return
+        if self.budget.shedding(SHED_REFUSE_JOINS):
+            self.joins_refused += 1
+            self.budget.note_shed(SHED_REFUSE_JOINS)
+            self.send({"type": "join_refused", "reason": "overloaded"}, addr)
+            return
+        player = mmo.Player(pid, mmo.SCREEN_WIDTH // 2, 50)
+        record = self.saved.get(pid)
+        if record:
+            player.from_dict(record)
+        self.players[pid] = player
+        self.stats[pid] = dict(record["stats"]) if record else {"sessions": 0, "landings": 0, "ticks_played": 0}
+        self.stats[pid]["sessions"] = self.stats[pid].get("sessions", 0) + 1
+        self.clients[pid] = {"addr": addr, "keys": {}, "last_seen": now}
+        self.events.append((False, {"event": "join", "player_id": pid}))
+        self.send({"type": "welcome", "player_id": pid, "tick_rate": TICK_RATE}, addr)
+
+    def remove_player(self, pid):
+        if pid in self.players:
+            self.save_player(pid)
+            if self.store:
+                self.store.request_flush()
+            del self.players[pid]
+            self.stats.pop(pid, None)
+            self.clients.pop(pid, None)
+            self.events.append((False, {"event": "leave", "player_id": pid}))
+
+    # --- Persistence ----------------------------------------------------------
+
+    def save_player(self, pid):
+        record = self.players[pid].to_dict()
+        record["stats"] = self.stats[pid]
+        self.saved[pid] = record
+        if self.store:
+            self.store.put(pid, record)
+
+    def save_world(self):
+        # Only queues records; the store's writer thread does the disk work
+        for pid in self.players:
+            self.save_player(pid)
+
+    # --- Simulation -----------------------------------------------------------
+
+    def simulate(self):
+        for pid, player in self.players.items():
+            was_on_ground = player.on_ground
+            player.update(self.clients[pid]["keys"], PLATFORMS)
+            self.stats[pid]["ticks_played"] += 1
+            if player.on_ground and not was_on_ground:
+                self.stats[pid]["landings"] += 1
+                self.events.append((True, {"event": "land", "player_id": pid,
+                                           "x": player.x, "y": player.y}))
+
+        now = time.time()
+        for pid in [p for p, c in self.clients.items() if now - c["last_seen"] > CLIENT_TIMEOUT]:
+            self.remove_player(pid)
+
+    def snapshot_interval(self):
+        rate = SNAPSHOT_RATE
+        if self.budget.shedding(SHED_SNAPSHOT_RATE):
+            rate = REDUCED_SNAPSHOT_RATE
+        return max(1, TICK_RATE // rate)
+
+    def send_snapshots(self):
+        if self.tick % self.snapshot_interval():
+            if self.tick % (TICK_RATE // SNAPSHOT_RATE) == 0:
+                # Would have gone out at the normal rate
+                self.budget.note_shed(SHED_SNAPSHOT_RATE)
+            return
+
+        events = self.events
+        if self.budget.shedding(SHED_COSMETIC):
+            kept = [e for e in events if not e[0]]
+            self.budget.note_shed(SHED_COSMETIC, len(events) - len(kept))
+            events = kept
+        event_list = [e[1] for e in events]
+        self.events = []
+
+        shed_far = self.budget.shedding(SHED_FAR_ENTITIES)
+        send_far = not shed_far or self.snapshots_sent % FAR_SNAPSHOT_DIVISOR == 0
+        far_sq = FAR_DISTANCE * FAR_DISTANCE
+        states = [(p, p.to_dict()) for p in self.players.values()]
+
+        for pid, client in self.clients.items():
+            viewer = self.players[pid]
+            visible = []
+            for other, state in states:
+                if other is not viewer and not send_far:
+                    dx = other.x - viewer.x
+                    dy = other.y - viewer.y
+                    if dx * dx + dy * dy > far_sq:
+                        self.budget.note_shed(SHED_FAR_ENTITIES)
+                        continue
+                visible.append(state)
+            self.send({"type": "snapshot", "tick": self.tick,
+                       "players": visible, "events": event_list}, client["addr"])
+        self.snapshots_sent += 1
+
+    def step(self):
+        self.budget.begin_tick()
+        self.poll_network()
+        self.simulate()
+        if self.tick % SAVE_EVERY_TICKS == 0:
+            self.save_world()
+        self.send_snapshots()
+        self.tick += 1
+        self.m_tick.observe(self.budget.end_tick())
+
+    # --- Main loop ------------------------------------------------------------
+
+    def metrics(self):
+        m = self.budget.metrics()
+        m["players"] = len(self.players)
+        m["snapshots_sent"] = self.snapshots_sent
+        m["joins_refused"] = self.joins_refused
+        if self.store:
+            m.update(self.store.metrics())
+        return m
+
+    def run(self):
+        tick_length = 1.0 / TICK_RATE
+        next_tick = time.perf_counter()
+        next_stats = time.time() + STATS_INTERVAL
+        while self.running:
+            now = time.perf_counter()
+            if now < next_tick:
+                time.sleep(next_tick - now)
+                continue
+
+            self.step()
+            next_tick += tick_length
+
+            # Never try to replay a long backlog; fall back to the present
+            # and let the shedding steps bring the tick time down instead.
+            if time.perf_counter() - next_tick > tick_length * MAX_CATCHUP_TICKS:
+                next_tick = time.perf_counter()
+
+            if time.time() >= next_stats:
+                next_stats = time.time() + STATS_INTERVAL
+                m = self.metrics()
+                print(f"tick {m['ticks']}  players {m['players']}  "
+                      f"avg {m['tick_avg_ms']:.2f}ms  max {m['tick_max_ms']:.2f}ms  "
+                      f"state {m['overload_state']} (level {m['shed_level']})")
+
+    def shutdown(self):
+        """Close the socket, queue everyone's last record and flush the store."""
+        self.running = False
+        self.sock.close()
+        if self.store:
+            self.save_world()
+            self.store.close()
+
+
+def check_metrics():
+    """Serve a throwaway server's registry and check every TickBudget series comes back from a scrape."""
+    registry = MetricsRegistry("mmo")
+    server = MMOServer(port=0, registry=registry)
+    endpoint = MetricsServer(registry, port=0).start()
+    try:
+        # Engage the first step and skip some work under it
+        server.budget.level = 1
+        server.budget.note_shed(server.budget.steps[0], 5)
+        samples = parse_metrics(scrape(endpoint.port))
+    finally:
+        endpoint.stop()
+        server.sock.close()
+
+    budget = server.budget.metrics()
+    expected = [key for key in budget if key.startswith("shed_")] + ["tick_load"]
+    missing = [key for key in expected if ("mmo_" + key, "") not in samples]
+    assert not missing, f"not exported: {missing}"
+    for key in expected:
+        if key != "tick_load":
+            assert samples[("mmo_" + key, "")] == budget[key], key
+    print(f"metrics check: {len(expected)} budget series exported, {len(samples)} samples parsed")
+
+
+def check_messages():
+    """Feed a throwaway server malformed datagrams between valid ones; each must be counted, none may raise."""
+    server = MMOServer(port=0)
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    addr = ('127.0.0.1', server.sock.getsockname()[1])
+    bad = [b'\xff\xfe', b'not json', b'[1, 2]', b'"join"',
+           b'{"type": "join"}',
+           b'{"type": "join", "player_id": ["a"]}',
+           b'{"type": "join", "player_id": {"a": 1}}',
+           b'{"type": ["input"], "player_id": "p1"}',
+           b'{"type": "input", "player_id": "p1", "keys": ["left"]}',
+           b'{"type": "input", "player_id": "p1", "keys": {"left": "yes"}}',
+           b'{"type": "input", "player_id": "p1", "keys": null}']
+    try:
+        client.sendto(json.dumps({"type": "join", "player_id": "p1"}).encode(), addr)
+        for data in bad:
+            client.sendto(data, addr)
+        client.sendto(json.dumps({"type": "input", "player_id": "p1", "keys": {"right": True}}).encode(), addr)
+        time.sleep(0.2)
+        server.poll_network()
+        for _ in range(30):
+            server.simulate()
+    finally:
+        client.close()
+        server.sock.close()
+
+    errors = server.m_decode_errors.value
+    assert errors == len(bad), f"{errors} decode errors counted for {len(bad)} bad datagrams"
+    assert list(server.players) == ["p1"] and server.clients["p1"]["keys"] == {"right": True}
+    assert server.players["p1"].x > mmo.SCREEN_WIDTH // 2, "valid input was not applied"
+    print(f"message check: {len(bad)} malformed datagrams counted, valid join and input applied")
+
+
+def main():
+    store = WorldStore(WORLD_DB)
+    store.start()
+    registry = MetricsRegistry("mmo")
+    watch_gc(registry)
+    server = MMOServer(store=store, registry=registry)
+    metrics = MetricsServer(registry).start()
+    print(f"MMO server listening on UDP {SERVER_PORT}, {len(server.saved)} saved players in {WORLD_DB}")
+    print(f"Metrics on http://127.0.0.1:{metrics.port}/metrics")
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        metrics.stop()
+        server.shutdown()
+    sys.exit()
+
+if __name__ == "__main__" and '--check-metrics' in sys.argv:
+    check_metrics()
+elif __name__ == "__main__" and '--check-messages' in sys.argv:
+    check_messages()
+elif __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# netcapture.py
+#
+# Packet capture and replay for benchmarking the games' UDP listeners.
+#
+# Capture: set NET_CAPTURE=<file> before starting a game and its listener
+# appends every datagram it receives, with a timestamp, to that file.
+#
+# Replay: push a capture back into a game's listener over loopback and
+# report throughput, drops and decode errors, e.g.
+#
+#   python netcapture.py match.cap mariovluigi1.0a.py --speed 10
+#   python netcapture.py match.cap "Cat'sMMO4K.py" --speed 0     (as fast as possible)
+
+import argparse
+import os
+import socket
+import struct
+import threading
+import time
+
+from gamemodule import load_game_module
+
+MAGIC = b'NETCAP1\n'
+RECORD = struct.Struct('<dH')     # seconds since capture start, datagram length
+
+# -----------------------------------------------------------------------------
+# CAPTURE FILES
+# -----------------------------------------------------------------------------
+
+class CaptureWriter:
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.start = time.perf_counter()
+        self.count = 0
+
+    def write(self, data):
+        self.file.write(RECORD.pack(time.perf_counter() - self.start, len(data)))
+        self.file.write(data)
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+def open_capture_from_env():
+    """CaptureWriter for the file named by NET_CAPTURE, or None when capture is off."""
+    path = os.environ.get('NET_CAPTURE')
+    if not path:
+        return None
+    return CaptureWriter(path)
+
+def read_capture(path):
+    """List of (timestamp, datagram) records from a capture file."""
+    records = []
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a capture file")
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                break
+            t, length = RECORD.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                break
+            records.append((t, data))
+    return records
+
+# -----------------------------------------------------------------------------
+# REPLAY
+# -----------------------------------------------------------------------------
+
+def replay(records, game, port, speed=1.0, settle=0.5):
+    """
+    Start game's listener on `port`, send `records` to it over loopback and
+    wait for it to drain. speed is the playback multiplier; 0 sends as fast
+    as possible. The game module must keep its counters in net_stats.
+    """
+    game.UDP_PORT = port
+    game.running = True
+    for key in game.net_stats:
+        game.net_stats[key] = 0
+
+    target = getattr(game, 'listener', None) or game.network_listener
+    thread = threading.Thread(target=target, args=('replay',), daemon=True)
+    thread.start()
+    time.sleep(0.2)   # let the listener bind
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sent_bytes = 0
+    start = time.perf_counter()
+    for t, data in records:
+        if speed > 0:
+            delay = t / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        sock.sendto(data, ('127.0.0.1', port))
+        sent_bytes += len(data)
+    send_time = time.perf_counter() - start
+
+    # Wait until the listener has everything or stops making progress
+    last = game.net_stats['received']
+    drained = time.perf_counter()
+    while last < len(records) and time.perf_counter() - drained < settle:
+        time.sleep(0.005)
+        if game.net_stats['received'] != last:
+            last = game.net_stats['received']
+            drained = time.perf_counter()
+    elapsed = drained - start
+
+    game.running = False
+    thread.join(timeout=2.0)
+    sock.close()
+
+    received = game.net_stats['received']
+    return {
+        'sent': len(records),
+        'received': received,
+        'dropped': len(records) - received,
+        'decode_errors': game.net_stats['decode_errors'],
+        'bytes': sent_bytes,
+        'send_seconds': send_time,
+        'seconds': elapsed,
+        'packets_per_sec': received / elapsed if elapsed else 0.0,
+        'bytes_per_sec': game.net_stats['bytes'] / elapsed if elapsed else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a packet capture into a game's UDP listener.")
+    parser.add_argument('capture', help="file written with NET_CAPTURE=<file>")
+    parser.add_argument('game', help="game script whose listener to drive, e.g. mariovluigi1.0a.py")
+    parser.add_argument('--speed', type=float, default=1.0, help="playback multiplier, 0 = as fast as possible")
+    parser.add_argument('--port', type=int, default=16000, help="loopback port for the listener")
+    args = parser.parse_args()
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.pop('NET_CAPTURE', None)
+    game = load_game_module(args.game)
+
+    records = read_capture(args.capture)
+    speed_label = f"{args.speed:g}x" if args.speed > 0 else "max speed"
+    print(f"Replaying {len(records)} datagrams into {args.game} at {speed_label}")
+    r = replay(records, game, args.port, args.speed)
+    print(f"received {r['received']}/{r['sent']}  dropped {r['dropped']}  "
+          f"decode errors {r['decode_errors']}")
+    print(f"{r['packets_per_sec']:.0f} packets/s  {r['bytes_per_sec'] / 1024:.1f} KiB/s  "
+          f"(sent in {r['send_seconds']:.3f}s, drained in {r['seconds']:.3f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# netclock.py
+#
+# NTP-style clock offset estimation between peers, plus a shared match clock.
+# Each peer pings the others over the game's existing UDP socket; the four
+# timestamps of a ping/pong round trip give an offset and round-trip time
+# per peer. The lowest peer id acts as the time reference, and every peer
+# maps its local frames onto the reference's match clock and tick number.
+# When the reference changes (a lower id syncs, or the reference leaves),
+# the match clock slews onto the new reference instead of jumping, so match
+# ticks keep counting forward a frame at a time. Only a jump too big to
+# slew away (joining a match already under way) steps.
+#
+# handle() and forget() run on the network thread while the game thread
+# reads the clock; ClockSync.lock guards the peer table and its estimates.
+
+import math
+import threading
+import time
+from collections import deque
+
+PING_INTERVAL     = 0.5     # seconds between pings
+SAMPLE_WINDOW     = 8       # round trips kept per peer for the min-RTT filter
+OFFSET_SMOOTHING  = 0.1     # EWMA weight of a new offset measurement
+DRIFT_SMOOTHING   = 0.05    # EWMA weight of a new drift measurement
+JITTER_SMOOTHING  = 0.1     # EWMA weight of a new jitter measurement
+STEP_THRESHOLD    = 0.25    # seconds; larger jumps reset the estimate instead of smoothing
+SLEW_RATE         = 0.05    # seconds the match clock gains or loses per second while slewing
+MAX_SLEW          = 1.0     # seconds; a bigger jump on a reference change (joining a running match) steps
+
+# -----------------------------------------------------------------------------
+# PER-PEER ESTIMATOR
+# -----------------------------------------------------------------------------
+
+class PeerClock:
+    """Offset of one remote peer's clock relative to ours (remote - local)."""
+
+    def __init__(self):
+        self.samples = deque(maxlen=SAMPLE_WINDOW)   # (rtt, offset, t3)
+        self.offset = 0.0
+        self.drift = 0.0          # seconds of offset change per local second
+        self.rtt = 0.0
+        self.jitter = 0.0
+        self.updated_at = None    # local time of the last estimate
+        self.epoch = None         # peer's match epoch, in the peer's clock
+
+    def add_sample(self, t0, t1, t2, t3):
+        rtt = (t3 - t0) - (t2 - t1)
+        offset = ((t1 - t0) + (t2 - t3)) / 2.0
+        if rtt < 0:
+            return
+        if self.samples:
+            self.jitter += JITTER_SMOOTHING * (abs(rtt - self.rtt) - self.jitter)
+        self.samples.append((rtt, offset, t3))
+
+        # Clock filter: the lowest-RTT sample in the window has the least
+        # queueing delay in it and so the most trustworthy offset.
+        best_rtt, best_offset, _ = min(self.samples)
+        self.rtt = best_rtt
+
+        if self.updated_at is None or abs(best_offset - self.predicted(t3)) > STEP_THRESHOLD:
+            self.offset = best_offset
+            self.drift = 0.0
+        else:
+            elapsed = t3 - self.updated_at
+            predicted = self.predicted(t3)
+            new_offset = predicted + OFFSET_SMOOTHING * (best_offset - predicted)
+            if elapsed > 0:
+                self.drift += DRIFT_SMOOTHING * ((new_offset - self.offset) / elapsed - self.drift)
+            self.offset = new_offset
+        self.updated_at = t3
+
+    def predicted(self, local_now):
+        """Offset extrapolated to local_now using the drift estimate."""
+        if self.updated_at is None:
+            return self.offset
+        return self.offset + self.drift * (local_now - self.updated_at)
+
+    def synced(self):
+        return self.updated_at is not None
+
+# -----------------------------------------------------------------------------
+# SHARED MATCH CLOCK
+# -----------------------------------------------------------------------------
+
+class ClockSync:
+    def __init__(self, local_id, tick_rate=60, clock=time.monotonic):
+        self.local_id = local_id
+        self.tick_rate = tick_rate
+        self.clock = clock
+        self.epoch = clock()          # our match start, in our own clock
+        self.peers = {}               # pid -> PeerClock
+        self.lock = threading.Lock()  # guards peers and their estimates
+        self.last_ping = 0.0
+        self.ref = (local_id, None)   # reference in use: (pid, PeerClock or None for ourselves)
+        self.slew = 0.0               # seconds still to slew off the match clock ...
+        self.slew_at = 0.0            # ... as of this local time
+
+    def now(self):
+        return self.clock()
+
+    # --- Messages -------------------------------------------------------------
+
+    def make_ping(self):
+        """Ping message to broadcast, or None if it is not time yet."""
+        now = self.now()
+        if now - self.last_ping < PING_INTERVAL:
+            return None
+        self.last_ping = now
+        return {'type': 'ping', 'pid': self.local_id, 't0': now, 'epoch': self.epoch}
+
+    def handle(self, msg, recv_time):
+        """
+        Process a ping or pong; recv_time is self.now() taken as soon as the
+        datagram arrived. Returns a pong to send back, or None.
+        """
+        kind = msg.get('type')
+        pid = msg.get('pid')
+        if pid is None or pid == self.local_id:
+            return None
+        with self.lock:
+            peer = self.peers.setdefault(pid, PeerClock())
+            peer.epoch = msg.get('epoch', peer.epoch)
+            if kind == 'pong' and msg.get('to') == self.local_id:
+                peer.add_sample(msg['t0'], msg['t1'], msg['t2'], recv_time)
+
+        if kind == 'ping':
+            return {'type': 'pong', 'pid': self.local_id, 'to': pid,
+                    't0': msg['t0'], 't1': recv_time, 't2': self.now(),
+                    'epoch': self.epoch}
+        return None
+
+    def forget(self, pid):
+        with self.lock:
+            self.peers.pop(pid, None)
+
+    # --- Shared clock ---------------------------------------------------------
+
+    def _reference(self):
+        """(pid, PeerClock) of the lowest id among ourselves and every peer we have synced with."""
+        with self.lock:
+            synced = [(pid, peer) for pid, peer in self.peers.items() if peer.synced() and peer.epoch is not None]
+        return min([(self.local_id, None)] + synced, key=lambda entry: entry[0])
+
+    def reference_id(self):
+        return self._reference()[0]
+
+    def _reference_time(self, ref, local_time):
+        """Match time of reference ref at local_time, without slewing."""
+        peer = ref[1]
+        if peer is None:
+            return local_time - self.epoch
+        with self.lock:
+            return local_time + peer.predicted(local_time) - peer.epoch
+
+    def _slew_left(self, local_time):
+        if not self.slew:
+            return 0.0
+        done = SLEW_RATE * max(0.0, local_time - self.slew_at)
+        if done >= abs(self.slew):
+            return 0.0
+        return self.slew - math.copysign(done, self.slew)
+
+    def offset_to(self, pid):
+        """Seconds to add to our clock to read pid's clock."""
+        if pid == self.local_id:
+            return 0.0
+        with self.lock:
+            return self.peers[pid].predicted(self.now())
+
+    def to_match_time(self, local_time):
+        ref = self._reference()
+        if ref[0] != self.ref[0]:
+            # Carry on from the old reference's time and slew onto the new one
+            slew = self._slew_left(local_time) + self._reference_time(self.ref, local_time) \
+                - self._reference_time(ref, local_time)
+            self.slew = slew if abs(slew) <= MAX_SLEW else 0.0
+            self.slew_at = local_time
+        self.ref = ref
+        return self._reference_time(ref, local_time) + self._slew_left(local_time)
+
+    def match_time(self):
+        """Seconds since the reference peer's match start, as seen by every peer."""
+        return self.to_match_time(self.now())
+
+    def match_tick(self):
+        return int(self.match_time() * self.tick_rate)
+
+    def local_time_for_tick(self, tick):
+        """Our local clock reading at which the shared tick begins."""
+        now = self.now()
+        return tick / self.tick_rate - (self.to_match_time(now) - now)
+
+    def stats(self, pid):
+        """(offset, rtt, jitter, drift) for a peer, or None before the first sample."""
+        with self.lock:
+            peer = self.peers.get(pid)
+            if peer is None or not peer.synced():
+                return None
+            return peer.predicted(self.now()), peer.rtt, peer.jitter, peer.drift
@@ -1,6 +1,8 @@
 
 # test.py
 import pygame, socket, threading, json, random, time, sys, math
+from inputhistory import InputHistory, InputReceiver
+from platformphysics import MovementProfile, PlatformLevel, walk, start_jump, fall, move_box
 
 # --- CONFIG ---
 SCREEN_W, SCREEN_H = 800, 480
@@ -16,6 +18,8 @@ NET_TICK = 0.02
 UDP_PORT = 6000
 BROADCAST = '<broadcast>'
 POWERUPS = ['mushroom', 'fire', 'shell', 'star', 'mini', 'mega']
+INPUT_DELAY = 2          # frames the remote is simulated behind its newest input
+CORRECTION_DIST = TILE   # px of drift before the remote snaps to its sent state
 
 # --- LEVEL DATA ---
 LEVEL = [
@@ -29,6 +33,9 @@ LEVEL = [
     {'x': -TILE*2, 'y': SCREEN_H-TILE*2, 'w': TILE*2, 'h': TILE*2, 'type': 'pipeL'},
     {'x': SCREEN_W, 'y': SCREEN_H-TILE*2, 'w': TILE*2, 'h': TILE*2, 'type': 'pipeR'},
 ]
+LEVEL_COLLISION = PlatformLevel.from_rects([(p['x'], p['y'], p['w'], p['h']) for p in LEVEL])
+PLAYER_PROFILE = MovementProfile('pcport', max_speed=MAX_RUN, accel=RUN_ACC, idle_divisor=FRICTION, stop_speed=0.1,
+                                 gravity=GRAVITY, jump_velocity=JUMP_VEL, max_fall=18, max_rise=-25)
 
 STAR_SPAWNS = [
     (SCREEN_W//2, SCREEN_H//2-80),
@@ -76,20 +83,13 @@ class Player:
         left = keys.get('left')
         right = keys.get('right')
         run = keys.get('run')
-        acc = RUN_ACC * (1.3 if run else 1)
-        if left:   self.vx -= acc
-        if right:  self.vx += acc
+        self.vx = walk(self.vx, (1 if right else 0) - (1 if left else 0), PLAYER_PROFILE, boost=1.3 if run else 1)
         self.facing = -1 if left else (1 if right else self.facing)
-        if not (left or right):
-            self.vx /= FRICTION
-            if abs(self.vx) < 0.1: self.vx = 0
-        self.vx = max(-MAX_RUN, min(self.vx, MAX_RUN))
         # --- Wall jump: check if against wall, allow for a small window
         touching_wall = False
         wall_dir = 0
-        for plat in level:
-            r = pygame.Rect(plat['x'], plat['y'], plat['w'], plat['h'])
-            pr = self.rect()
+        pr = self.rect()
+        for r in level.grid.query_rect(pr.inflate(4,0)):
             if pr.move(2,0).colliderect(r):
                 touching_wall = True
                 wall_dir = 1
@@ -99,48 +99,30 @@ class Player:
         # --- Jump
         if keys.get('jump'):
             if self.ground:
-                self.vy = JUMP_VEL * (1.25 if 'mini' in self.power else 1)
+                self.vy, _ = start_jump(PLAYER_PROFILE, 1.25 if 'mini' in self.power else 1)
                 self.jumping = True
             elif touching_wall and not self.jumping and self.wall_timer==0:
-                self.vy = JUMP_VEL * 0.92
+                self.vy, _ = start_jump(PLAYER_PROFILE, 0.92)
                 self.vx = 10 * (-wall_dir)
                 self.wall_timer = 12
         if self.wall_timer: self.wall_timer -= 1
         if not keys.get('jump'): self.jumping = False
         # --- Gravity
-        self.vy += GRAVITY * (0.5 if 'mini' in self.power else 1)
-        if self.vy > 18: self.vy = 18
-        if self.vy < -25: self.vy = -25
+        self.vy, _ = fall(self.vy, False, 0, PLAYER_PROFILE, gravity_scale=0.5 if 'mini' in self.power else 1)
         # --- Ground pound
         if keys.get('down') and not self.ground and not self.gp:
             self.gp = True
             self.vy = 16
         if self.gp and self.ground:
             self.gp = False
-        # --- Apply movement
-        oldx, oldy = self.x, self.y
-        self.x += self.vx
-        self.y += self.vy
+        # --- Apply movement (swept) and collision
+        self.x, self.y, contacts = move_box(self.x, self.y, *self.rect().size, self.vx, self.vy, level)
+        if contacts.landed or contacts.ceiling:
+            self.vy = 0
+        if contacts.wall:
+            self.vx = 0
+        self.ground = contacts.landed
         pr = self.rect()
-        # --- Collision (ground/platform)
-        self.ground = False
-        for plat in level:
-            platrect = pygame.Rect(plat['x'], plat['y'], plat['w'], plat['h'])
-            # X axis
-            if pr.colliderect(platrect):
-                if oldy+pr.height <= platrect.y and self.vy >= 0:  # Falling on top
-                    self.y = platrect.y - pr.height
-                    self.vy = 0
-                    self.ground = True
-                elif oldx+pr.width <= platrect.x and self.vx > 0:
-                    self.x = platrect.x - pr.width
-                    self.vx = 0
-                elif oldx >= platrect.x+platrect.width and self.vx < 0:
-                    self.x = platrect.x + platrect.width
-                    self.vx = 0
-                elif oldy >= platrect.y+platrect.height and self.vy < 0:
-                    self.y = platrect.y + platrect.height
-                    self.vy = 0
         # --- Wrap pipes
         if self.x < -TILE:  self.x = SCREEN_W-TILE
         if self.x > SCREEN_W: self.x = 0
@@ -211,6 +193,7 @@ class Player:
 # --- NETWORK ---
 running = True
 remotes = {}
+remote_inputs = {}  # pid -> InputReceiver
 def listener(local_id):
     global remotes, running
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -224,9 +207,18 @@ def listener(local_id):
             pid = m.get('pid')
             if pid==local_id: continue
             if pid not in remotes:
-                remotes[pid] = Player(pid, (0,200,0), 100, 50)
+                rp = Player(pid, (0,200,0), m.get('x',100), m.get('y',50))
+                remote_inputs[pid] = InputReceiver()
+                remotes[pid] = rp
             rp = remotes[pid]
-            for k in ('x','y','vx','vy','facing','ground','state','stars','lives','power','dead','invuln'):
+            # Input-driven: the remote moves by replaying its inputs locally,
+            # and its sent position only corrects drift
+            if 'inputs' in m:
+                remote_inputs[pid].receive(m['frame'], m['inputs'])
+            if math.hypot(m.get('x',rp.x)-rp.x, m.get('y',rp.y)-rp.y) > CORRECTION_DIST:
+                for k in ('x','y','vx','vy'):
+                    if k in m: setattr(rp, k, m[k])
+            for k in ('facing','state','stars','lives','power','dead','invuln'):
                 if k in m: setattr(rp, k, m[k])
             rp.fireballs = m.get('fireballs',[])
             rp.respawn = m.get('respawn',0)
@@ -256,6 +248,9 @@ def main():
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
     last_send = 0
+    frame = 0
+    history = InputHistory()
+    remote_frame = None
     # --- Controls
     key_map = {'left':pygame.K_LEFT, 'right':pygame.K_RIGHT, 'jump':pygame.K_z, 'down':pygame.K_DOWN, 'run':pygame.K_LSHIFT, 'fire':pygame.K_x}
     keys = {k:False for k in key_map}
@@ -267,6 +262,7 @@ def main():
     # --- Main
     while running:
         dt = clock.tick(FPS)
+        frame += 1
         # --- Input
         for event in pygame.event.get():
             if event.type==pygame.QUIT: running=False
@@ -320,15 +316,32 @@ def main():
         other = None
         if remotes:
             other = list(remotes.values())[0]
-        p1.update(keys, LEVEL, other, items, drops)
-        if other: other.update({}, LEVEL, p1, items, drops)
+        history.record(frame, keys)
+        p1.update(keys, LEVEL_COLLISION, other, items, drops)
+        if other:
+            rx = remote_inputs[other.pid]
+            if rx.latest is not None:
+                # Step the remote through its inputs, a few frames behind the
+                # newest so lost packets are usually refilled before use
+                target = rx.latest - INPUT_DELAY
+                if remote_frame is None or abs(target - remote_frame) > FPS:
+                    remote_frame = target - 1
+                while remote_frame < target:
+                    remote_frame += 1
+                    # Its fireballs come with its state packets. Firing from replayed
+                    # input would spawn shots it never fired (predicted frames) or a
+                    # second copy of one a packet already delivered
+                    remote_keys = rx.keys_for(remote_frame)
+                    remote_keys['fire'] = False
+                    other.update(remote_keys, LEVEL_COLLISION, p1, items, drops)
         # --- Send network state
         now = time.time()
         if now-last_send>NET_TICK:
             last_send=now
             msg = {'pid':local_id, 'x':p1.x, 'y':p1.y, 'vx':p1.vx, 'vy':p1.vy, 'facing':p1.facing,
                    'ground':p1.ground, 'state':p1.state, 'stars':p1.stars, 'lives':p1.lives,
-                   'power':p1.power, 'fireballs':p1.fireballs, 'dead':p1.dead, 'invuln':p1.invuln, 'respawn':p1.respawn}
+                   'power':p1.power, 'fireballs':p1.fireballs, 'dead':p1.dead, 'invuln':p1.invuln, 'respawn':p1.respawn,
+                   'frame':frame, 'inputs':history.encode()}
             try:
                 sock.sendto(json.dumps(msg).encode('utf8'), (BROADCAST, UDP_PORT))
             except Exception: pass
@@ -377,6 +390,8 @@ def main():
         win.blit(font.render(f"Stars: {p1.stars}   Lives: {p1.lives}   Coins: {p1.coins}   Power: {','.join(p1.power)}",1,(0,0,0)),(10,10))
         if other:
             win.blit(font.render(f"Remote Stars: {other.stars}   Lives: {other.lives}   Power: {','.join(other.power)}",1,(0,80,0)),(10,40))
+            rx = remote_inputs[other.pid]
+            win.blit(font.render(f"Inputs: filled {rx.filled}  predicted {rx.predicted}  mispredicted {rx.mispredicted}",1,(0,80,0)),(10,70))
         if p1.invuln: pygame.draw.rect(win,(255,255,255),p1.rect(),4)
         pygame.display.flip()
     # --- Cleanup ---
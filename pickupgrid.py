@@ -0,0 +1,163 @@
+# pickupgrid.py
+#
+# Spatial index for pickups: coins, power-ups, star drops.
+# Pickups are points collected by any player who comes within a radius.
+# Checking every player against every pickup costs pickups x players per
+# frame. PickupGrid buckets pickups into cells, so each player only looks at
+# the cells its pickup circle overlaps, and tests those candidates with a
+# squared distance (no sqrt).
+#
+# The grid also stands in for the game's plain pickup list: it iterates,
+# has a length and takes append(). Removal is a swap-remove (the last pickup
+# fills the hole) instead of list.remove, so collecting from a large field
+# costs the same as from a small one. Iteration order is therefore not spawn
+# order, but it is the same on every peer that applies the same operations.
+#
+# Pickups are any objects with x and y. Call move() after changing them.
+#
+# Run directly for a brute-force versus grid benchmark:
+#   python pickupgrid.py
+
+import math
+import time
+
+PICKUP_CELL = 64     # px per cell side; at least the pickup radius keeps a query to 2x2 cells
+
+# -----------------------------------------------------------------------------
+# GRID
+# -----------------------------------------------------------------------------
+
+class PickupGrid:
+    def __init__(self, radius, pickups=(), cell=PICKUP_CELL):
+        """
+        radius  -- a player at distance < radius from a pickup reaches it
+        pickups -- initial pickups (any objects with x, y)
+        """
+        self.radius = radius
+        self.radius_sq = radius * radius
+        self.cell = cell
+        self.items = []                      # dense, unordered
+        self.cells = {}                      # (cx, cy) -> [pickup, ...]
+        self._where = {}                     # pickup -> [items index, cell key, cell index]
+        for pickup in pickups:
+            self.append(pickup)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __contains__(self, pickup):
+        return pickup in self._where
+
+    def _key(self, x, y):
+        c = self.cell
+        return (int(x // c), int(y // c))
+
+    def append(self, pickup):
+        key = self._key(pickup.x, pickup.y)
+        bucket = self.cells.setdefault(key, [])
+        self._where[pickup] = [len(self.items), key, len(bucket)]
+        self.items.append(pickup)
+        bucket.append(pickup)
+
+    def _unlink(self, bucket, index, slot):
+        # Swap-remove bucket[index]; slot is 0 for self.items, 2 for a cell
+        last = bucket.pop()
+        if index < len(bucket):
+            bucket[index] = last
+            self._where[last][slot] = index
+
+    def remove(self, pickup):
+        where = self._where.pop(pickup)
+        self._unlink(self.items, where[0], 0)
+        bucket = self.cells[where[1]]
+        self._unlink(bucket, where[2], 2)
+        if not bucket:
+            del self.cells[where[1]]
+
+    def move(self, pickup):
+        """Re-bucket a pickup after its x or y changed."""
+        where = self._where[pickup]
+        key = self._key(pickup.x, pickup.y)
+        if key == where[1]:
+            return
+        bucket = self.cells[where[1]]
+        self._unlink(bucket, where[2], 2)
+        if not bucket:
+            del self.cells[where[1]]
+        bucket = self.cells.setdefault(key, [])
+        where[1], where[2] = key, len(bucket)
+        bucket.append(pickup)
+
+    def near(self, x, y):
+        """Pickups within radius of (x, y)."""
+        r, r2, c = self.radius, self.radius_sq, self.cell
+        cells = self.cells
+        found = []
+        for cx in range(int((x - r) // c), int((x + r) // c) + 1):
+            for cy in range(int((y - r) // c), int((y + r) // c) + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    for pickup in bucket:
+                        dx, dy = pickup.x - x, pickup.y - y
+                        if dx * dx + dy * dy < r2:
+                            found.append(pickup)
+        return found
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+
+class _Pickup:
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x, y):
+        self.x, self.y = x, y
+
+
+def benchmark(counts=(10, 100, 1000, 5000), players=4, radius=30, frames=200):
+    """Per-frame pickup test for `players` players: every pair with hypot vs a grid query each."""
+    import random
+
+    rng = random.Random(1)
+    print(f"{'pickups':>7} {'all pairs ms':>13} {'grid ms':>8} {'speedup':>8}")
+    for count in counts:
+        # A coin rain over one 800x480 screen
+        pickups = [_Pickup(rng.uniform(0, 800), rng.uniform(0, 480)) for _ in range(count)]
+        movers = [(rng.uniform(0, 800), rng.uniform(0, 480)) for _ in range(players)]
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            brute = [[p for p in pickups if math.hypot(p.x - x, p.y - y) < radius] for x, y in movers]
+        all_pairs = (time.perf_counter() - start) / frames
+
+        grid = PickupGrid(radius, pickups)
+        start = time.perf_counter()
+        for _ in range(frames):
+            gridded = [grid.near(x, y) for x, y in movers]
+        grid_time = (time.perf_counter() - start) / frames
+
+        assert [sorted(map(id, b)) for b in brute] == [sorted(map(id, g)) for g in gridded]
+        print(f"{count:>7} {all_pairs * 1000:>13.3f} {grid_time * 1000:>8.3f} {all_pairs / grid_time:>7.1f}x")
+
+    # Collect everything one pickup at a time: swap-remove vs list.remove
+    count = counts[-1]
+    pickups = [_Pickup(rng.uniform(0, 800), rng.uniform(0, 480)) for _ in range(count)]
+    order = pickups[:]
+    rng.shuffle(order)
+    listed = pickups[:]
+    start = time.perf_counter()
+    for p in order:
+        listed.remove(p)
+    removed = time.perf_counter() - start
+    grid = PickupGrid(radius, pickups)
+    start = time.perf_counter()
+    for p in order:
+        grid.remove(p)
+    swapped = time.perf_counter() - start
+    print(f"clear {count}: list.remove {removed * 1000:.2f} ms, swap-remove {swapped * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,299 @@
+# platformphysics.py
+#
+# Shared platformer physics core for the pygame games.
+# Each title used to carry its own walk / jump / gravity code and its own
+# overlap resolver. This module is the one copy:
+#   MovementProfile -- a game's movement feel as a single parameter set
+#   PlatformLevel   -- static level geometry behind a SpatialGrid, with
+#                      solid and one-way (land-on-top only) platforms
+#   Contacts        -- what a move touched: landed, ceiling, wall side
+#   Body            -- a kinematic box that steps itself
+# plus the scalar functions Body is built from (walk, start_jump, fall,
+# move_box), for games that keep their player in globals, Rects or dicts.
+#
+# Velocities are px per 60 Hz frame and f scales a step (1.0 = one frame),
+# like the games' own physics. Moves are swept (sweptaabb.py), so nothing
+# tunnels through a thin platform at any f.
+#
+# Run directly for the benchmark suite:
+#   python platformphysics.py
+
+import time
+
+import pygame
+
+from spatialgrid import SpatialGrid
+from sweptaabb import sweep, swept_bounds
+
+# -----------------------------------------------------------------------------
+# MOVEMENT PROFILES
+# -----------------------------------------------------------------------------
+
+class MovementProfile:
+    def __init__(self, name, max_speed, accel=None, turn_accel=None, decel=0.0, idle_divisor=1.0,
+                 stop_speed=0.0, damping=1.0, gravity=0.5, jump_velocity=-10.0, jump_hold_force=0.0,
+                 jump_hold_frames=0, max_fall=None, max_rise=None, ceiling_vy=0.0):
+        """
+        Horizontal:
+        max_speed    -- top walking speed
+        accel        -- speed gained per frame while a direction is held;
+                        None snaps straight to +-max_speed (arcade control)
+        turn_accel   -- used instead of accel when reversing at full speed
+        decel        -- speed lost per frame with no direction held
+        idle_divisor -- vx is divided by this per idle frame ...
+        stop_speed   -- ... and zeroed once it drops below this
+        damping      -- vx is multiplied by this every frame, held or not
+        Vertical:
+        gravity, jump_velocity
+        jump_hold_force, jump_hold_frames -- extra lift per frame while jump stays held
+        max_fall, max_rise -- vy clamps (None for no limit)
+        ceiling_vy   -- vy after bumping a ceiling (a small positive value drops sooner)
+        """
+        self.name = name
+        self.max_speed = max_speed
+        self.accel = accel
+        self.turn_accel = turn_accel
+        self.decel = decel
+        self.idle_divisor = idle_divisor
+        self.stop_speed = stop_speed
+        self.damping = damping
+        self.gravity = gravity
+        self.jump_velocity = jump_velocity
+        self.jump_hold_force = jump_hold_force
+        self.jump_hold_frames = jump_hold_frames
+        self.max_fall = max_fall
+        self.max_rise = max_rise
+        self.ceiling_vy = ceiling_vy
+
+    def __repr__(self):
+        return f"MovementProfile({self.name!r})"
+
+# -----------------------------------------------------------------------------
+# CONTROL
+# -----------------------------------------------------------------------------
+
+def walk(vx, direction, profile, f=1.0, boost=1.0):
+    """New vx for one step with direction -1, 0 or 1 held. boost scales accel (run buttons)."""
+    p = profile
+    if p.damping != 1.0:
+        vx *= p.damping ** f
+    if p.accel is None:
+        return direction * p.max_speed
+    if direction:
+        if p.turn_accel is not None and vx * direction < 0 and abs(vx) >= p.max_speed:
+            vx += direction * p.turn_accel * boost * f
+        else:
+            vx += direction * p.accel * boost * f
+        return max(-p.max_speed, min(p.max_speed, vx))
+    if p.decel:
+        if abs(vx) > p.decel * f:
+            vx -= p.decel * f * (1 if vx > 0 else -1)
+        else:
+            vx = 0
+    if p.idle_divisor != 1.0:
+        vx /= p.idle_divisor ** f
+        if abs(vx) < p.stop_speed:
+            vx = 0
+    return vx
+
+
+def start_jump(profile, scale=1.0):
+    """(vy, hold_frames) at take-off."""
+    return profile.jump_velocity * scale, profile.jump_hold_frames
+
+
+def fall(vy, jump_held, hold_left, profile, f=1.0, gravity_scale=1.0):
+    """Jump hold and gravity for one step: returns (vy, hold_left)."""
+    p = profile
+    if jump_held and hold_left > 0 and vy < 0:
+        vy += p.jump_hold_force * f
+        hold_left -= 1
+    else:
+        hold_left = 0
+    vy += p.gravity * gravity_scale * f
+    if p.max_fall is not None and vy > p.max_fall:
+        vy = p.max_fall
+    if p.max_rise is not None and vy < p.max_rise:
+        vy = p.max_rise
+    return vy, hold_left
+
+# -----------------------------------------------------------------------------
+# LEVEL QUERIES AND CONTACTS
+# -----------------------------------------------------------------------------
+
+class PlatformLevel:
+    def __init__(self, items, rect_of=lambda item: item['rect'], solid=None, one_way=None, **grid_options):
+        """
+        items   -- the level's platforms (any objects)
+        rect_of -- returns an item's pygame.Rect
+        solid   -- solid(item) -> False drops decoration; None keeps everything
+        one_way -- one_way(item) -> True for platforms that only catch a box
+                   landing on top; None means every platform is solid
+        """
+        self.items = [item for item in items if solid is None or solid(item)]
+        self.rect_of = rect_of
+        self.one_way = one_way
+        self.grid = SpatialGrid(self.items, rect_of, **grid_options)
+
+    @classmethod
+    def from_rects(cls, rects, one_way=False, **grid_options):
+        """A level of bare rects or (x, y, w, h) tuples; one_way=True makes them all land-on-top only."""
+        return cls([pygame.Rect(r) for r in rects], rect_of=lambda r: r,
+                   one_way=(lambda r: True) if one_way else None, **grid_options)
+
+    def __len__(self):
+        return len(self.items)
+
+    def candidates(self, x, y, w, h, dx, dy):
+        """Platforms a box moving by (dx, dy) could touch."""
+        return self.grid.query_rect(pygame.Rect(swept_bounds(x, y, w, h, dx, dy)))
+
+
+class Contacts:
+    __slots__ = ('landed', 'ceiling', 'wall', 'hits')
+
+    def __init__(self, hits):
+        self.hits = hits               # [(nx, ny, item), ...] earliest first
+        self.landed = self.ceiling = False
+        self.wall = 0                  # side of the box that hit a wall: -1 left, 1 right
+        for nx, ny, _ in hits:
+            if ny < 0:
+                self.landed = True
+            elif ny > 0:
+                self.ceiling = True
+            else:
+                self.wall = -nx
+
+
+def move_box(x, y, w, h, dx, dy, level):
+    """Swept move through level: returns (x, y, Contacts)."""
+    x, y, hits = sweep(x, y, w, h, dx, dy, level.candidates(x, y, w, h, dx, dy),
+                       level.rect_of, level.one_way)
+    return x, y, Contacts(hits)
+
+# -----------------------------------------------------------------------------
+# BODY
+# -----------------------------------------------------------------------------
+
+class Body:
+    __slots__ = ('x', 'y', 'w', 'h', 'vx', 'vy', 'on_ground', 'jump_hold')
+
+    def __init__(self, x, y, w, h):
+        self.x, self.y, self.w, self.h = x, y, w, h
+        self.vx = self.vy = 0.0
+        self.on_ground = False
+        self.jump_hold = 0
+
+    def rect(self):
+        return pygame.Rect(round(self.x), round(self.y), self.w, self.h)
+
+    def step(self, profile, level, direction=0, jump=False, jump_held=False, f=1.0):
+        """One step of walking, jumping, gravity and a swept move. Returns the Contacts."""
+        self.vx = walk(self.vx, direction, profile, f)
+        if jump and self.on_ground:
+            self.vy, self.jump_hold = start_jump(profile)
+        self.vy, self.jump_hold = fall(self.vy, jump_held, self.jump_hold, profile, f)
+        self.x, self.y, contacts = move_box(self.x, self.y, self.w, self.h,
+                                            self.vx * f, self.vy * f, level)
+        if contacts.landed:
+            self.vy = 0.0
+        elif contacts.ceiling:
+            self.vy = profile.ceiling_vy
+        if contacts.wall:
+            self.vx = 0.0
+        self.on_ground = contacts.landed
+        return contacts
+
+# -----------------------------------------------------------------------------
+# BENCHMARK SUITE
+# -----------------------------------------------------------------------------
+
+def _bench(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def _random_level(rng, count, width, height=600):
+    rects = [(0, height - 40, width, 40)]
+    for _ in range(count - 1):
+        rects.append((rng.randrange(0, width - 64), rng.randrange(120, height - 100), rng.choice((32, 64, 96)), 20))
+    return rects
+
+
+def bench_control(repeat=20000):
+    """Cost of one walk() + fall() update for each control style."""
+    profiles = [
+        MovementProfile('arcade', max_speed=5),
+        MovementProfile('approach', max_speed=4.0, accel=0.28, turn_accel=0.56, decel=0.35,
+                        gravity=0.72, jump_velocity=-15.5, jump_hold_force=-0.5, jump_hold_frames=12, max_fall=15),
+        MovementProfile('divisor', max_speed=7.5, accel=2.0, idle_divisor=1.1, stop_speed=0.1,
+                        gravity=1.0, jump_velocity=-18, max_fall=18, max_rise=-25),
+        MovementProfile('damped', max_speed=5, accel=0.8, damping=0.85),
+    ]
+    print("control: walk() + fall() per call")
+    for p in profiles:
+        state = [0.0, -8.0, 6]
+        def update():
+            state[0] = walk(state[0], 1, p)
+            state[1], state[2] = fall(state[1], True, state[2], p)
+        print(f"  {p.name:>9} {_bench(update, repeat) * 1e6:7.3f} us")
+
+
+def bench_move(counts=(10, 100, 1000), repeat=2000):
+    """Swept move_box() against a per-platform overlap scan, as level size grows."""
+    import random
+
+    rng = random.Random(1)
+    print(f"move: one body, per step   {'platforms':>9} {'rect scan us':>13} {'move_box us':>12}")
+    for count in counts:
+        width = max(800, count * 24)
+        rects = _random_level(rng, count, width)
+        level = PlatformLevel.from_rects(rects)
+        x, y = width / 2, 300.0
+
+        def scan():
+            box = pygame.Rect(int(x + 3), int(y + 5), 28, 32)
+            for r in rects:
+                box.colliderect(pygame.Rect(r))
+
+        def swept():
+            move_box(x, y, 28, 32, 3.0, 5.0, level)
+
+        print(f"{'':27}{count:>9} {_bench(scan, repeat) * 1e6:>13.2f} {_bench(swept, repeat) * 1e6:>12.2f}")
+
+
+def bench_bodies(counts=(1, 100, 1000), platforms=200, frames=50):
+    """Full Body.step() for crowds of bodies walking and jumping on one level."""
+    import random
+
+    rng = random.Random(2)
+    width = platforms * 24
+    level = PlatformLevel.from_rects(_random_level(rng, platforms, width))
+    profile = MovementProfile('approach', max_speed=4.0, accel=0.28, turn_accel=0.56, decel=0.35,
+                              gravity=0.72, jump_velocity=-15.5, jump_hold_force=-0.5, jump_hold_frames=12,
+                              max_fall=15)
+    print(f"bodies: Body.step() on {platforms} platforms   {'bodies':>6} {'frame ms':>9} {'per body us':>12}")
+    for count in counts:
+        bodies = [Body(rng.uniform(0, width - 28), rng.uniform(0, 400), 28, 32) for _ in range(count)]
+        dirs = [rng.choice((-1, 1)) for _ in range(count)]
+        clock = [0]
+
+        def frame():
+            clock[0] += 1
+            jump = clock[0] % 40 == 0
+            for body, d in zip(bodies, dirs):
+                body.step(profile, level, d, jump, jump)
+
+        t = _bench(frame, frames)
+        print(f"{'':41}{count:>6} {t * 1000:>9.3f} {t / count * 1e6:>12.2f}")
+
+
+def benchmark():
+    bench_control()
+    bench_move()
+    bench_bodies()
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,112 @@
+# pvpstage.py
+#
+# Player-versus-player interaction stage for the Mario vs Luigi games.
+# Once per frame, after every player has moved, contact_pairs() finds the
+# pairs of live players whose boxes overlap with one sort-and-sweep pass
+# instead of each player testing every other one (broadphase.py for big
+# crowds, the same sweep in plain Python for room-sized ones). run_pvp()
+# then hands each pair to the game's resolver (stomp, ground pound, star
+# kill) in both directions, so every peer also resolves hits where a remote
+# player is the attacker and its own player the victim.
+#
+# Players are any objects with rect() and dead.
+#
+# Run directly for an all-pairs versus broad-phase benchmark:
+#   python pvpstage.py
+
+import time
+
+from broadphase import overlapping_pairs
+
+PVP_NUMPY_MIN = 96  # below this many live players the sweep runs in plain Python, which is cheaper
+
+# -----------------------------------------------------------------------------
+# STAGE
+# -----------------------------------------------------------------------------
+
+def _sweep_pairs(rects):
+    # Same sort and sweep as broadphase.overlapping_pairs, in plain Python
+    order = sorted(range(len(rects)), key=lambda k: rects[k].x)
+    pairs = []
+    for pos, k in enumerate(order):
+        r = rects[k]
+        right = r.right
+        for m in order[pos + 1:]:
+            s = rects[m]
+            if s.x >= right:
+                break
+            if r.colliderect(s):
+                pairs.append((k, m) if k < m else (m, k))
+    pairs.sort()
+    return pairs
+
+
+def contact_pairs(players):
+    """Index pairs (i, j), i < j, of live players whose rects overlap, ordered by i then j."""
+    live = [i for i, p in enumerate(players) if not p.dead]
+    if len(live) < 2:
+        return []
+    rects = [players[i].rect() for i in live]
+    if len(rects) < PVP_NUMPY_MIN:
+        return [(live[i], live[j]) for i, j in _sweep_pairs(rects)]
+    a, b = overlapping_pairs([r.x for r in rects], [r.y for r in rects],
+                             [r.width for r in rects], [r.height for r in rects])
+    return [(live[i], live[j]) for i, j in zip(a.tolist(), b.tolist())]
+
+
+def run_pvp(players, resolve):
+    """
+    Call resolve(attacker, victim) for both directions of every overlapping
+    pair, skipping a direction once either player is dead (a victim killed
+    earlier in the frame does not strike back).
+    Returns the pairs that were checked.
+    """
+    pairs = contact_pairs(players)
+    for i, j in pairs:
+        for attacker, victim in ((players[i], players[j]), (players[j], players[i])):
+            if not attacker.dead and not victim.dead:
+                resolve(attacker, victim)
+    return pairs
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+
+class _Player:
+    __slots__ = ('box', 'dead')
+
+    def __init__(self, box):
+        self.box = box
+        self.dead = False
+
+    def rect(self):
+        return self.box
+
+
+def benchmark(counts=(2, 8, 16, 64, 256), frames=500):
+    """Every player testing every other player (what Player.update did for each peer) vs one stage pass."""
+    import random
+    import pygame
+
+    rng = random.Random(1)
+    print(f"{'players':>7} {'all pairs ms':>13} {'stage ms':>9} {'pairs':>6}")
+    for count in counts:
+        # A free-for-all crowd on one 800x480 screen
+        players = [_Player(pygame.Rect(rng.randrange(0, 768), rng.randrange(0, 416), 32, 64)) for _ in range(count)]
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            brute = [(i, j) for i, p in enumerate(players) for j, q in enumerate(players)
+                     if i < j and not p.dead and not q.dead and p.rect().colliderect(q.rect())]
+        all_pairs = (time.perf_counter() - start) / frames
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            pairs = contact_pairs(players)
+        stage = (time.perf_counter() - start) / frames
+
+        assert brute == pairs
+        print(f"{count:>7} {all_pairs * 1000:>13.3f} {stage * 1000:>9.3f} {len(pairs):>6}")
+
+if __name__ == "__main__":
+    benchmark()
@@ -2,6 +2,7 @@ import asyncio
 import platform
 import pygame
 from pygame.locals import *
+from platformphysics import MovementProfile, PlatformLevel, walk, start_jump, fall, move_box
 
 # Initialize Pygame
 pygame.init()
@@ -16,6 +17,9 @@ WHITE = (255, 255, 255)
 RED = (255, 0, 0)
 BLUE = (0, 0, 255)
 
+# Arcade control: full speed at once, fixed jump, no jump hold
+PLAYER_PROFILE = MovementProfile('smb3', max_speed=5, gravity=0.5, jump_velocity=-10)
+
 # Player class
 class Player(pygame.sprite.Sprite):
     def __init__(self):
@@ -29,21 +33,21 @@ class Player(pygame.sprite.Sprite):
         self.vel_y = 0
         self.is_jumping = False
 
-    def update(self):
+    def update(self, level):
         keys = pygame.key.get_pressed()
-        if keys[K_LEFT]:
-            self.vel_x = -5
-        elif keys[K_RIGHT]:
-            self.vel_x = 5
-        else:
-            self.vel_x = 0
+        direction = -1 if keys[K_LEFT] else 1 if keys[K_RIGHT] else 0
+        self.vel_x = walk(self.vel_x, direction, PLAYER_PROFILE)
         if keys[K_SPACE] and not self.is_jumping:
             self.is_jumping = True
-            self.vel_y = -10
+            self.vel_y, _ = start_jump(PLAYER_PROFILE)
         # Apply gravity
-        self.vel_y += 0.5
-        self.rect.x += self.vel_x
-        self.rect.y += self.vel_y
+        self.vel_y, _ = fall(self.vel_y, False, 0, PLAYER_PROFILE)
+        # Platforms only catch a player landing on top
+        self.rect.x, self.rect.y, contacts = move_box(self.rect.x, self.rect.y, self.rect.width, self.rect.height,
+                                                      self.vel_x, self.vel_y, level)
+        if contacts.landed:
+            self.vel_y = 0
+            self.is_jumping = False
         # Check boundaries
         if self.rect.left < 0:
             self.rect.left = 0
@@ -51,6 +55,7 @@ class Player(pygame.sprite.Sprite):
             self.rect.right = WIDTH
         if self.rect.bottom > HEIGHT:
             self.rect.bottom = HEIGHT
+            self.vel_y = 0
             self.is_jumping = False
 
 # Platform class
@@ -76,6 +81,7 @@ p1 = Platform(300, HEIGHT - 100, 200, 20)
 p2 = Platform(500, HEIGHT - 200, 200, 20)
 platforms.add(p1, p2)
 all_sprites.add(p1, p2)
+level = PlatformLevel(platforms, rect_of=lambda p: p.rect, one_way=lambda p: True)
 
 # Game loop
 FPS = 60
@@ -88,15 +94,7 @@ async def main():
             if event.type == QUIT:
                 running = False
 
-        all_sprites.update()
-
-        # Check for collisions
-        hits = pygame.sprite.spritecollide(player, platforms, False)
-        if hits:
-            if player.vel_y > 0:  # Falling down
-                player.rect.bottom = hits[0].rect.top
-                player.vel_y = 0
-                player.is_jumping = False
+        all_sprites.update(level)
 
         screen.fill(WHITE)
         all_sprites.draw(screen)
@@ -0,0 +1,154 @@
+# spatialgrid.py
+#
+# Uniform-grid spatial index for static level geometry.
+# Built once per level; collision code asks for the few platforms near a
+# rect or point instead of scanning the whole level every frame, so the
+# per-entity cost stays flat as levels grow to hundreds of blocks.
+# Candidates come back in the level's original order, so collision loops
+# that resolve contacts in list order behave exactly as before.
+# The few items that do move (kinematic platforms, see kinematic.py) are
+# re-filed with move(), which only touches the cells they left or entered.
+#
+# Run directly for a cost-versus-platform-count benchmark:
+#   python spatialgrid.py
+
+import time
+from bisect import insort
+
+GRID_CELL   = 64     # px per cell side
+GRID_MARGIN = 32     # px each entry is padded by, covering bump animations
+                     # and the push-out a collision response applies mid-loop
+GRID_MIN_ITEMS = 64  # below this a plain scan is cheaper; queries return everything
+
+# -----------------------------------------------------------------------------
+# GRID
+# -----------------------------------------------------------------------------
+
+class SpatialGrid:
+    def __init__(self, items, rect_of=lambda item: item['rect'], cell=GRID_CELL, margin=GRID_MARGIN,
+                 min_items=GRID_MIN_ITEMS):
+        """
+        items   -- the level's platforms (any objects); the grid keeps references
+        rect_of -- returns the pygame.Rect of an item
+        """
+        self.cell = cell
+        self.margin = margin
+        self.rect_of = rect_of
+        self.items = list(items)
+        self.cells = {}                      # (cx, cy) -> [item index, ...] ascending
+        self.linear = len(self.items) < min_items
+        if self.linear:
+            return
+        for index, item in enumerate(self.items):
+            r = rect_of(item)
+            for key in self._keys(r.left - margin, r.top - margin, r.right + margin, r.bottom + margin):
+                self.cells.setdefault(key, []).append(index)
+
+    def _keys(self, left, top, right, bottom):
+        c = self.cell
+        x0, x1 = int(left // c), int((right - 1) // c)
+        y0, y1 = int(top // c), int((bottom - 1) // c)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                yield (cx, cy)
+
+    def _span(self, rect):
+        # Cell range covered by the padded rect
+        c, m = self.cell, self.margin
+        return (int((rect.left - m) // c), int((rect.right + m - 1) // c),
+                int((rect.top - m) // c), int((rect.bottom + m - 1) // c))
+
+    def move(self, index, old_rect):
+        """
+        Re-file item index after its rect moved away from old_rect. Only the
+        cells it left or entered change; returns how many that was.
+        """
+        if self.linear:
+            return 0
+        new_rect = self.rect_of(self.items[index])
+        if self._span(old_rect) == self._span(new_rect):
+            return 0
+        m = self.margin
+        old = set(self._keys(old_rect.left - m, old_rect.top - m, old_rect.right + m, old_rect.bottom + m))
+        new = set(self._keys(new_rect.left - m, new_rect.top - m, new_rect.right + m, new_rect.bottom + m))
+        cells = self.cells
+        for key in old - new:
+            bucket = cells[key]
+            bucket.remove(index)
+            if not bucket:
+                del cells[key]
+        for key in new - old:
+            insort(cells.setdefault(key, []), index)
+        return len(old ^ new)
+
+    def query_rect(self, rect):
+        """Items whose (padded) bounds share a cell with rect, in level order."""
+        if self.linear:
+            return self.items
+        cells = self.cells
+        c = self.cell
+        x0, x1 = int(rect.left // c), int((rect.right - 1) // c)
+        y0, y1 = int(rect.top // c), int((rect.bottom - 1) // c)
+        if x0 == x1 and y0 == y1:
+            found = cells.get((x0, y0))
+            if not found:
+                return []
+            items = self.items
+            return [items[i] for i in found]
+        hits = set()
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                found = cells.get((cx, cy))
+                if found:
+                    hits.update(found)
+        items = self.items
+        return [items[i] for i in sorted(hits)]
+
+    def query_point(self, x, y):
+        if self.linear:
+            return self.items
+        c = self.cell
+        found = self.cells.get((int(x // c), int(y // c)))
+        if not found:
+            return []
+        items = self.items
+        return [items[i] for i in found]
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+
+def benchmark(counts=(10, 50, 100, 250, 500, 1000), entities=20, frames=200):
+    """Time the per-frame collision pass of `entities` movers, linear scan vs grid."""
+    import random
+    import pygame
+
+    rng = random.Random(1)
+    print(f"{'platforms':>9} {'linear ms':>10} {'grid ms':>8} {'speedup':>8}")
+    for count in counts:
+        # A wide scrolling level: 40x20 px blocks spread over count * 24 px
+        width = max(800, count * 24)
+        level = [{'rect': pygame.Rect(rng.randrange(0, width), rng.randrange(100, 580), 40, 20)}
+                 for _ in range(count)]
+        movers = [pygame.Rect(rng.randrange(0, width), rng.randrange(100, 560), 30, 30)
+                  for _ in range(entities)]
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            for r in movers:
+                for p in level:
+                    r.colliderect(p['rect'])
+        linear = (time.perf_counter() - start) / frames
+
+        grid = SpatialGrid(level, min_items=0)
+        start = time.perf_counter()
+        for _ in range(frames):
+            for r in movers:
+                for p in grid.query_rect(r):
+                    r.colliderect(p['rect'])
+        gridded = (time.perf_counter() - start) / frames
+
+        print(f"{count:>9} {linear * 1000:>10.3f} {gridded * 1000:>8.3f} {linear / gridded:>7.1f}x")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,159 @@
+# statehash.py
+#
+# Checkpoint checksums of simulation state for desync detection.
+# A FrameHasher gathers the state's fields as fixed-point integers and hashes
+# them with one CRC-32 call, so hashing costs far less than serialising.
+# The game hashes only at checkpoints (every N match ticks), after stepping
+# its world to exactly that tick, so every peer hashes the same step.
+# A DesyncDetector keeps the digests at every checkpoint,
+# produces the message to broadcast, compares what peers send back and
+# dumps the full state of a divergent checkpoint to disk.
+
+import json
+import os
+import random
+import time
+import zlib
+from array import array
+from collections import deque
+
+POSITION_SCALE = 16       # fixed-point steps per pixel used when hashing floats
+
+# -----------------------------------------------------------------------------
+# FRAME HASHER
+# -----------------------------------------------------------------------------
+
+class FrameHasher:
+    """
+    Collects fixed-point values for one checkpoint and hashes them in a single
+    pack + CRC-32 pass at digest() time.
+    """
+
+    def __init__(self):
+        self.values = array('q')
+
+    def add_ints(self, *values):
+        self.values.extend([int(v) for v in values])
+
+    def add_pos(self, *values):
+        """Floats are hashed in fixed point so harmless rounding noise is ignored."""
+        self.values.extend([round(v * POSITION_SCALE) for v in values])
+
+    def add_str(self, value):
+        self.values.append(zlib.crc32(str(value).encode('utf-8')))
+
+    def add_rng(self, rng):
+        if isinstance(rng, TrackedRandom):
+            # Same seed and same number of words drawn means the same state
+            self.values.extend((rng.seed_value, rng.words))
+        else:
+            self.values.append(zlib.crc32(array('I', rng.getstate()[1]).tobytes()))
+
+    def digest(self):
+        return zlib.crc32(self.values.tobytes())
+
+
+class TrackedRandom(random.Random):
+    """
+    random.Random that counts the generator words it consumes, so its state
+    can be hashed from (seed, words) instead of the 625-word MT state.
+    """
+
+    def __init__(self, seed=None):
+        super().__init__(seed)   # calls seed(), which resets the counters
+
+    def seed(self, a=None, version=2):
+        self.seed_value = a if isinstance(a, int) else zlib.crc32(str(a).encode('utf-8'))
+        self.words = 0
+        super().seed(a, version)
+
+    def random(self):
+        self.words += 2
+        return super().random()
+
+    def getrandbits(self, k):
+        self.words += max(1, (k + 31) // 32)
+        return super().getrandbits(k)
+
+# -----------------------------------------------------------------------------
+# DESYNC DETECTOR
+# -----------------------------------------------------------------------------
+
+class DesyncDetector:
+    def __init__(self, local_id, interval=30, history=16, confirm=2, dump_dir='desync_dumps'):
+        """
+        interval -- ticks between checkpoints that are exchanged with peers
+        history  -- checkpoints kept locally for comparison and dumping
+        confirm  -- consecutive mismatching checkpoints before a peer counts as
+                    desynced (state changes land a frame apart on different peers)
+        """
+        self.local_id = local_id
+        self.interval = interval
+        self.confirm = confirm
+        self.dump_dir = dump_dir
+        self.checkpoints = {}                 # checkpoint index -> (tick, digest, state)
+        self.order = deque(maxlen=history)
+        self.last_checkpoint = None
+        self.streaks = {}                     # pid -> consecutive mismatches
+        self.desynced = set()
+        self.checks = 0
+        self.mismatches = 0
+        self.dumps = 0
+        self.hash_time = 0.0                  # smoothed seconds per checkpoint hash
+
+    def note_hash_time(self, seconds):
+        self.hash_time += 0.05 * (seconds - self.hash_time)
+
+    def record(self, tick, digest, snapshot):
+        """
+        Record the digest of the state at match tick `tick`, a multiple of
+        interval. snapshot is a callable returning the full state as a
+        JSON-friendly dict. Returns the message to broadcast, or None if
+        this checkpoint was already recorded.
+        """
+        index = tick // self.interval
+        if index == self.last_checkpoint:
+            return None
+        self.last_checkpoint = index
+        if len(self.order) == self.order.maxlen:
+            self.checkpoints.pop(self.order[0], None)
+        self.order.append(index)
+        self.checkpoints[index] = (tick, digest, snapshot())
+        return {'type': 'hash', 'pid': self.local_id, 'cp': index, 'hash': digest}
+
+    def compare(self, pid, index, remote_digest):
+        """Check a peer's checkpoint digest. Returns the dump path on a confirmed desync."""
+        entry = self.checkpoints.get(index)
+        if entry is None:
+            return None
+        self.checks += 1
+        tick, digest, state = entry
+        if digest == remote_digest:
+            self.streaks[pid] = 0
+            self.desynced.discard(pid)
+            return None
+
+        self.mismatches += 1
+        self.streaks[pid] = self.streaks.get(pid, 0) + 1
+        if self.streaks[pid] < self.confirm or pid in self.desynced:
+            return None
+        self.desynced.add(pid)
+        return self.dump(pid, index, tick, digest, remote_digest, state)
+
+    def dump(self, pid, index, tick, digest, remote_digest, state):
+        os.makedirs(self.dump_dir, exist_ok=True)
+        path = os.path.join(self.dump_dir, f"desync_{self.local_id}_vs_{pid}_cp{index}.json")
+        record = {
+            'local_id': self.local_id, 'remote_id': pid,
+            'checkpoint': index, 'tick': tick,
+            'local_hash': digest, 'remote_hash': remote_digest,
+            'time': time.time(), 'state': state,
+        }
+        try:
+            with open(path, 'w') as f:
+                json.dump(record, f, indent=1, default=str)
+        except OSError as e:
+            print(f"Desync dump failed: {e}")
+            return None
+        self.dumps += 1
+        return path
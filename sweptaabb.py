@@ -0,0 +1,100 @@
+# sweptaabb.py
+#
+# Swept-AABB continuous collision against static rects.
+# Instead of moving a box and then pushing it out of whatever it overlaps,
+# sweep() computes the time of impact of the moving box against every
+# candidate, advances to the earliest contact, cancels the velocity along
+# that contact's normal and carries on with the rest of the move (so boxes
+# slide along floors and walls). Thin platforms cannot be skipped over at
+# any step size, so a simulation can take coarse steps for fast-forward,
+# replays or headless runs.
+#
+# Normals point away from the surface that was hit:
+#   (0, -1) landed on a top     (0, 1) hit a ceiling
+#   (-1, 0) hit a wall on the right side of the box
+#   (1, 0)  hit a wall on its left side
+
+INF = float('inf')
+MAX_CONTACTS = 4      # resolved contacts per move (floor + wall + ceiling is 3)
+
+# -----------------------------------------------------------------------------
+# TIME OF IMPACT
+# -----------------------------------------------------------------------------
+
+def time_of_impact(x, y, w, h, dx, dy, r):
+    """
+    Time in [0, 1] at which box (x, y, w, h) moving by (dx, dy) first touches
+    pygame.Rect r, with the contact normal: (t, nx, ny), or None.
+    Boxes that already overlap r, or only touch it while moving away or along
+    it, do not hit.
+    """
+    left, top, right, bottom = r.left, r.top, r.right, r.bottom
+    if dx > 0:
+        x_entry, x_exit = (left - (x + w)) / dx, (right - x) / dx
+    elif dx < 0:
+        x_entry, x_exit = (right - x) / dx, (left - (x + w)) / dx
+    elif x < right and x + w > left:
+        x_entry, x_exit = -INF, INF
+    else:
+        return None
+
+    if dy > 0:
+        y_entry, y_exit = (top - (y + h)) / dy, (bottom - y) / dy
+    elif dy < 0:
+        y_entry, y_exit = (bottom - y) / dy, (top - (y + h)) / dy
+    elif y < bottom and y + h > top:
+        y_entry, y_exit = -INF, INF
+    else:
+        return None
+
+    entry = max(x_entry, y_entry)
+    if entry < 0 or entry > 1 or entry >= min(x_exit, y_exit):
+        return None
+    if x_entry > y_entry:
+        return entry, (-1 if dx > 0 else 1), 0
+    return entry, 0, (-1 if dy > 0 else 1)
+
+
+def swept_bounds(x, y, w, h, dx, dy):
+    """(left, top, width, height) covering the box over the whole move, for broad-phase queries."""
+    left = min(x, x + dx)
+    top = min(y, y + dy)
+    return left, top, w + abs(dx), h + abs(dy)
+
+# -----------------------------------------------------------------------------
+# SOLVER
+# -----------------------------------------------------------------------------
+
+def sweep(x, y, w, h, dx, dy, candidates, rect_of=lambda item: item['rect'], one_way=None):
+    """
+    Move box (x, y, w, h) by (dx, dy) through candidates, resolving contacts
+    in time order. Returns (x, y, contacts) where contacts lists
+    (nx, ny, item) for every surface hit, earliest first.
+    one_way(item) -> True marks platforms that only stop a box landing on top.
+    """
+    contacts = []
+    for _ in range(MAX_CONTACTS):
+        if not dx and not dy:
+            break
+        best = None
+        for item in candidates:
+            hit = time_of_impact(x, y, w, h, dx, dy, rect_of(item))
+            if hit is None or (one_way is not None and hit[2] >= 0 and one_way(item)):
+                continue
+            if best is None or hit[0] < best[0]:
+                best = (hit[0], hit[1], hit[2], item)
+        if best is None:
+            break
+        t, nx, ny, item = best
+        r = rect_of(item)
+        # Advance to the contact, snapping exactly onto the surface
+        if nx:
+            x = r.left - w if nx < 0 else r.right
+            y += dy * t
+            dx, dy = 0, dy * (1 - t)
+        else:
+            y = r.top - h if ny < 0 else r.bottom
+            x += dx * t
+            dx, dy = dx * (1 - t), 0
+        contacts.append((nx, ny, item))
+    return x + dx, y + dy, contacts
@@ -0,0 +1,142 @@
+# tickbudget.py
+#
+# Per-tick timing and overload shedding for headless game servers.
+# The server calls begin_tick()/end_tick() around every simulation tick;
+# when ticks keep overrunning their budget the monitor escalates through
+# the shedding steps one at a time, and backs off again once load drops.
+
+import time
+from collections import deque
+
+# -----------------------------------------------------------------------------
+# SHEDDING STEPS (applied in this order as overload gets worse)
+# -----------------------------------------------------------------------------
+
+SHED_FAR_ENTITIES   = "far_entities"      # replicate far entities less often
+SHED_COSMETIC       = "cosmetic_events"   # drop purely cosmetic events
+SHED_SNAPSHOT_RATE  = "snapshot_rate"     # send snapshots at a lower rate
+SHED_REFUSE_JOINS   = "refuse_joins"      # turn away new players
+
+SHED_STEPS = [SHED_FAR_ENTITIES, SHED_COSMETIC, SHED_SNAPSHOT_RATE, SHED_REFUSE_JOINS]
+
+# Overload states
+STATE_NORMAL     = "normal"
+STATE_SHEDDING   = "shedding"
+STATE_CRITICAL   = "critical"
+
+# -----------------------------------------------------------------------------
+# TICK BUDGET MONITOR
+# -----------------------------------------------------------------------------
+
+class TickBudget:
+    def __init__(self, tick_rate=60, steps=SHED_STEPS, window=30,
+                 overload_load=0.9, recover_load=0.6,
+                 escalate_ticks=15, recover_ticks=120):
+        """
+        tick_rate      -- simulation ticks per second; the budget is 1/tick_rate
+        steps          -- shedding steps, cheapest fidelity loss first
+        window         -- number of ticks averaged for the load figure
+        overload_load  -- average load (tick time / budget) that counts as overloaded
+        recover_load   -- average load below which a step may be released
+        escalate_ticks -- consecutive overloaded ticks before the next step engages
+        recover_ticks  -- consecutive calm ticks before the last step is released
+        """
+        self.budget = 1.0 / tick_rate
+        self.steps = list(steps)
+        self.overload_load = overload_load
+        self.recover_load = recover_load
+        self.escalate_ticks = escalate_ticks
+        self.recover_ticks = recover_ticks
+
+        self.level = 0                      # number of active shedding steps
+        self.samples = deque(maxlen=window)
+        self.tick_start = None
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.ticks = 0
+        self.overruns = 0
+        self.escalations = 0
+        self.hot_streak = 0
+        self.calm_streak = 0
+        self.shed_counts = {step: 0 for step in self.steps}
+
+    # --- Timing ---------------------------------------------------------------
+
+    def begin_tick(self):
+        self.tick_start = time.perf_counter()
+
+    def end_tick(self):
+        """Record the tick that began at begin_tick(); returns its duration in seconds."""
+        duration = time.perf_counter() - self.tick_start
+        self.tick_start = None
+        self.record(duration)
+        return duration
+
+    def record(self, duration):
+        """Feed one tick duration (seconds) into the state machine."""
+        self.ticks += 1
+        self.last_duration = duration
+        self.max_duration = max(self.max_duration, duration)
+        self.samples.append(duration)
+        if duration > self.budget:
+            self.overruns += 1
+
+        load = self.load()
+        if load > self.overload_load:
+            self.hot_streak += 1
+            self.calm_streak = 0
+            if self.hot_streak >= self.escalate_ticks and self.level < len(self.steps):
+                self.level += 1
+                self.escalations += 1
+                self.hot_streak = 0
+        elif load < self.recover_load:
+            self.calm_streak += 1
+            self.hot_streak = 0
+            if self.calm_streak >= self.recover_ticks and self.level > 0:
+                self.level -= 1
+                self.calm_streak = 0
+        else:
+            # Between thresholds: hold the current level
+            self.hot_streak = 0
+            self.calm_streak = 0
+
+    # --- Queries --------------------------------------------------------------
+
+    def load(self):
+        """Average tick time over the window as a fraction of the budget."""
+        if not self.samples:
+            return 0.0
+        return (sum(self.samples) / len(self.samples)) / self.budget
+
+    def state(self):
+        if self.level == 0:
+            return STATE_NORMAL
+        if self.level >= len(self.steps):
+            return STATE_CRITICAL
+        return STATE_SHEDDING
+
+    def shedding(self, step):
+        """True while the given shedding step is engaged."""
+        return step in self.steps[:self.level]
+
+    def note_shed(self, step, count=1):
+        """Count work that was skipped because of a shedding step."""
+        self.shed_counts[step] = self.shed_counts.get(step, 0) + count
+
+    def metrics(self):
+        m = {
+            "tick_budget_ms": self.budget * 1000.0,
+            "tick_last_ms": self.last_duration * 1000.0,
+            "tick_avg_ms": self.load() * self.budget * 1000.0,
+            "tick_max_ms": self.max_duration * 1000.0,
+            "tick_load": self.load(),
+            "ticks": self.ticks,
+            "tick_overruns": self.overruns,
+            "overload_state": self.state(),
+            "shed_level": self.level,
+            "shed_escalations": self.escalations,
+        }
+        for step in self.steps:
+            m["shed_" + step + "_active"] = int(self.shedding(step))
+            m["shed_" + step + "_total"] = self.shed_counts.get(step, 0)
+        return m
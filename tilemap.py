@@ -0,0 +1,252 @@
+# tilemap.py
+#
+# Optional tilemap representation of level geometry with O(1) cell lookups.
+# A TileMap is a flat array('B') of per-cell flags (solid / one-way / pipe).
+# The resolver sweeps a box along each axis, resolves the earlier contact
+# first (so it agrees with sweptaabb.sweep() on the same rects) and only
+# inspects the cells the box passes through, so its cost depends on the
+# mover's size and speed, never on how big the level is.
+#
+# The games' free-form rect levels convert automatically: from_level() picks
+# the largest cell size that every coordinate is a multiple of (TILE=32 when
+# the level is tile-aligned, smaller when it is not), so the converted map
+# collides exactly like the rects it came from. Coordinates finer than
+# MIN_CELL are snapped outward to it. mariovluigi1.0a.py resolves its
+# players on one when run with --tilemap (--check-tilemap compares the two).
+#
+# Run directly for a cost-versus-level-size benchmark:
+#   python tilemap.py
+
+import math
+import time
+from array import array
+from functools import reduce
+
+# Cell flags
+T_EMPTY  = 0
+T_SOLID  = 1      # blocks from every side
+T_ONEWAY = 2      # blocks only a mover falling onto its top
+T_PIPE   = 4      # marks pipe cells (solid as well) for wrap-around logic
+
+# Level 'type' strings used by the games -> cell flags
+TYPE_FLAGS = {
+    'solid':    T_SOLID,
+    'ground':   T_SOLID,
+    'brick':    T_SOLID,
+    'question': T_SOLID,
+    'platform': T_SOLID,
+    'pipeL':    T_SOLID | T_PIPE,
+    'pipeR':    T_SOLID | T_PIPE,
+}
+
+MIN_CELL = 4      # never pick a cell smaller than this when auto-sizing
+
+# -----------------------------------------------------------------------------
+# TILE MAP
+# -----------------------------------------------------------------------------
+
+class TileMap:
+    def __init__(self, cols, rows, cell=32, origin=(0, 0)):
+        self.cols = cols
+        self.rows = rows
+        self.cell = cell
+        self.ox, self.oy = origin       # world position of cell (0, 0)
+        self.cells = array('B', bytes(cols * rows))
+
+    # --- Building -------------------------------------------------------------
+
+    @classmethod
+    def from_rects(cls, rects, cell=None):
+        """
+        rects: iterable of (x, y, w, h, flags). With cell=None the cell size is
+        the GCD of every coordinate (capped at 32, floored at MIN_CELL), which
+        reproduces aligned geometry exactly; a coarser cell snaps rects outward.
+        No rects give an empty map that blocks nothing.
+        """
+        rects = [tuple(r) for r in rects]
+        if not rects:
+            return cls(0, 0, cell or 32)
+        if cell is None:
+            values = [v for x, y, w, h, _ in rects for v in (x, y, w, h)]
+            cell = max(MIN_CELL, reduce(math.gcd, [int(v) for v in values], 32))
+        left = min(x for x, _, _, _, _ in rects)
+        top = min(y for _, y, _, _, _ in rects)
+        right = max(x + w for x, _, w, _, _ in rects)
+        bottom = max(y + h for _, y, _, h, _ in rects)
+        ox = math.floor(left / cell) * cell
+        oy = math.floor(top / cell) * cell
+        tm = cls(math.ceil((right - ox) / cell), math.ceil((bottom - oy) / cell), cell, (ox, oy))
+        for x, y, w, h, flags in rects:
+            tm.fill(x, y, w, h, flags)
+        return tm
+
+    @classmethod
+    def from_level(cls, level, cell=None, type_flags=TYPE_FLAGS):
+        """Convert a LEVEL list of {'x','y','w','h','type'} dicts."""
+        return cls.from_rects([(p['x'], p['y'], p['w'], p['h'], type_flags.get(p['type'], T_SOLID))
+                               for p in level], cell)
+
+    def fill(self, x, y, w, h, flags):
+        c = self.cell
+        c0 = max(0, math.floor((x - self.ox) / c))
+        c1 = min(self.cols, math.ceil((x + w - self.ox) / c))
+        r0 = max(0, math.floor((y - self.oy) / c))
+        r1 = min(self.rows, math.ceil((y + h - self.oy) / c))
+        if flags & T_ONEWAY:
+            r1 = min(r1, r0 + 1)          # only the top surface catches anything
+        cells = self.cells
+        for row in range(r0, r1):
+            base = row * self.cols
+            for col in range(c0, c1):
+                cells[base + col] |= flags
+
+    # --- Lookups --------------------------------------------------------------
+
+    def at(self, col, row):
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return self.cells[row * self.cols + col]
+        return T_EMPTY
+
+    def flags_at(self, x, y):
+        """Flags of the cell containing world point (x, y)."""
+        return self.at(int((x - self.ox) // self.cell), int((y - self.oy) // self.cell))
+
+    def _span(self, lo, hi, origin):
+        """Cell indices covered by the half-open world interval [lo, hi)."""
+        c = self.cell
+        return int((lo - origin) // c), int(math.ceil((hi - origin) / c)) - 1
+
+    # --- Resolver -------------------------------------------------------------
+
+    def move(self, x, y, w, h, dx, dy):
+        """
+        Move the box (x, y, w, h) by (dx, dy), stopping at solid cells and at
+        one-way tops when falling onto them. Contacts resolve in time order,
+        like sweptaabb.sweep() on the same geometry: the earlier of the two
+        axis contacts stops its axis and the rest of the move carries on
+        along the other one.
+        Returns (x, y, hit_x, hit_y) where hit_x / hit_y is -1, 0 or 1 for the
+        side that was blocked (hit_y == 1 means landed). A move that ends flush
+        against a cell counts as blocked by it.
+        """
+        hit_x = hit_y = 0
+        if dx and dy:
+            tx, side_x, edge_x = self._sweep_x(x, y, w, h, dx, dy)
+            ty, side_y, edge_y = self._sweep_y(x, y, w, h, dy, dx)
+            if side_y and (not side_x or ty <= tx):
+                hit_y = side_y
+                y = edge_y - h if side_y > 0 else edge_y
+                x += dx * ty
+                dx, dy = dx * (1 - ty), 0
+            elif side_x:
+                hit_x = side_x
+                x = edge_x - w if side_x > 0 else edge_x
+                y += dy * tx
+                dx, dy = 0, dy * (1 - tx)
+            else:
+                return x + dx, y + dy, 0, 0
+        if dx:
+            _, side, edge = self._sweep_x(x, y, w, h, dx)
+            if side:
+                x, hit_x = (edge - w if side > 0 else edge), side
+            else:
+                x += dx
+        if dy:
+            _, side, edge = self._sweep_y(x, y, w, h, dy)
+            if side:
+                y, hit_y = (edge - h if side > 0 else edge), side
+            else:
+                y += dy
+        return x, y, hit_x, hit_y
+
+    def _sweep_x(self, x, y, w, h, dx, dy=0):
+        """
+        First side-on contact of the box moving by (dx, dy) with a solid cell:
+        (time in [0, 1], side of the box (1 right, -1 left), the cell edge's
+        world x), or (None, 0, None). The rows tested are the ones the box
+        covers at that time.
+        """
+        c, cols, cells, oy = self.cell, self.cols, self.cells, self.oy
+        if dx > 0:
+            first = int((x + w - self.ox) // c)
+            last = int((x + w + dx - self.ox) // c)
+            columns = range(max(first, 0), min(last, cols - 1) + 1)
+        else:
+            first = int(math.ceil((x - self.ox) / c)) - 1
+            last = int(math.ceil((x + dx - self.ox) / c)) - 1
+            columns = range(min(first, cols - 1), max(last, 0) - 1, -1)
+        for col in columns:
+            edge = self.ox + col * c if dx > 0 else self.ox + (col + 1) * c
+            t = max(0.0, (edge - (x + w)) / dx if dx > 0 else (edge - x) / dx)
+            ty = y + dy * t
+            r0, r1 = self._span(ty, ty + h, oy)
+            for row in range(max(r0, 0), min(r1, self.rows - 1) + 1):
+                if cells[row * cols + col] & T_SOLID:
+                    return t, (1 if dx > 0 else -1), edge
+        return None, 0, None
+
+    def _sweep_y(self, x, y, w, h, dy, dx=0):
+        """
+        First contact of the box moving by (dx, dy) with a cell top (side 1,
+        landed) or a solid cell's underside (-1): (time, side, the edge's
+        world y), or (None, 0, None). The columns tested are the ones the box
+        covers at that time.
+        """
+        c, cols, cells, ox = self.cell, self.cols, self.cells, self.ox
+        if dy > 0:
+            first = int((y + h - self.oy) // c)
+            last = int((y + h + dy - self.oy) // c)
+            rows = range(max(first, 0), min(last, self.rows - 1) + 1)
+        else:
+            first = int(math.ceil((y - self.oy) / c)) - 1
+            last = int(math.ceil((y + dy - self.oy) / c)) - 1
+            rows = range(min(first, self.rows - 1), max(last, 0) - 1, -1)
+        for row in rows:
+            edge = self.oy + row * c if dy > 0 else self.oy + (row + 1) * c
+            t = max(0.0, (edge - (y + h)) / dy if dy > 0 else (edge - y) / dy)
+            # One-way tops only catch a box that started above them
+            mask = T_SOLID | T_ONEWAY if dy > 0 and edge >= y + h else T_SOLID
+            tx = x + dx * t
+            c0, c1 = self._span(tx, tx + w, ox)
+            base = row * cols
+            for col in range(max(c0, 0), min(c1, cols - 1) + 1):
+                if cells[base + col] & mask:
+                    return t, (1 if dy > 0 else -1), edge
+        return None, 0, None
+
+# -----------------------------------------------------------------------------
+# BENCHMARK
+# -----------------------------------------------------------------------------
+
+def benchmark(widths=(800, 8000, 80000), movers=20, frames=200):
+    """Tile sweep vs scanning every rect, for ever wider scrolling levels."""
+    import random
+    import pygame
+
+    rng = random.Random(1)
+    print(f"{'level px':>9} {'rects':>6} {'rect scan ms':>13} {'tile sweep ms':>14}")
+    for width in widths:
+        level = [{'x': 0, 'y': 448, 'w': width, 'h': 32, 'type': 'solid'}]
+        for _ in range(width // 32):
+            level.append({'x': rng.randrange(0, width // 32) * 32, 'y': rng.randrange(4, 14) * 32,
+                          'w': 32 * rng.randint(1, 4), 'h': 32, 'type': 'brick'})
+        rects = [pygame.Rect(p['x'], p['y'], p['w'], p['h']) for p in level]
+        tm = TileMap.from_level(level)
+        boxes = [(rng.uniform(0, width - 32), rng.uniform(0, 380)) for _ in range(movers)]
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            for bx, by in boxes:
+                pygame.Rect(int(bx + 3), int(by + 5), 32, 64).collidelistall(rects)
+        scan = (time.perf_counter() - start) / frames
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            for bx, by in boxes:
+                tm.move(bx, by, 32, 64, 3, 5)
+        sweep = (time.perf_counter() - start) / frames
+
+        print(f"{width:>9} {len(level):>6} {scan * 1000:>13.3f} {sweep * 1000:>14.3f}")
+
+if __name__ == "__main__":
+    benchmark()
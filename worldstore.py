@@ -0,0 +1,167 @@
+# worldstore.py
+#
+# Write-behind persistence for the MMO server's world state.
+# The simulation only ever touches an in-memory dirty set: put() replaces a
+# player's pending record and returns immediately. A background thread
+# swaps the dirty set out every FLUSH_INTERVAL seconds and writes the batch
+# in one SQLite transaction (WAL mode), so a tick never waits on disk.
+# Periodic WAL checkpoints keep the log short; a crash loses at most the
+# last unflushed interval, never a half-written batch.
+
+import json
+import sqlite3
+import threading
+import time
+
+FLUSH_INTERVAL      = 2.0     # seconds between batched commits
+CHECKPOINT_INTERVAL = 60.0    # seconds between WAL checkpoints into the main file
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    player_id TEXT PRIMARY KEY,
+    x         REAL NOT NULL,
+    y         REAL NOT NULL,
+    vx        REAL NOT NULL DEFAULT 0,
+    vy        REAL NOT NULL DEFAULT 0,
+    on_ground INTEGER NOT NULL DEFAULT 0,
+    stats     TEXT NOT NULL DEFAULT '{}',
+    updated   REAL NOT NULL
+)
+"""
+
+UPSERT = """
+INSERT INTO players (player_id, x, y, vx, vy, on_ground, stats, updated)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(player_id) DO UPDATE SET
+    x = excluded.x, y = excluded.y, vx = excluded.vx, vy = excluded.vy,
+    on_ground = excluded.on_ground, stats = excluded.stats, updated = excluded.updated
+"""
+
+# -----------------------------------------------------------------------------
+# WORLD STORE
+# -----------------------------------------------------------------------------
+
+class WorldStore:
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL, checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.checkpoint_interval = checkpoint_interval
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")   # durable at checkpoints, safe against corruption
+        self.db.execute(SCHEMA)
+        self.db.commit()
+
+        self.lock = threading.Lock()
+        self.dirty = {}            # player_id -> record awaiting the next flush
+        self.wake = threading.Event()
+        self.running = False
+        self.thread = None
+
+        self.flushes = 0
+        self.rows_written = 0
+        self.puts = 0
+        self.last_flush_ms = 0.0
+        self.checkpoints = 0
+        self.errors = 0
+
+    # --- Loading --------------------------------------------------------------
+
+    def load_all(self):
+        """Every saved player as {player_id: record}, read in one query at startup."""
+        rows = self.db.execute(
+            "SELECT player_id, x, y, vx, vy, on_ground, stats FROM players").fetchall()
+        world = {}
+        for pid, x, y, vx, vy, on_ground, stats in rows:
+            world[pid] = {"x": x, "y": y, "vx": vx, "vy": vy, "on_ground": bool(on_ground),
+                          "stats": json.loads(stats)}
+        return world
+
+    # --- Simulation side (never blocks on disk) -------------------------------
+
+    def put(self, player_id, record):
+        """
+        Queue a player's current record. record holds the Player.to_dict()
+        fields plus optional "stats"; later puts for the same
+        player before a flush simply replace the earlier one.
+        """
+        row = (player_id, record["x"], record["y"], record.get("vx", 0), record.get("vy", 0),
+               int(bool(record.get("on_ground"))),
+               json.dumps(record.get("stats", {})), time.time())
+        with self.lock:
+            self.dirty[player_id] = row
+            self.puts += 1
+
+    def request_flush(self):
+        self.wake.set()
+
+    # --- Writer thread --------------------------------------------------------
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.writer, daemon=True)
+        self.thread.start()
+
+    def writer(self):
+        next_checkpoint = time.time() + self.checkpoint_interval
+        while self.running:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+            if time.time() >= next_checkpoint:
+                next_checkpoint = time.time() + self.checkpoint_interval
+                self.checkpoint()
+
+    def flush(self):
+        with self.lock:
+            batch, self.dirty = self.dirty, {}
+        if not batch:
+            return 0
+        start = time.perf_counter()
+        try:
+            with self.db:                                   # one transaction per batch
+                self.db.executemany(UPSERT, batch.values())
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"World store flush failed: {e}")
+            with self.lock:
+                # Requeue, keeping any newer record that arrived meanwhile
+                batch.update(self.dirty)
+                self.dirty = batch
+            return 0
+        self.last_flush_ms = (time.perf_counter() - start) * 1000.0
+        self.flushes += 1
+        self.rows_written += len(batch)
+        return len(batch)
+
+    def checkpoint(self, mode="PASSIVE"):
+        try:
+            self.db.execute(f"PRAGMA wal_checkpoint({mode})")
+            self.checkpoints += 1
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"World store checkpoint failed: {e}")
+
+    def close(self):
+        """Stop the writer, flush what is left and fold the WAL into the database."""
+        self.running = False
+        self.wake.set()
+        if self.thread:
+            self.thread.join(timeout=5.0)
+        self.flush()
+        self.checkpoint("TRUNCATE")
+        self.db.close()
+
+    def metrics(self):
+        with self.lock:
+            pending = len(self.dirty)
+        return {
+            "store_pending": pending,
+            "store_puts": self.puts,
+            "store_flushes": self.flushes,
+            "store_rows_written": self.rows_written,
+            "store_last_flush_ms": self.last_flush_ms,
+            "store_checkpoints": self.checkpoints,
+            "store_errors": self.errors,
+        }